@@ -0,0 +1,6 @@
+"""
+Benchmarks for the Python camera server.
+
+Run them from the python_server directory so the server modules import, e.g.:
+    python -m benchmarks.candidate_filter
+"""
@@ -0,0 +1,106 @@
+"""
+Benchmark two-stage candidate filtering against exact gallery matching.
+
+Builds synthetic galleries of increasing size, then times best_match on the
+same queries with and without a fitted GalleryProjection. Agreement is the
+fraction of queries where both return the same person (or both no match).
+
+Usage (from the python_server directory):
+    python -m benchmarks.candidate_filter
+    python -m benchmarks.candidate_filter --people 1000 10000 --queries 1000 --json results.json
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+import constants
+from constants import FaceRecognition as FR, CandidateFilter
+from gallery import GalleryPartition, GalleryProjection
+from benchmarks.synthetic import make_centers, make_people, make_samples
+
+def _time_queries(partition, queries, top_k=CandidateFilter.TOP_K):
+    """Run best_match for every query, returning (results, milliseconds per query)."""
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        results.append(partition.best_match(query, FR.COSINE_THRESHOLD, FR.NORM_L2_THRESHOLD, top_k)[0])
+    elapsed = time.perf_counter() - start
+    return results, elapsed * 1000 / len(queries)
+
+def run(people_counts, exemplars, query_count, dimensions, top_k, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+
+    for people_count in people_counts:
+        centers = make_centers(people_count, rng)
+        people = make_people(centers, exemplars, rng)
+
+        # 80% of queries are new photos of enrolled people, the rest are strangers
+        known = rng.integers(0, people_count, size=int(query_count * 0.8))
+        queries = list(make_samples(centers[known], 1, rng)[:, 0])
+        queries += list(make_samples(make_centers(query_count - len(known), rng), 1, rng)[:, 0])
+        expected = [people[i].id for i in known] + [None] * (query_count - len(known))
+
+        exact = GalleryPartition.build(people)
+        start = time.perf_counter()
+        projection = GalleryProjection.fit(exact.matrix, dimensions)
+        fit_ms = (time.perf_counter() - start) * 1000
+        filtered = GalleryPartition.build(people, projection)
+
+        exact_results, exact_ms = _time_queries(exact, queries)
+        filtered_results, filtered_ms = _time_queries(filtered, queries, top_k)
+
+        agreement = np.mean([a == b for a, b in zip(exact_results, filtered_results)])
+        rows.append({
+            'people': people_count,
+            'rows': int(exact.matrix.shape[0]),
+            'exact_ms': round(exact_ms, 4),
+            'filtered_ms': round(filtered_ms, 4),
+            'speedup': round(exact_ms / filtered_ms, 2) if filtered_ms > 0 else None,
+            'agreement': round(float(agreement), 4),
+            'exact_accuracy': round(float(np.mean([a == b for a, b in zip(exact_results, expected)])), 4),
+            'filtered_accuracy': round(float(np.mean([a == b for a, b in zip(filtered_results, expected)])), 4),
+            'fit_ms': round(fit_ms, 1)
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark two-stage candidate filtering')
+    parser.add_argument('--people', type=int, nargs='+', default=[500, 1000, 2000, 5000, 20000],
+                        help='Gallery sizes in people (default: 500 1000 2000 5000 20000)')
+    parser.add_argument('--exemplars', type=int, default=FR.MAX_EXEMPLARS,
+                        help=f'Exemplars per person (default: {FR.MAX_EXEMPLARS})')
+    parser.add_argument('--queries', type=int, default=500,
+                        help='Queries per gallery size (default: 500)')
+    parser.add_argument('--dimensions', type=int, default=CandidateFilter.DIMENSIONS,
+                        help=f'Projection dimensions (default: {CandidateFilter.DIMENSIONS})')
+    parser.add_argument('--top-k', type=int, default=CandidateFilter.TOP_K,
+                        help=f'People re-ranked exactly per query (default: {CandidateFilter.TOP_K})')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    # Benchmark every size, including those the server would score exactly
+    constants.CandidateFilter.MIN_GALLERY_ROWS = 0
+
+    rows = run(args.people, args.exemplars, args.queries, args.dimensions, args.top_k)
+
+    print(f"{'people':>8} {'rows':>8} {'exact ms':>9} {'2-stage ms':>10} {'speedup':>8} "
+          f"{'agree':>7} {'exact acc':>9} {'2-stage acc':>11}")
+    for row in rows:
+        print(f"{row['people']:>8} {row['rows']:>8} {row['exact_ms']:>9.3f} {row['filtered_ms']:>10.3f} "
+              f"{row['speedup']:>7.2f}x {row['agreement']:>7.3f} {row['exact_accuracy']:>9.3f} "
+              f"{row['filtered_accuracy']:>11.3f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'dimensions': args.dimensions,
+                'top_k': args.top_k,
+                'exemplars': args.exemplars,
+                'results': rows
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
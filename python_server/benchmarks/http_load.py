@@ -0,0 +1,388 @@
+"""
+HTTP load test of the camera server with simulated dashboard clients.
+
+Each client has its own connection pool (6 connections, like a browser)
+and requests the endpoints of a scenario:
+
+- rate endpoints are requested open-loop at a fixed rate per client, so a
+  slow server makes requests pile up instead of quietly lowering the load;
+  latency is measured from when a request was due, not when it was sent
+- stream endpoints are requested back to back with a short gap, the way
+  the dashboard polls camera frames, and can be followed by other requests
+  after every frame
+
+A '{thumbnail}' in a path is replaced by a thumbnail seen in earlier
+responses. Besides per-endpoint latency histograms and throughput, the
+event loop lag of the server (from /get_processor_status) and of the load
+generator itself is reported; lag in the generator means the numbers are
+limited by the client, not the server.
+
+Scenario files are JSON:
+    {
+      "clients": 4,
+      "duration": 60,
+      "endpoints": [
+        {"path": "/get_image_with_recognition", "stream": true, "gap_ms": 40,
+         "follow": ["/get_face_data"]},
+        {"path": "/get_face_counts", "rate": 0.2},
+        {"path": "/thumbnails/{thumbnail}", "rate": 2}
+      ]
+    }
+
+Usage (from the python_server directory):
+    python -m benchmarks.http_load --url http://raspberrypi.local:12345 --clients 8
+    python -m benchmarks.http_load --source recording.mp4 --scenario benchmarks/scenarios/mixed.json --json load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+import numpy as np
+
+from loop_monitor import LoopLagMonitor
+from benchmarks.report import summarize, write_json
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Upper bounds of the latency histogram buckets in milliseconds
+HISTOGRAM_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# What one dashboard tab in recognition mode requests (see static/script.js)
+DASHBOARD_SCENARIO = {
+    'clients': 1,
+    'duration': 30,
+    'endpoints': [
+        {'path': '/get_image_with_recognition', 'stream': True, 'gap_ms': 40, 'follow': ['/get_face_data']},
+        {'path': '/get_face_counts', 'rate': 0.2},
+        {'path': '/get_save_status', 'rate': 1 / 3},
+        {'path': '/thumbnails/{thumbnail}', 'rate': 1.0}
+    ]
+}
+
+class EndpointStats:
+    """Latencies and outcomes of the requests to one endpoint."""
+
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+        self.skipped = 0
+        self.bytes = 0
+
+    def record(self, latency_ms, status, size):
+        self.latencies.append(latency_ms)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.bytes += size
+
+    def histogram(self):
+        """Count requests per latency bucket, keyed by the bucket's upper bound."""
+        counts = np.histogram(self.latencies, bins=(0,) + HISTOGRAM_BUCKETS_MS + (np.inf,))[0]
+        labels = [f"<={bound}ms" for bound in HISTOGRAM_BUCKETS_MS] + [f">{HISTOGRAM_BUCKETS_MS[-1]}ms"]
+        return dict(zip(labels, (int(count) for count in counts)))
+
+    def to_dict(self, duration):
+        ok = sum(count for status, count in self.statuses.items() if 200 <= status < 400)
+        return {
+            'requests': len(self.latencies) + self.errors,
+            'ok': ok,
+            'failed': len(self.latencies) - ok + self.errors,
+            'errors': self.errors,
+            'skipped': self.skipped,
+            'statuses': {str(status): count for status, count in sorted(self.statuses.items())},
+            'throughput_rps': round(ok / duration, 2) if duration > 0 else None,
+            'megabytes': round(self.bytes / 1e6, 2),
+            'latency': summarize(self.latencies),
+            'histogram': self.histogram() if self.latencies else None
+        }
+
+class LoadTest:
+    """Runs a scenario against a server and collects the results."""
+
+    def __init__(self, base_url, scenario):
+        self.base_url = base_url.rstrip('/')
+        self.scenario = scenario
+        self.stats = {}
+        self.thumbnails = []
+        self._thumbnail_set = set()
+        self._pending = set()
+        self._deadline = None
+        self.server_lag = []
+        self.client_monitor = LoopLagMonitor()
+
+    def _stats_for(self, name):
+        if name not in self.stats:
+            self.stats[name] = EndpointStats()
+        return self.stats[name]
+
+    def _collect_thumbnails(self, data):
+        """Remember thumbnail paths found anywhere in a JSON response."""
+        if isinstance(data, dict):
+            data = list(data.values())
+        if isinstance(data, list):
+            for value in data:
+                self._collect_thumbnails(value)
+        elif isinstance(data, str) and '/thumbnails/' in data:
+            path = data[data.index('/thumbnails/') + len('/thumbnails/'):]
+            if path not in self._thumbnail_set:
+                self._thumbnail_set.add(path)
+                self.thumbnails.append(path)
+
+    async def _request(self, session, path, due=None):
+        """Request a path and record its latency, measured from when it was due."""
+        if '{thumbnail}' in path:
+            if not self.thumbnails:
+                self._stats_for(path).skipped += 1
+                return
+            url_path = path.replace('{thumbnail}', random.choice(self.thumbnails))
+        else:
+            url_path = path
+
+        start = due if due is not None else time.perf_counter()
+        try:
+            async with session.get(self.base_url + url_path) as response:
+                body = await response.read()
+                latency_ms = (time.perf_counter() - start) * 1000
+                self._stats_for(path).record(latency_ms, response.status, len(body))
+                if response.content_type == 'application/json' and response.status == 200:
+                    self._collect_thumbnails(json.loads(body))
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            self._stats_for(path).errors += 1
+
+    async def _run_rate(self, session, endpoint):
+        """Request an endpoint open-loop at a fixed rate until the deadline."""
+        interval = 1.0 / endpoint['rate']
+        # Spread clients out instead of having them all fire at once
+        due = time.perf_counter() + random.uniform(0, interval)
+        while due < self._deadline:
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            task = asyncio.create_task(self._request(session, endpoint['path'], due))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+            due += interval
+
+    async def _run_stream(self, session, endpoint):
+        """Request an endpoint back to back until the deadline."""
+        gap = endpoint.get('gap_ms', 0) / 1000
+        while time.perf_counter() < self._deadline:
+            await self._request(session, endpoint['path'])
+            for path in endpoint.get('follow', []):
+                await self._request(session, path)
+            await asyncio.sleep(gap)
+
+    async def _run_client(self):
+        connector = aiohttp.TCPConnector(limit=6)
+        timeout = aiohttp.ClientTimeout(total=30)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            workers = [self._run_stream(session, endpoint) if endpoint.get('stream')
+                       else self._run_rate(session, endpoint)
+                       for endpoint in self.scenario['endpoints']]
+            await asyncio.gather(*workers)
+            # Let requests that were due before the deadline finish
+            if self._pending:
+                await asyncio.wait(list(self._pending))
+
+    async def _poll_server_lag(self, session, interval=1.0):
+        """Sample the event loop lag reported by the server while the test runs."""
+        while True:
+            try:
+                async with session.get(f"{self.base_url}/get_processor_status") as response:
+                    status = await response.json()
+                lag = status.get('event_loop')
+                if lag:
+                    self.server_lag.append(lag)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                pass
+            await asyncio.sleep(interval)
+
+    async def prime(self, session):
+        """Collect thumbnail paths before starting, so thumbnail requests have targets."""
+        for path in ('/get_known_faces', '/get_face_counts', '/get_face_data'):
+            try:
+                async with session.get(self.base_url + path) as response:
+                    if response.status == 200:
+                        self._collect_thumbnails(await response.json())
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                pass
+
+    async def run(self):
+        duration = self.scenario['duration']
+        self.client_monitor.start()
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
+            await self.prime(session)
+            poller = asyncio.create_task(self._poll_server_lag(session))
+            start = time.perf_counter()
+            self._deadline = start + duration
+            await asyncio.gather(*(self._run_client() for _ in range(self.scenario['clients'])))
+            elapsed = time.perf_counter() - start
+            poller.cancel()
+        await self.client_monitor.stop()
+        return self.results(elapsed)
+
+    def _server_lag_summary(self):
+        """Combine the server's lag windows sampled during the test."""
+        samples = [lag for lag in self.server_lag if 'p99_ms' in lag]
+        if not samples:
+            return None
+        return {
+            'polls': len(samples),
+            'mean_ms': round(float(np.mean([lag['mean_ms'] for lag in samples])), 2),
+            'worst_p99_ms': max(lag['p99_ms'] for lag in samples),
+            'max_ms': max(lag['window_max_ms'] for lag in samples)
+        }
+
+    def results(self, elapsed):
+        endpoints = {name: stats.to_dict(elapsed) for name, stats in self.stats.items()}
+        return {
+            'clients': self.scenario['clients'],
+            'duration_s': round(elapsed, 2),
+            'throughput_rps': round(sum(e['throughput_rps'] or 0 for e in endpoints.values()), 2),
+            'endpoints': endpoints,
+            'server_event_loop': self._server_lag_summary(),
+            'client_event_loop': self.client_monitor.get_status(),
+            'thumbnails_seen': len(self.thumbnails)
+        }
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+async def _wait_until_up(base_url, process, timeout):
+    """Wait until the server answers /test."""
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=2)) as session:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {process.returncode}")
+            try:
+                async with session.get(f"{base_url}/test") as response:
+                    if response.status == 200:
+                        return
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"Server did not start within {timeout:.0f}s")
+
+def _start_server(args, data_dir):
+    """Start a server replaying a recording on a free local port."""
+    port = _free_port()
+    command = [sys.executable, 'main.py', '--camera', 'file', '--source', os.path.abspath(args.source),
+               '--pacing', args.pacing, '--host', '127.0.0.1', '--port', str(port), '--data-dir', data_dir]
+    with open(os.path.join(data_dir, 'server.log'), 'w') as log:
+        process = subprocess.Popen(command, cwd=SERVER_DIR, stdout=log, stderr=subprocess.STDOUT)
+    return process, f"http://127.0.0.1:{port}"
+
+def _stop_server(process):
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+def load_scenario(args):
+    """Load the scenario file, or the dashboard scenario, and apply overrides."""
+    if args.scenario:
+        with open(args.scenario, 'r') as f:
+            scenario = json.load(f)
+    else:
+        scenario = json.loads(json.dumps(DASHBOARD_SCENARIO))
+    if args.clients is not None:
+        scenario['clients'] = args.clients
+    if args.duration is not None:
+        scenario['duration'] = args.duration
+    scenario.setdefault('clients', 1)
+    scenario.setdefault('duration', 30)
+
+    for endpoint in scenario.get('endpoints', []):
+        if 'path' not in endpoint or not (endpoint.get('stream') or endpoint.get('rate', 0) > 0):
+            raise ValueError(f"Endpoints need a 'path' and either a positive 'rate' or 'stream': true: {endpoint}")
+    if not scenario.get('endpoints'):
+        raise ValueError("Scenario has no endpoints")
+    return scenario
+
+def print_results(results):
+    print(f"{results['clients']} clients for {results['duration_s']:.0f}s, "
+          f"{results['throughput_rps']:.1f} requests/s")
+    print(f"{'endpoint':<34} {'ok':>7} {'failed':>7} {'rps':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, endpoint in sorted(results['endpoints'].items()):
+        latency = endpoint['latency']
+        timings = (f"{latency['p50_ms']:>8.1f} {latency['p90_ms']:>8.1f} {latency['p99_ms']:>8.1f} "
+                   f"{latency['max_ms']:>8.1f}") if latency else f"{'-':>8} {'-':>8} {'-':>8} {'-':>8}"
+        print(f"{name:<34} {endpoint['ok']:>7} {endpoint['failed']:>7} {endpoint['throughput_rps']:>7.1f} {timings}")
+        if endpoint['skipped']:
+            print(f"{'':<34} skipped {endpoint['skipped']} requests without a known thumbnail")
+
+    server_lag = results['server_event_loop']
+    if server_lag:
+        print(f"Server event loop lag: mean {server_lag['mean_ms']:.1f}ms, "
+              f"worst p99 {server_lag['worst_p99_ms']:.1f}ms, max {server_lag['max_ms']:.1f}ms")
+    else:
+        print("Server event loop lag: not reported by the server")
+    client_lag = results['client_event_loop']
+    if client_lag.get('p99_ms', 0) > 50:
+        print(f"Warning: the load generator itself lagged (p99 {client_lag['p99_ms']:.1f}ms); "
+              f"results may be limited by the client")
+
+async def run(args):
+    scenario = load_scenario(args)
+    process = data_dir = None
+    base_url = args.url
+    try:
+        if args.source:
+            data_dir = tempfile.mkdtemp(prefix='http_load_')
+            process, base_url = _start_server(args, data_dir)
+            await _wait_until_up(base_url, process, args.startup_timeout)
+            # Give the replay a moment to produce faces and thumbnails
+            await asyncio.sleep(args.settle)
+        return await LoadTest(base_url, scenario).run()
+    finally:
+        if process is not None:
+            _stop_server(process)
+        if data_dir is not None:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP load test of the camera server with simulated dashboard clients')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--url', default='http://127.0.0.1:12345',
+                        help='Server to test (default: http://127.0.0.1:12345)')
+    target.add_argument('--source',
+                        help='Start a local server replaying this video file or image directory and test it')
+    parser.add_argument('--pacing', choices=['realtime', 'fixed', 'fast'], default='realtime',
+                        help='Replay pacing of the started server (default: realtime)')
+    parser.add_argument('--scenario',
+                        help='Scenario JSON file (default: one dashboard tab in recognition mode)')
+    parser.add_argument('--clients', type=int,
+                        help='Concurrent clients, overriding the scenario')
+    parser.add_argument('--duration', type=float,
+                        help='Seconds to run, overriding the scenario')
+    parser.add_argument('--startup-timeout', type=float, default=120.0,
+                        help='Seconds to wait for the started server (default: 120)')
+    parser.add_argument('--settle', type=float, default=5.0,
+                        help='Seconds between server start and the test (default: 5)')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    try:
+        results = asyncio.run(run(args))
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"Load test failed: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print_results(results)
+    if args.json:
+        write_json(args.json, 'http_load', vars(args), results)
+
+if __name__ == "__main__":
+    main()
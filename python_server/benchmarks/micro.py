@@ -0,0 +1,147 @@
+"""
+Micro-benchmarks for gallery scoring and face memory persistence.
+
+- comparison: FaceComparisonService.score_batch and best_matches, and
+  GalleryPartition.best_match (with the candidate filter where the server
+  would use it), against synthetic galleries of increasing size
+- storage: FaceMemory.save_to_storage (time the caller is blocked, and time
+  until the file is written) and _load_from_storage, on a temporary directory
+
+Usage (from the python_server directory):
+    python -m benchmarks.micro
+    python -m benchmarks.micro --suite comparison --sizes 100 10000 1000000 --json micro.json
+"""
+import argparse
+import concurrent.futures
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from constants import FaceRecognition as FR
+from face_comparison_service import FaceComparisonService
+from face_memory import FaceMemory
+from gallery import GalleryPartition, GalleryProjection
+from benchmarks.report import summarize, write_json
+from benchmarks.synthetic import inject_people, make_centers, make_memory_people, make_samples
+
+def _time(function, repeats):
+    """Call a function repeatedly, returning the timing of each call in milliseconds."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def _repeats_for(size, requested):
+    """Fewer repeats for huge galleries, so a run stays within minutes."""
+    return max(3, min(requested, 2_000_000 // max(size, 1)))
+
+def run_comparison(sizes, queries, repeats, seed=0):
+    service = FaceComparisonService.get_instance()
+    rng = np.random.default_rng(seed)
+    rows = []
+
+    for size in sizes:
+        centers = make_centers(size, rng)
+        gallery = make_samples(centers, 1, rng)[:, 0]
+        batch = make_samples(centers[rng.integers(0, size, size=queries)], 1, rng)[:, 0]
+        single = batch[0]
+        count = _repeats_for(size, repeats)
+
+        exact = GalleryPartition(tuple(range(size)), gallery)
+        projection = GalleryProjection.fit(gallery)
+        partition = GalleryPartition(exact.ids, gallery, 1, projection)
+
+        rows.append({
+            'gallery_rows': size,
+            'repeats': count,
+            'score_batch_single': summarize(_time(
+                lambda: service.score_batch(single, gallery, normalized=True), count)),
+            'best_matches_batch': summarize(_time(
+                lambda: service.best_matches(batch, gallery, normalized=True), count)),
+            'best_matches_per_query_ms': None,
+            'partition_best_match': summarize(_time(
+                lambda: partition.best_match(single, FR.COSINE_THRESHOLD, FR.NORM_L2_THRESHOLD), count)),
+            'candidate_filter': partition.projected is not None
+        })
+        rows[-1]['best_matches_per_query_ms'] = round(rows[-1]['best_matches_batch']['mean_ms'] / queries, 4)
+    return rows
+
+def run_storage(sizes, exemplars, repeats, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+
+    for size in sizes:
+        storage_dir = tempfile.mkdtemp(prefix='face_memory_bench_')
+        memory = None
+        try:
+            memory = FaceMemory(storage_dir=storage_dir)
+            inject_people(memory, make_memory_people(size, exemplars, rng, thumbnails_dir=memory.thumbnails_dir))
+
+            blocked, written = [], []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                memory.save_to_storage()
+                blocked.append((time.perf_counter() - start) * 1000)
+                concurrent.futures.wait(list(memory._save_results))
+                written.append((time.perf_counter() - start) * 1000)
+
+            file_bytes = os.path.getsize(memory._get_storage_path())
+            load = _time(memory._load_from_storage, repeats)
+
+            rows.append({
+                'people': size,
+                'exemplars': exemplars,
+                'file_mb': round(file_bytes / 1e6, 2),
+                'save_blocking': summarize(blocked),
+                'save_written': summarize(written),
+                'load': summarize(load)
+            })
+        finally:
+            if memory is not None:
+                memory.shutdown()
+            shutil.rmtree(storage_dir, ignore_errors=True)
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks for gallery scoring and face memory storage')
+    parser.add_argument('--suite', choices=['comparison', 'storage', 'all'], default='all',
+                        help='Benchmarks to run (default: all)')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000, 1000000],
+                        help='Gallery sizes for the comparison suite (default: 100 to 1000000)')
+    parser.add_argument('--storage-sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='People in memory for the storage suite (default: 100 1000 10000)')
+    parser.add_argument('--queries', type=int, default=32,
+                        help='Queries per best_matches batch (default: 32)')
+    parser.add_argument('--exemplars', type=int, default=FR.MAX_EXEMPLARS,
+                        help=f'Exemplars per person for the storage suite (default: {FR.MAX_EXEMPLARS})')
+    parser.add_argument('--repeats', type=int, default=20,
+                        help='Timed calls per measurement, reduced for huge galleries (default: 20)')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = {}
+    if args.suite in ('comparison', 'all'):
+        results['comparison'] = run_comparison(args.sizes, args.queries, args.repeats)
+        print(f"{'rows':>9} {'score 1q ms':>12} {'batch ms':>10} {'per q ms':>9} {'partition ms':>13} {'filtered':>9}")
+        for row in results['comparison']:
+            print(f"{row['gallery_rows']:>9} {row['score_batch_single']['p50_ms']:>12.3f} "
+                  f"{row['best_matches_batch']['p50_ms']:>10.3f} {row['best_matches_per_query_ms']:>9.3f} "
+                  f"{row['partition_best_match']['p50_ms']:>13.3f} {str(row['candidate_filter']):>9}")
+
+    if args.suite in ('storage', 'all'):
+        results['storage'] = run_storage(args.storage_sizes, args.exemplars, max(1, min(args.repeats, 5)))
+        print(f"{'people':>8} {'file MB':>8} {'save blocks ms':>15} {'save total ms':>14} {'load ms':>9}")
+        for row in results['storage']:
+            print(f"{row['people']:>8} {row['file_mb']:>8.2f} {row['save_blocking']['p50_ms']:>15.1f} "
+                  f"{row['save_written']['p50_ms']:>14.1f} {row['load']['p50_ms']:>9.1f}")
+
+    if args.json:
+        write_json(args.json, 'micro', vars(args), results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+End-to-end benchmark of the recognition pipeline against synthetic galleries.
+
+Replays a video file or image directory through FileCameraProvider as fast
+as possible and times every stage of a frame - capture, decode, detect,
+embed, match, memory update and render - with FaceMemory pre-filled with
+synthetic people, so matching cost reflects a gallery of the given size.
+The faces in the source do not match anyone in the synthetic gallery; they
+become new unnamed people on their first frame and are tracked afterwards,
+like visitors at a busy door.
+
+Usage (from the python_server directory):
+    python -m benchmarks.pipeline --source recording.mp4
+    python -m benchmarks.pipeline --source frames/ --gallery-sizes 100 100000 1000000 --json pipeline.json
+"""
+import argparse
+import asyncio
+import functools
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from camera_provider import FileCameraProvider
+from face_memory import FaceMemory
+from face_processor import FaceProcessor
+from benchmarks.report import summarize, write_json
+from benchmarks.synthetic import inject_people, make_memory_people
+
+ASSETS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'assets')
+
+class StageTimer:
+    """Accumulates time spent in wrapped methods during the current frame."""
+
+    def __init__(self):
+        self.current = {}
+
+    def wrap(self, owner, name, stage):
+        """Replace a method on an instance with a version that times its calls."""
+        method = getattr(owner, name)
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.current[stage] = self.current.get(stage, 0.0) + (time.perf_counter() - start) * 1000
+
+        setattr(owner, name, timed)
+
+    def take(self):
+        """Get the stage times of the frame that just finished and start a new one."""
+        current, self.current = self.current, {}
+        return current
+
+def _make_processor(memory, detection_model, recognition_model, embedding_cache):
+    processor = FaceProcessor(with_memory=False)
+    processor.memory = memory
+    if not processor.load_models(detection_model, recognition_model):
+        raise RuntimeError("Failed to load face models")
+    if not embedding_cache:
+        processor.embedding_cache = None
+    return processor
+
+async def _run_frames(provider, processor, timer, frames, warmup):
+    """Process frames and return per-frame stage timings, skipping warm-up frames."""
+    stages = {name: [] for name in
+              ('capture', 'decode', 'detect', 'embed', 'match', 'update', 'recognize', 'render', 'end_to_end')}
+    faces_seen = 0
+    start_wall = None
+
+    for index in range(warmup + frames):
+        if index == warmup:
+            start_wall = time.perf_counter()
+        frame_start = time.perf_counter()
+
+        jpeg_data = await provider.get_frame()
+        if jpeg_data is None:
+            break
+        captured = time.perf_counter()
+
+        img = cv2.imdecode(np.frombuffer(jpeg_data, np.uint8), cv2.IMREAD_COLOR)
+        decoded = time.perf_counter()
+
+        detections = processor.run_detection(img)
+        detected = time.perf_counter()
+
+        timer.take()
+        faces = processor.analyze_faces(img, detections) if detections is not None else []
+        recognized = time.perf_counter()
+        inner = timer.take()
+
+        processor.render_recognitions(img, faces)
+        rendered = time.perf_counter()
+
+        if index < warmup:
+            continue
+        faces_seen += len(faces)
+        stages['capture'].append((captured - frame_start) * 1000)
+        stages['decode'].append((decoded - captured) * 1000)
+        stages['detect'].append((detected - decoded) * 1000)
+        for stage in ('embed', 'match', 'update'):
+            stages[stage].append(inner.get(stage, 0.0))
+        stages['recognize'].append((recognized - detected) * 1000)
+        stages['render'].append((rendered - recognized) * 1000)
+        stages['end_to_end'].append((rendered - frame_start) * 1000)
+
+    elapsed = time.perf_counter() - start_wall if start_wall else 0.0
+    processed = len(stages['end_to_end'])
+    return {
+        'frames': processed,
+        'faces': faces_seen,
+        'throughput_fps': round(processed / elapsed, 2) if elapsed > 0 else None,
+        'stages': {name: summarize(values) for name, values in stages.items()}
+    }
+
+def run(args):
+    rng = np.random.default_rng(args.seed)
+    rows = []
+
+    for size in args.gallery_sizes:
+        storage_dir = tempfile.mkdtemp(prefix='pipeline_bench_')
+        memory = None
+        try:
+            memory = FaceMemory(storage_dir=storage_dir)
+            inject_people(memory, make_memory_people(size, args.exemplars, rng))
+            processor = _make_processor(memory, args.detection_model, args.recognition_model, args.embedding_cache)
+
+            timer = StageTimer()
+            timer.wrap(processor, '_compute_feature', 'embed')
+            timer.wrap(processor, '_find_matching_tracked_face', 'match')
+            timer.wrap(processor, '_find_matching_known_face', 'match')
+            for name in ('update_person', 'add_person', 'add_thumbnail'):
+                timer.wrap(memory, name, 'update')
+
+            # Every gallery size sees the same frames from the start
+            provider = FileCameraProvider(args.source, pacing='fast', loop=True)
+            if not asyncio.run(provider.open_camera()):
+                raise RuntimeError(f"Failed to open {args.source}")
+            result = asyncio.run(_run_frames(provider, processor, timer, args.frames, args.warmup))
+            asyncio.run(provider.close_camera())
+
+            result['gallery_people'] = size
+            result['gallery_rows'] = int(sum(p.matrix.shape[0] for p in (memory.get_snapshot().named,
+                                                                         memory.get_snapshot().unnamed)))
+            rows.append(result)
+        finally:
+            if memory is not None:
+                memory.shutdown()
+            shutil.rmtree(storage_dir, ignore_errors=True)
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end recognition pipeline benchmark')
+    parser.add_argument('--source', required=True,
+                        help='Video file or image directory with faces to replay')
+    parser.add_argument('--gallery-sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000],
+                        help='Synthetic people in memory (default: 100 1000 10000 100000; '
+                             '1000000 needs several GB of RAM)')
+    parser.add_argument('--exemplars', type=int, default=1,
+                        help='Exemplars per synthetic person (default: 1)')
+    parser.add_argument('--frames', type=int, default=300,
+                        help='Timed frames per gallery size (default: 300)')
+    parser.add_argument('--warmup', type=int, default=10,
+                        help='Untimed frames before measuring (default: 10)')
+    parser.add_argument('--embedding-cache', action='store_true',
+                        help='Keep the embedding cache on; off by default because a looping source '
+                             'would hit it far more often than a live camera')
+    parser.add_argument('--detection-model', default=os.path.join(ASSETS_DIR, 'face_detection_yunet_2023mar.onnx'),
+                        help='Path to the YuNet detection model')
+    parser.add_argument('--recognition-model', default=os.path.join(ASSETS_DIR, 'face_recognition_sface_2021dec.onnx'),
+                        help='Path to the SFace recognition model')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for the synthetic galleries (default: 0)')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    for path in (args.detection_model, args.recognition_model):
+        if not os.path.exists(path):
+            print(f"Model not found: {path}", file=sys.stderr)
+            sys.exit(1)
+
+    rows = run(args)
+
+    print(f"{'people':>8} {'fps':>7} {'e2e p50':>8} {'e2e p99':>8} {'detect':>7} {'embed':>7} "
+          f"{'match':>7} {'update':>7} {'render':>7}")
+    for row in rows:
+        stages = row['stages']
+        if not stages['end_to_end']:
+            print(f"{row['gallery_people']:>8} no frames processed")
+            continue
+        print(f"{row['gallery_people']:>8} {row['throughput_fps']:>7.1f} {stages['end_to_end']['p50_ms']:>8.2f} "
+              f"{stages['end_to_end']['p99_ms']:>8.2f} {stages['detect']['p50_ms']:>7.2f} "
+              f"{stages['embed']['p50_ms']:>7.2f} {stages['match']['p50_ms']:>7.2f} "
+              f"{stages['update']['p50_ms']:>7.2f} {stages['render']['p50_ms']:>7.2f}")
+
+    if args.json:
+        write_json(args.json, 'pipeline', vars(args), rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Shared helpers for summarizing benchmark timings and writing JSON reports.
+
+Reports carry the git commit and platform next to the results, so files
+from two commits can be compared directly.
+"""
+import datetime
+import json
+import os
+import platform
+import subprocess
+
+import numpy as np
+
+def summarize(milliseconds):
+    """Summarize a list of timings in milliseconds.
+
+    Returns:
+        dict: count, mean, p50, p90, p99 and max, or None if there are no timings
+    """
+    if not milliseconds:
+        return None
+    values = np.asarray(milliseconds, dtype=np.float64)
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {
+        'count': int(values.size),
+        'mean_ms': round(float(values.mean()), 4),
+        'p50_ms': round(float(p50), 4),
+        'p90_ms': round(float(p90), 4),
+        'p99_ms': round(float(p99), 4),
+        'max_ms': round(float(values.max()), 4)
+    }
+
+def git_commit():
+    """Get the commit the benchmark ran on, or None outside a git checkout."""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+            text=True
+        ).strip()
+    except Exception:
+        return None
+
+def write_json(path, benchmark, parameters, results):
+    """Write a benchmark report.
+
+    Args:
+        path (str): Output file
+        benchmark (str): Name of the benchmark
+        parameters (dict): Settings the benchmark ran with
+        results: JSON-serializable results
+    """
+    import cv2
+
+    report = {
+        'benchmark': benchmark,
+        'commit': git_commit(),
+        'timestamp': datetime.datetime.now().isoformat(),
+        'platform': {
+            'machine': platform.machine(),
+            'system': platform.system(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'cpu_count': os.cpu_count()
+        },
+        'parameters': parameters,
+        'results': results
+    }
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
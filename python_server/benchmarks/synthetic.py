@@ -0,0 +1,98 @@
+"""
+Synthetic face embeddings for benchmarks that cannot ship real face data.
+
+Identity centers are drawn from a space with a decaying spectrum, like real
+face embeddings, and each identity's samples are its center plus noise, with
+the noise level chosen so same-identity cosine similarity lands around the
+values SFace produces.
+"""
+import numpy as np
+
+DIMENSIONS = 128
+
+def _normalize(vectors):
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+def make_centers(count, rng, dimensions=DIMENSIONS):
+    """Create normalized identity centers, one per row."""
+    spectrum = np.exp(-np.arange(dimensions) / 24.0)
+    return _normalize(rng.standard_normal((count, dimensions)) * spectrum)
+
+def make_samples(centers, per_identity, rng, noise=0.6):
+    """Create normalized noisy samples of identities.
+
+    Args:
+        centers (numpy.ndarray): Identity centers from make_centers
+        per_identity (int): Samples per identity
+        noise (float): Noise norm relative to the (unit) center
+
+    Returns:
+        numpy.ndarray: Array of shape (len(centers), per_identity, dim)
+    """
+    count, dimensions = centers.shape
+    jitter = rng.standard_normal((count, per_identity, dimensions)) * (noise / np.sqrt(dimensions))
+    samples = centers[:, None, :] + jitter
+    return _normalize(samples.reshape(-1, dimensions)).reshape(count, per_identity, dimensions)
+
+class SyntheticPerson:
+    """Minimal stand-in for Person with the attributes GalleryPartition reads."""
+
+    def __init__(self, person_id, exemplars):
+        self.id = person_id
+        self.exemplars = exemplars
+        self.feature_vector = exemplars.mean(axis=0, keepdims=True)
+
+    def get_exemplars(self):
+        return self.exemplars
+
+def make_people(centers, exemplars_per_person, rng, prefix="Face_"):
+    """Create SyntheticPerson objects with noisy exemplars for each identity."""
+    samples = make_samples(centers, exemplars_per_person, rng)
+    return [SyntheticPerson(f"{prefix}{i:08d}", samples[i]) for i in range(len(centers))]
+
+def make_memory_people(count, exemplars_per_person, rng, named_fraction=0.1, thumbnails_dir=None):
+    """Create real Person objects with synthetic exemplars, ready for FaceMemory.
+
+    Args:
+        count (int): Number of people
+        exemplars_per_person (int): Exemplar embeddings per person
+        rng (numpy.random.Generator): Random generator
+        named_fraction (float): Fraction of people marked as named
+        thumbnails_dir (str, optional): Thumbnails directory given to each Person
+    """
+    from person import Person
+
+    people = []
+    named_count = int(count * named_fraction)
+    # Generate in chunks so a million people never need one huge sample array
+    for start in range(0, count, 10000):
+        centers = make_centers(min(10000, count - start), rng)
+        samples = make_samples(centers, exemplars_per_person, rng)
+        for offset, exemplars in enumerate(samples):
+            index = start + offset
+            is_named = index < named_count
+            person = Person(f"Person_{index:08d}" if is_named else f"Face_{index:08d}",
+                            is_named=is_named, thumbnails_dir=thumbnails_dir)
+            person.exemplars = exemplars
+            mean = exemplars.mean(axis=0)
+            person.feature_vector = (mean / np.linalg.norm(mean)).reshape(1, -1).astype(np.float32)
+            person.appearance_count = int(rng.integers(1, 50))
+            people.append(person)
+    return people
+
+def inject_people(memory, people):
+    """Add Person objects to a FaceMemory in one mutation and publish one snapshot.
+
+    Much faster than add_person per person, which publishes a snapshot each
+    time. The candidate filter projection is fitted right away, as the
+    background refit would for a gallery of this size.
+    """
+    with memory._lock:
+        memory._revision += 1
+        for person in people:
+            person.last_modified_rev = memory._revision
+            memory.people[person.id] = person
+            memory._modified_order[person.id] = memory._revision
+        memory._people_changed = True
+        memory._publish_snapshot()
+    memory.refit_projection(force=True)
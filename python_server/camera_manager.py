@@ -0,0 +1,515 @@
+import asyncio
+import functools
+import logging
+import os
+import threading
+import time
+import concurrent.futures
+import multiprocessing
+import cv2
+import numpy as np
+from camera_provider import BaseCameraProvider
+from detection_batcher import DetectionBatcher
+from constants import DetectionBatching, FrameRing, MultiCamera, RecognitionSchedule
+from face_processor import FaceProcessor
+from frame_ring import SharedFrameRing
+from metrics import STAGE_SECONDS
+from recognition_scheduler import AdaptiveScheduler
+
+logger = logging.getLogger(__name__)
+
+# Frame ring and face processor of the current worker process, created by _init_process_worker
+_worker_ring = None
+_worker_processor = None
+
+def _init_process_worker(ring_descriptor, detection_model_path, recognition_model_path, load_options):
+    """Attach to the frame ring and load one set of face models per worker process."""
+    global _worker_ring, _worker_processor
+    _worker_processor = FaceProcessor(with_memory=False)
+    if not _worker_processor.load_models(detection_model_path, recognition_model_path, **load_options):
+        raise RuntimeError("Failed to load face models in worker process")
+    _worker_ring = SharedFrameRing.attach(ring_descriptor)
+
+def _extract_worker(ref, roi):
+    """Detect faces and compute their embeddings in a frame of the ring, read in place.
+
+    The server process holds a reference on the frame until this returns.
+
+    Returns:
+        tuple: (detections, embeddings), see FaceProcessor.extract_frame_faces
+    """
+    return _worker_processor.extract_frame_faces(_worker_ring.read(ref), roi)
+
+class CameraStream(BaseCameraProvider):
+    """Runs a camera provider on its own capture thread and keeps its latest frame.
+
+    Providers capture with blocking calls behind an async interface, so each
+    one gets a thread with a private event loop. Readers never wait on the
+    camera; get_frame returns the most recent JPEG immediately, which also
+    lets a stream stand in for its provider wherever one is expected.
+
+    With a frame ring set, the capture thread also decodes up to one frame
+    per ring interval into the ring, so worker processes read it from shared
+    memory. The stream holds a reference on its latest frame in the ring.
+    """
+
+    def __init__(self, camera_id, provider, capture_fps=MultiCamera.CAPTURE_FPS):
+        """Initialize a stream.
+
+        Args:
+            camera_id (str): Name of the camera used in endpoints
+            provider (BaseCameraProvider): Unopened camera provider
+            capture_fps (float): Frames per second read from the camera
+        """
+        super().__init__()
+        self.camera_id = camera_id
+        self.provider = provider
+        self._interval = 1.0 / capture_fps if capture_fps > 0 else 0.0
+        self._lock = threading.Lock()
+        self._jpeg = None
+        self._frame_time = None
+        self.frame_seq = 0  # Incremented for every captured frame
+        self.capture_errors = 0
+        self._thread = None
+        self._opened = threading.Event()
+        self._stop_event = threading.Event()
+        self.ring = None  # SharedFrameRing frames are decoded into; None leaves decoding to the workers
+        self.ring_interval = 0.0  # Minimum seconds between frames written to the ring
+        self._ring_frame = None  # (frame_seq, capture time, FrameRef) of the latest frame in the ring
+        self._last_ring_write = 0.0
+
+    async def open_camera(self, timeout=MultiCamera.OPEN_TIMEOUT):
+        """Start the capture thread and wait until the camera is open."""
+        self._thread = threading.Thread(target=self._run, name=f"camera-{self.camera_id}", daemon=True)
+        self._thread.start()
+        loop = asyncio.get_running_loop()
+        if not await loop.run_in_executor(None, self._opened.wait, timeout):
+            logger.error(f"Camera {self.camera_id} did not open within {timeout:.0f}s")
+            self._stop_event.set()
+        return self.is_open
+
+    def _run(self):
+        """Capture loop of the camera thread."""
+        loop = asyncio.new_event_loop()
+        try:
+            try:
+                self.is_open = bool(loop.run_until_complete(self.provider.open_camera()))
+            except Exception as e:
+                logger.error(f"Error opening camera {self.camera_id}: {e}")
+            finally:
+                self._opened.set()
+            if not self.is_open:
+                return
+
+            logger.info(f"Capture thread started for camera {self.camera_id}")
+            while not self._stop_event.is_set():
+                start = time.monotonic()
+                try:
+                    with STAGE_SECONDS.labels(stage='capture').time():
+                        jpeg_data = loop.run_until_complete(self.provider.get_frame())
+                except Exception as e:
+                    logger.error(f"Error capturing from camera {self.camera_id}: {e}")
+                    jpeg_data = None
+
+                if jpeg_data is None:
+                    self.capture_errors += 1
+                else:
+                    with self._lock:
+                        self._jpeg = jpeg_data
+                        self._frame_time = time.time()
+                        self.frame_seq += 1
+                        frame_seq, frame_time = self.frame_seq, self._frame_time
+                    if self.ring is not None and start - self._last_ring_write >= self.ring_interval:
+                        self._last_ring_write = start
+                        self._write_ring(jpeg_data, frame_seq, frame_time)
+
+                self._stop_event.wait(max(0.0, self._interval - (time.monotonic() - start)))
+        finally:
+            self.is_open = False
+            try:
+                loop.run_until_complete(self.provider.close_camera())
+            except Exception as e:
+                logger.error(f"Error closing camera {self.camera_id}: {e}")
+            loop.close()
+
+    def _write_ring(self, jpeg_data, frame_seq, frame_time):
+        """Decode a frame into the ring and make it the latest frame of the stream there."""
+        try:
+            with STAGE_SECONDS.labels(stage='decode').time():
+                img = cv2.imdecode(np.frombuffer(jpeg_data, np.uint8), cv2.IMREAD_COLOR)
+            if img is None:
+                return
+            ref = self.ring.write(img)
+        except ValueError as e:
+            logger.warning(f"Camera {self.camera_id} frames do not fit the frame ring, "
+                           f"recognizing them on threads instead: {e}")
+            self._release_ring_frame()
+            self.ring = None
+            return
+        except Exception as e:
+            logger.error(f"Error writing frame of camera {self.camera_id} to the frame ring: {e}")
+            return
+        if ref is None:
+            return  # Every slot is referenced; the previous frame stays the latest
+        with self._lock:
+            previous, self._ring_frame = self._ring_frame, (frame_seq, frame_time, ref)
+        if previous is not None:
+            self.ring.release(previous[2])
+
+    def acquire_ring_frame(self, after_seq):
+        """Take a reference on the latest frame in the ring if it is newer than a frame.
+
+        Args:
+            after_seq (int): frame_seq of the last frame processed
+
+        Returns:
+            tuple: (frame_seq, capture time, FrameRef) that the caller must
+            release on the ring, or None if there is no newer frame
+        """
+        with self._lock:
+            ring, ring_frame = self.ring, self._ring_frame
+            # The stream's own reference keeps the slot from being reused meanwhile
+            if ring is None or ring_frame is None or ring_frame[0] <= after_seq or not ring.acquire(ring_frame[2]):
+                return None
+            return ring_frame
+
+    def _release_ring_frame(self):
+        """Give up the stream's reference on its latest frame in the ring."""
+        with self._lock:
+            ring_frame, self._ring_frame = self._ring_frame, None
+        if ring_frame is not None:
+            self.ring.release(ring_frame[2])
+
+    async def get_frame(self):
+        """Get the latest JPEG-encoded frame, or None if none was captured yet."""
+        with self._lock:
+            return self._jpeg
+
+    def get_latest(self):
+        """Get the latest frame with its sequence number.
+
+        Returns:
+            tuple: (frame_seq, JPEG bytes, capture time)
+        """
+        with self._lock:
+            return self.frame_seq, self._jpeg, self._frame_time
+
+    async def close_camera(self):
+        """Stop the capture thread, which closes the camera."""
+        self._stop_event.set()
+        if self._thread is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._thread.join, 5.0)
+        if self.ring is not None:
+            self._release_ring_frame()
+        logger.info(f"Camera {self.camera_id} stopped after {self.frame_seq} frames")
+
+class CameraManager:
+    """Recognizes faces from several cameras with one set of shared workers.
+
+    Every camera captures on its own thread, and a dispatcher hands the
+    latest frame of each camera to a shared thread pool in round-robin
+    order. A camera has at most one frame in flight and is processed at
+    most PROCESS_FPS times per second, so each camera gets a fair share of
+    the workers. All cameras update the same FaceMemory through the shared
+    FaceProcessor; each worker thread uses its own copy of the models.
+
+    With worker processes, detection and embedding run in a process pool
+    instead, so they are not limited by the GIL. Capture threads decode
+    frames into a SharedFrameRing at the processing rate, and processes read
+    them from shared memory by slot rather than receiving pickled copies.
+    Matching and face memory updates stay on the worker threads, which also
+    skip the recognition scheduler: every frame gets full recognition.
+    """
+
+    def __init__(self, face_processor, roi_store, workers=MultiCamera.WORKERS,
+                 process_fps=MultiCamera.PROCESS_FPS, batch_detection=DetectionBatching.ENABLED,
+                 worker_processes=FrameRing.PROCESSES):
+        """Initialize the manager.
+
+        Args:
+            face_processor (FaceProcessor): Processor with loaded models and face memory
+            roi_store (RoiStore): Regions of interest per camera
+            workers (int, optional): Recognition worker threads; defaults to one
+                per camera, up to the CPU count
+            process_fps (float): Maximum frames per second recognized per camera
+            batch_detection (bool): Whether workers detecting at the same time
+                share one detector call
+            worker_processes (int): Processes that detect faces and compute
+                embeddings; 0 keeps all recognition on the worker threads
+        """
+        self.face_processor = face_processor
+        self.roi_store = roi_store
+        self.workers = workers
+        self._min_interval = 1.0 / process_fps if process_fps > 0 else 0.0
+        self.batcher = DetectionBatcher(face_processor) if batch_detection else None
+        self.worker_processes = worker_processes
+        self.ring = None
+        self._process_pool = None
+
+        self.streams = {}  # Maps camera ID to CameraStream, in configuration order
+        self._schedulers = {}
+        self._results = {}
+        self._processed_seq = {}
+        self._last_dispatch = {}
+        self._frames_processed = {}
+        self._in_flight = set()
+
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._executor = None
+        self._dispatcher = None
+
+    def add_camera(self, camera_id, provider, capture_fps=MultiCamera.CAPTURE_FPS):
+        """Register a camera provider; call before start.
+
+        Returns:
+            CameraStream: The stream wrapping the provider
+        """
+        if camera_id in self.streams:
+            raise ValueError(f"Duplicate camera ID: {camera_id}")
+        stream = CameraStream(camera_id, provider, capture_fps)
+        self.streams[camera_id] = stream
+        self._schedulers[camera_id] = AdaptiveScheduler(self.face_processor, batcher=self.batcher) \
+            if RecognitionSchedule.ENABLED else None
+        self._processed_seq[camera_id] = 0
+        self._last_dispatch[camera_id] = 0.0
+        self._frames_processed[camera_id] = 0
+        return stream
+
+    async def start(self):
+        """Open all cameras concurrently and start processing their frames.
+
+        Returns:
+            list: IDs of the cameras that opened; the others are left out
+        """
+        opened = await self.open_cameras()
+        self.start_processing()
+        return opened
+
+    async def open_cameras(self):
+        """Open all cameras concurrently; they capture but nothing is processed yet.
+
+        Returns:
+            list: IDs of the cameras that opened; the others are left out
+        """
+        results = await asyncio.gather(*(stream.open_camera() for stream in self.streams.values()))
+        opened = [camera_id for camera_id, ok in zip(self.streams, results) if ok]
+        for camera_id, ok in zip(list(self.streams), results):
+            if not ok:
+                logger.error(f"Camera {camera_id} failed to open and will not be processed")
+        return opened
+
+    def start_processing(self):
+        """Start recognizing faces in the frames of the open cameras.
+
+        Needs the face models and face memory to be loaded.
+        """
+        opened = [camera_id for camera_id, stream in self.streams.items() if stream.is_open]
+        if self.workers is None:
+            self.workers = max(1, min(len(self.streams), os.cpu_count() or 1))
+        if self.worker_processes and opened:
+            self._start_process_pool(opened)
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix='recognition')
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name='camera-dispatcher', daemon=True)
+        self._dispatcher.start()
+        logger.info(f"Processing {len(opened)} of {len(self.streams)} cameras with {self.workers} workers"
+                    + (f" and {self.worker_processes} processes" if self._process_pool is not None else ""))
+
+    def _start_process_pool(self, camera_ids):
+        """Create the frame ring and the worker processes, and have the cameras write into the ring."""
+        model_options = self.face_processor.get_model_options()
+        if model_options is None:
+            logger.error("Face models are not loaded, so worker processes are not started")
+            return
+        # Processes are spawned rather than forked from a process running threads
+        context = multiprocessing.get_context('spawn')
+        self.ring = SharedFrameRing.create(FrameRing.SLOTS_PER_CAMERA * len(camera_ids), context=context)
+        self._process_pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.worker_processes, mp_context=context,
+            initializer=_init_process_worker, initargs=(self.ring.descriptor(), *model_options))
+        for camera_id in camera_ids:
+            stream = self.streams[camera_id]
+            stream.ring = self.ring
+            stream.ring_interval = self._min_interval
+
+    async def stop(self):
+        """Stop processing and close every camera."""
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        loop = asyncio.get_running_loop()
+        if self._dispatcher is not None:
+            await loop.run_in_executor(None, self._dispatcher.join, 5.0)
+        if self._executor is not None:
+            await loop.run_in_executor(None, functools.partial(self._executor.shutdown, wait=True))
+        if self._process_pool is not None:
+            await loop.run_in_executor(None, functools.partial(self._process_pool.shutdown, wait=True))
+        await asyncio.gather(*(stream.close_camera() for stream in self.streams.values()))
+        if self.ring is not None:
+            self.ring.close()
+
+    def _ready(self, camera_id, now):
+        """Check whether a camera has a new frame and may be dispatched; called with the lock held."""
+        stream = self.streams[camera_id]
+        return (camera_id not in self._in_flight
+                and stream.is_open
+                and stream.frame_seq > self._processed_seq[camera_id]
+                and now - self._last_dispatch[camera_id] >= self._min_interval)
+
+    def _dispatch_loop(self):
+        """Hand frames to the workers, one camera at a time in round-robin order."""
+        order = list(self.streams)
+        position = 0
+        while not self._stop_event.is_set():
+            with self._condition:
+                camera_id = None
+                if len(self._in_flight) < self.workers:
+                    now = time.monotonic()
+                    for step in range(len(order)):
+                        candidate = order[(position + step) % len(order)]
+                        if self._ready(candidate, now):
+                            camera_id = candidate
+                            position = (position + step + 1) % len(order)
+                            break
+                if camera_id is None:
+                    # Woken early when a worker finishes; otherwise poll for new frames
+                    self._condition.wait(0.01)
+                    continue
+                self._in_flight.add(camera_id)
+                self._last_dispatch[camera_id] = now
+
+            try:
+                self._executor.submit(self._process, camera_id)
+            except RuntimeError:
+                break  # Executor shut down
+
+    def _process(self, camera_id):
+        """Recognize faces in the latest frame of a camera on a worker thread."""
+        stream = self.streams[camera_id]
+        start = time.perf_counter()
+        use_ring = self._process_pool is not None and stream.ring is not None
+        ring_frame = None
+        frame_seq = None
+        try:
+            # A frame in the ring older than the latest capture is only used if it was not processed yet
+            if use_ring:
+                ring_frame = stream.acquire_ring_frame(self._processed_seq[camera_id])
+            roi = self.roi_store.get(camera_id)
+            if ring_frame is None:
+                frame_seq, jpeg_data, frame_time = stream.get_latest()
+                with STAGE_SECONDS.labels(stage='decode').time():
+                    img = cv2.imdecode(np.frombuffer(jpeg_data, np.uint8), cv2.IMREAD_COLOR)
+                if img is None:
+                    raise ValueError("Could not decode frame")
+                if use_ring:
+                    # The capture thread has not written this frame yet, so write it here
+                    ref = self._write_ring(img)
+                    ring_frame = (frame_seq, frame_time, ref) if ref is not None else None
+
+            if ring_frame is not None:
+                frame_seq, frame_time, ref = ring_frame
+                faces = self._process_in_worker(ref, roi)
+            else:
+                faces = self._process_in_thread(camera_id, img, roi)
+
+            result = {
+                'faces': faces,
+                'frame_seq': frame_seq,
+                'frame_time': frame_time,
+                'processing_ms': round((time.perf_counter() - start) * 1000, 2)
+            }
+            with self._condition:
+                self._results[camera_id] = result
+                self._frames_processed[camera_id] += 1
+        except Exception as e:
+            logger.error(f"Error processing frame {frame_seq} of camera {camera_id}: {e}", exc_info=True)
+        finally:
+            if ring_frame is not None:
+                self.ring.release(ring_frame[2])
+            with self._condition:
+                if frame_seq is not None:
+                    self._processed_seq[camera_id] = frame_seq
+                self._in_flight.discard(camera_id)
+                self._condition.notify_all()
+
+    def _write_ring(self, img):
+        """Write a frame into the ring with a reference for the caller, or return None if it does not fit."""
+        try:
+            return self.ring.write(img)
+        except ValueError:
+            return None
+
+    def _process_in_worker(self, ref, roi):
+        """Recognize faces in a frame of the ring, detecting and embedding them in a worker process.
+
+        The caller holds a reference on the frame, so it does not change meanwhile.
+        """
+        pool = self._process_pool
+        try:
+            with STAGE_SECONDS.labels(stage='extract').time():
+                detections, features = pool.submit(_extract_worker, ref, roi).result()
+        except concurrent.futures.BrokenExecutor:
+            # E.g. the models failed to load in the processes; later frames go to the threads
+            if self._process_pool is pool:
+                logger.error("Worker processes failed; recognizing frames on threads instead")
+                self._process_pool = None
+                pool.shutdown(wait=False)
+            raise
+        if detections is None:
+            return []
+        # Thumbnails are cut from the frame in shared memory, without copying it first
+        return self.face_processor.analyze_faces(self.ring.read(ref), detections, features=features)
+
+    def _process_in_thread(self, camera_id, img, roi):
+        """Recognize faces in a decoded frame on the calling worker thread."""
+        scheduler = self._schedulers[camera_id]
+        if scheduler is not None:
+            return scheduler.process(img, roi)
+        if self.batcher is not None:
+            detections = self.face_processor.run_detection(img, roi=roi, batcher=self.batcher)
+            return self.face_processor.analyze_faces(img, detections) if detections is not None else []
+        return self.face_processor.analyze_faces(img, roi=roi)
+
+    def get_results(self, camera_id):
+        """Get the latest recognition results of a camera.
+
+        Returns:
+            dict: 'faces' (copies of the face dicts), 'frame_seq', 'frame_time'
+            and 'processing_ms', or None if no frame was processed yet
+        """
+        with self._condition:
+            result = self._results.get(camera_id)
+            if result is None:
+                return None
+            return dict(result, faces=[dict(face) for face in result['faces']])
+
+    def get_in_flight_count(self):
+        """Get the number of frames currently being recognized."""
+        with self._condition:
+            return len(self._in_flight)
+    
+    def get_status(self):
+        """Get capture and processing statistics of every camera."""
+        cameras = {}
+        with self._condition:
+            for camera_id, stream in self.streams.items():
+                result = self._results.get(camera_id)
+                scheduler = self._schedulers[camera_id]
+                cameras[camera_id] = {
+                    'is_open': stream.is_open,
+                    'frames_captured': stream.frame_seq,
+                    'capture_errors': stream.capture_errors,
+                    'frames_processed': self._frames_processed[camera_id],
+                    'last_processing_ms': result['processing_ms'] if result else None,
+                    'faces': len(result['faces']) if result else 0,
+                    'scheduler': scheduler.get_status() if scheduler is not None else None
+                }
+            return {
+                'workers': self.workers,
+                'detection_batching': self.batcher.get_status() if self.batcher is not None else None,
+                'worker_processes': self.worker_processes if self._process_pool is not None else 0,
+                'frame_ring': self.ring.get_status() if self.ring is not None else None,
+                'cameras': cameras
+            }
@@ -1,4 +1,5 @@
 import abc
+import asyncio
 import logging
 import importlib.util
 import numpy as np
@@ -6,13 +7,8 @@ import io
 import traceback
 import sys
 import os
+import time
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
 logger = logging.getLogger(__name__)
 
 class BaseCameraProvider(abc.ABC):
@@ -255,9 +251,10 @@ class OpenCVCameraProvider(BaseCameraProvider):
                 # Get camera status for debug info
                 is_opened = self.cap.isOpened() if self.cap else False
                 
-                logger.error(f"Failed to capture frame: camera_index={self.camera_index}, "
-                             f"is_open={self.is_open}, cap.isOpened={is_opened}, "
-                             f"frame_count={self.frame_count}, error_count={self.error_count}")
+                # Formatted lazily, as this runs for every failed frame
+                logger.error("Failed to capture frame: camera_index=%s, is_open=%s, cap.isOpened=%s, "
+                             "frame_count=%d, error_count=%d", self.camera_index, self.is_open,
+                             is_opened, self.frame_count, self.error_count)
                 
                 # If too many errors, try reopening the camera
                 if self.error_count > 5:
@@ -273,15 +270,13 @@ class OpenCVCameraProvider(BaseCameraProvider):
             
             # Log occasional frame info
             if self.frame_count % 100 == 0:
-                logger.debug(f"Captured frame {self.frame_count}: shape={frame.shape}")
+                logger.debug("Captured frame %d: shape=%s", self.frame_count, frame.shape)
                 
             _, jpeg_data = self.cv2.imencode('.jpg', frame)
             return jpeg_data.tobytes()
         except Exception as e:
-            exc_type, exc_value, exc_traceback = sys.exc_info()
-            stack_trace = traceback.format_exception(exc_type, exc_value, exc_traceback)
-            logger.error(f"Error capturing frame: {e}")
-            logger.debug(f"Stack trace: {''.join(stack_trace)}")
+            logger.error("Error capturing frame: %s", e)
+            logger.debug("Stack trace of the capture error", exc_info=True)
             return None
 
     async def close_camera(self):
@@ -342,7 +337,7 @@ class PiCamera2Provider(BaseCameraProvider):
             _, jpeg_data = cv2.imencode('.jpg', image)
             return jpeg_data.tobytes()
         except Exception as e:
-            logger.error(f"Error capturing frame: {e}")
+            logger.error("Error capturing frame: %s", e)
             return None
 
     async def close_camera(self):
@@ -394,7 +389,7 @@ class PiCameraProvider(BaseCameraProvider):
             self.stream.seek(0)
             return self.stream.read()
         except Exception as e:
-            logger.error(f"Error capturing frame: {e}")
+            logger.error("Error capturing frame: %s", e)
             return None
 
     async def close_camera(self):
@@ -405,13 +400,165 @@ class PiCameraProvider(BaseCameraProvider):
         self.is_open = False
         logger.info("PiCamera closed")
 
-def create_camera_provider(camera_type='auto', camera_index=0):
+class FileCameraProvider(BaseCameraProvider):
+    """Camera provider that replays a video file or a directory of images.
+    
+    Makes throughput measurable without camera hardware. Frames can be
+    paced at the source's own frame rate ('realtime'), at a fixed rate
+    ('fixed') or delivered as fast as they are read ('fast'). Timestamps
+    come from the frame index and rate rather than the wall clock, so the
+    same source replays identically every run.
+    """
+    
+    PACING_MODES = ('realtime', 'fixed', 'fast')
+    IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+    DEFAULT_FPS = 30.0
+    
+    def __init__(self, source, pacing='realtime', fps=None, loop=True):
+        """Initialize the provider.
+        
+        Args:
+            source (str): Path of a video file or a directory of images (read in name order)
+            pacing (str): 'realtime', 'fixed' or 'fast'
+            fps (float, optional): Frame rate for 'fixed' pacing and timestamps;
+                defaults to the video's frame rate, or 30 for image directories
+            loop (bool): Start over at the end of the source instead of stopping
+        """
+        super().__init__()
+        if pacing not in self.PACING_MODES:
+            raise ValueError(f"Unknown pacing mode '{pacing}', expected one of {', '.join(self.PACING_MODES)}")
+        if pacing == 'fixed' and not fps:
+            raise ValueError("Fixed pacing needs a frame rate")
+        self.source = source
+        self.pacing = pacing
+        self.fps = fps
+        self.loop = loop
+        self.cap = None
+        self.images = None
+        self._position = 0  # Index of the next frame within the source
+        self.frame_index = 0  # Frames delivered since opening, across loops
+        self.loop_count = 0
+        self.frame_timestamp = None  # Seconds since the first frame, from the frame index
+        self.finished = False
+        self._start_time = None
+    
+    async def open_camera(self):
+        try:
+            import cv2
+            self.cv2 = cv2
+            
+            if os.path.isdir(self.source):
+                self.images = sorted(
+                    os.path.join(self.source, name) for name in os.listdir(self.source)
+                    if os.path.splitext(name.lower())[1] in self.IMAGE_EXTENSIONS
+                )
+                if not self.images:
+                    logger.error(f"No images found in {self.source}")
+                    return False
+                source_fps = None
+                frame_count = len(self.images)
+            else:
+                self.cap = cv2.VideoCapture(self.source)
+                if not self.cap.isOpened():
+                    logger.error(f"Failed to open video file {self.source}")
+                    return False
+                source_fps = self.cap.get(cv2.CAP_PROP_FPS) or None
+                frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            
+            if self.fps is None:
+                self.fps = source_fps or self.DEFAULT_FPS
+            
+            self._position = 0
+            self.frame_index = 0
+            self.loop_count = 0
+            self.finished = False
+            self._start_time = None
+            self.is_open = True
+            logger.info(f"Replaying {self.source}: {frame_count} frames at {self.fps:.2f} fps, "
+                        f"pacing={self.pacing}, loop={self.loop}")
+            return True
+        except Exception as e:
+            logger.error(f"Error opening file source {self.source}: {e}")
+            return False
+    
+    def _read_next(self):
+        """Read the next frame of the source as JPEG bytes, or None at the end."""
+        if self.images is not None:
+            if self._position >= len(self.images):
+                return None
+            path = self.images[self._position]
+            self._position += 1
+            
+            # JPEG files are served as they are, without decoding and re-encoding
+            if os.path.splitext(path.lower())[1] in ('.jpg', '.jpeg'):
+                with open(path, 'rb') as f:
+                    return f.read()
+            image = self.cv2.imread(path)
+            if image is None:
+                logger.warning(f"Skipping unreadable image {path}")
+                return self._read_next()
+        else:
+            ret, image = self.cap.read()
+            if not ret or image is None:
+                return None
+            self._position += 1
+        
+        _, jpeg_data = self.cv2.imencode('.jpg', image)
+        return jpeg_data.tobytes()
+    
+    def _rewind(self):
+        self._position = 0
+        if self.cap is not None:
+            self.cap.set(self.cv2.CAP_PROP_POS_FRAMES, 0)
+        self.loop_count += 1
+    
+    async def get_frame(self):
+        if not self.is_open or self.finished:
+            return None
+        try:
+            jpeg_data = self._read_next()
+            if jpeg_data is None and self.loop and self._position > 0:
+                self._rewind()
+                jpeg_data = self._read_next()
+            if jpeg_data is None:
+                self.finished = True
+                logger.info(f"Reached the end of {self.source} after {self.frame_index} frames")
+                return None
+            
+            # Wait until this frame is due; a slow reader just gets frames late
+            if self.pacing == 'fast':
+                await asyncio.sleep(0)
+            else:
+                if self._start_time is None:
+                    self._start_time = time.monotonic()
+                delay = self._start_time + self.frame_index / self.fps - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            
+            self.frame_timestamp = self.frame_index / self.fps
+            self.frame_index += 1
+            return jpeg_data
+        except Exception as e:
+            logger.error("Error reading frame from %s: %s", self.source, e)
+            return None
+    
+    async def close_camera(self):
+        if self.cap:
+            self.cap.release()
+        self.is_open = False
+        logger.info(f"File source closed: {self.source}, frames={self.frame_index}, loops={self.loop_count}")
+
+def create_camera_provider(camera_type='auto', camera_index=0, source=None, pacing='realtime', fps=None, loop=True):
     """
     Factory function to create the appropriate camera provider.
     
     Args:
-        camera_type (str): Type of camera provider ('opencv', 'picamera', 'picamera2', or 'auto')
+        camera_type (str): Type of camera provider ('opencv', 'picamera', 'picamera2', 'file', or 'auto')
         camera_index (int): Camera index for OpenCV provider
+        source (str, optional): Video file or image directory for the file provider
+        pacing (str): Pacing of the file provider ('realtime', 'fixed' or 'fast')
+        fps (float, optional): Frame rate of the file provider
+        loop (bool): Whether the file provider starts over at the end of the source
         
     Returns:
         BaseCameraProvider: An instance of the appropriate camera provider
@@ -422,6 +569,10 @@ def create_camera_provider(camera_type='auto', camera_index=0):
         return PiCameraProvider()
     elif camera_type == 'opencv':
         return OpenCVCameraProvider(camera_index)
+    elif camera_type == 'file':
+        if not source:
+            raise ValueError("The file camera needs a source video file or image directory")
+        return FileCameraProvider(source, pacing=pacing, fps=fps, loop=loop)
     else:  # auto detection
         # Try PiCamera2 first on Raspberry Pi
         try:
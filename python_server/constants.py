@@ -8,8 +8,273 @@ class FaceRecognition:
     COSINE_THRESHOLD = 0.33  # Higher values mean more similar (0-1 range) - Lowered from 0.38 to be more lenient
     NORM_L2_THRESHOLD = 1.20  # Lower values mean more similar - Increased from 1.12 to be more lenient
     
+    # Maximum number of diverse embeddings kept per person; a face matches a
+    # person if it matches any of them
+    MAX_EXEMPLARS = 5
+    
     # Confidence threshold for face detection
     DETECTION_CONFIDENCE_THRESHOLD = 0.9
     
     # Tracking timeout (seconds) - Increased to improve tracking consistency
     FACE_TRACKING_TIMEOUT = 2.0
+
+class FeatureCache:
+    """Constants for the cache of face embeddings keyed by aligned-crop hash."""
+    # Whether recognition looks up embeddings in the cache
+    ENABLED = True
+    
+    # Maximum number of cached embeddings (each about 0.5 KB)
+    CAPACITY = 256
+    
+    # Side of the difference hash grid; the key has HASH_SIZE * HASH_SIZE bits.
+    # Larger grids tell similar-looking people apart better but tolerate less noise
+    HASH_SIZE = 16
+    
+    # Seconds before a cached embedding is recomputed even if it keeps matching
+    MAX_AGE = 30.0
+
+class RecognitionSchedule:
+    """Constants for the scheduler that skips work on frames to keep up with capture.
+    
+    The scheduler walks a ladder of levels, each a (detection scale, detection
+    interval, recognition interval) tuple, ordered from most to least work.
+    Intervals count frames between detector runs, and detector runs between
+    full recognitions; faces in between keep their IDs by box overlap.
+    """
+    # Whether recognition endpoints go through the scheduler
+    ENABLED = True
+    
+    # Targets: the fraction of time spent processing frames, and the average
+    # processing latency per frame in milliseconds
+    TARGET_UTILIZATION = 0.7
+    LATENCY_SLO_MS = 250.0
+    
+    # The scheduler steps back to a level doing more work once both measures
+    # are below this fraction of their targets
+    HEADROOM = 0.6
+    
+    LEVELS = (
+        (1.0, 1, 1),
+        (1.0, 1, 2),
+        (0.75, 1, 3),
+        (0.75, 2, 3),
+        (0.5, 2, 4),
+        (0.5, 3, 6),
+        (0.5, 4, 10)
+    )
+    
+    # Smoothing factor of the per-stage latency averages
+    EWMA_ALPHA = 0.2
+    
+    # Minimum seconds between level changes, so measurements can settle
+    ADJUST_INTERVAL = 2.0
+    
+    # Minimum box overlap (intersection over union) for a detection to keep
+    # the identity of a face from the previous frame without recognition
+    IOU_THRESHOLD = 0.3
+
+class MultiCamera:
+    """Constants for running several cameras in one server process."""
+    # Frames per second each capture thread reads from its camera
+    CAPTURE_FPS = 15.0
+    
+    # Maximum frames per second recognized per camera; workers are shared
+    # round-robin, so a busy camera cannot starve the others
+    PROCESS_FPS = 5.0
+    
+    # Recognition worker threads shared by all cameras (None: one per camera,
+    # up to the CPU count)
+    WORKERS = None
+    
+    # Seconds to wait for a camera to open before giving up on it
+    OPEN_TIMEOUT = 15.0
+
+class Inference:
+    """Constants for running the face models with OpenCV's DNN module."""
+    # Backend and target of the models, by the names in inference.BACKENDS and
+    # inference.TARGETS. 'auto' times every backend available for the CPU at
+    # startup and keeps the fastest
+    BACKEND = 'default'
+    TARGET = 'cpu'
+    
+    # Threads OpenCV uses within one inference (None: OpenCV's default, one per core)
+    NUM_THREADS = None
+    
+    # Whether dummy inferences run right after loading, so the first frame
+    # does not pay for allocating the network
+    WARMUP = True
+    
+    # Detector input sizes warmed up: a 640x480 frame at the detection scales
+    # of the recognition scheduler. Each new size reallocates the network
+    WARMUP_SIZES = ((640, 480), (480, 360), (320, 240))
+    
+    # Timed inferences per backend when auto-tuning
+    AUTOTUNE_RUNS = 10
+
+class FrameRing:
+    """Constants for recognizing frames in worker processes that read them from shared memory."""
+    # Worker processes detecting faces and computing embeddings in multi-camera
+    # mode; 0 keeps all recognition on the worker threads of the server
+    PROCESSES = 0
+    
+    # Ring slots per camera: its latest frame, one frame being recognized and
+    # one being written
+    SLOTS_PER_CAMERA = 3
+    
+    # Largest frame a slot holds; bigger frames are recognized on the threads
+    MAX_WIDTH = 1920
+    MAX_HEIGHT = 1080
+
+class DetectionBatching:
+    """Constants for detecting faces of several cameras with one detector call.
+    
+    Frames detected at the same moment are tiled onto one canvas. This saves
+    the fixed cost of a detector call per frame, which matters for the small
+    frames of downscaled detection; at full resolution the cost follows the
+    pixel count and batching gains little, so it is off by default.
+    """
+    # Whether multi-camera workers batch their detections
+    ENABLED = False
+    
+    # Seconds the first frame of a batch waits for frames of other cameras
+    WINDOW = 0.01
+    
+    # Frames after which a batch runs without waiting out the window
+    MAX_BATCH = 4
+    
+    # Pixels of padding between tiles, so no detection spans two frames
+    TILE_GAP = 32
+
+class EventLoopMonitor:
+    """Constants for measuring event loop lag in the server."""
+    # Seconds between the monitor's wake-ups; lag is how late each one is
+    INTERVAL = 0.1
+    
+    # Seconds of recent samples kept for the reported percentiles
+    WINDOW = 30.0
+
+class Metrics:
+    """Constants for the Prometheus-style /metrics endpoint."""
+    # Upper bounds in seconds of the histogram buckets for pipeline stages
+    STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+    
+    # Upper bounds in seconds of the histogram buckets for HTTP requests
+    REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    
+    # Upper bounds in seconds of the histogram buckets for face memory saves
+    SAVE_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class Profiler:
+    """Constants for the built-in sampling profiler and event loop stall detector."""
+    # Seconds between stack samples of all threads
+    SAMPLE_INTERVAL = 0.01
+    
+    # Longest profile that can be requested, in seconds
+    MAX_DURATION = 60.0
+    
+    # Seconds the event loop may go without running its heartbeat before the
+    # stack of the blocking callback is logged
+    STALL_THRESHOLD = 0.25
+    
+    # Seconds between heartbeats, and between checks of the watchdog thread
+    STALL_CHECK_INTERVAL = 0.05
+    
+    # Most recent stalls kept for /admin/stalls
+    STALL_HISTORY = 20
+
+class Logging:
+    """Constants for log output and the sampled access log."""
+    # Format of every log line
+    FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+    DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+    
+    # Seconds between access log lines per route; requests in between are
+    # summarized in the next line instead of being logged one by one
+    ACCESS_LOG_INTERVAL = 60.0
+    
+    # Requests slower than this, or failing with a 5xx status, are logged as
+    # warnings at most once per ACCESS_LOG_WARNING_INTERVAL seconds per route
+    SLOW_REQUEST_MS = 1000.0
+    ACCESS_LOG_WARNING_INTERVAL = 5.0
+
+class FaceStorage:
+    """Constants for saving face memory."""
+    # People serialized per lock acquisition while preparing a save, so
+    # recognition is not stalled by a large gallery
+    SERIALIZE_BATCH_SIZE = 500
+
+class FaceConsolidation:
+    """Constants for the background job that merges duplicate unnamed faces."""
+    # Whether FaceMemory runs the job automatically. Off by default, as merges
+    # cannot be undone; /consolidate_faces runs it on demand
+    ENABLED = False
+    
+    # Seconds between checks, and the number of unnamed faces created since the
+    # last run that triggers a new one (also runs at least once per MAX_INTERVAL)
+    CHECK_INTERVAL = 300
+    MIN_NEW_UNNAMED = 50
+    MAX_INTERVAL = 6 * 3600
+    
+    # Merges applied per lock acquisition, so recognition is not stalled
+    MERGE_BATCH_SIZE = 50
+    
+    # Rows scored per block of the pairwise similarity matrix
+    BLOCK_SIZE = 1024
+
+class CandidateFilter:
+    """Constants for two-stage matching against large galleries.
+    
+    Large partitions keep a low-dimensional PCA projection of their rows.
+    Best matches are found by scoring the projection, then re-ranking the
+    top candidates with full-dimensional cosine similarity.
+    """
+    # Whether FaceMemory fits projections at all
+    ENABLED = True
+    
+    # Partitions with fewer embedding rows are always scored exactly
+    MIN_GALLERY_ROWS = 5000
+    
+    # Dimensions of the projection, and people re-ranked exactly per query
+    DIMENSIONS = 32
+    TOP_K = 64
+    
+    # Seconds between refit checks, and the fraction of the gallery that must
+    # have changed since the last fit to trigger a refit
+    REFIT_CHECK_INTERVAL = 60
+    REFIT_CHANGE_RATIO = 0.2
+    
+    # Embedding rows sampled to fit the projection
+    MAX_FIT_SAMPLES = 20000
+
+class FaceRetention:
+    """Constants for evicting stale unnamed faces to the cold archive."""
+    # Whether FaceMemory applies the policy automatically. Off by default, so
+    # upgrading does not start evicting faces; /apply_retention runs it on demand
+    ENABLED = False
+    
+    # Seconds between retention checks
+    CHECK_INTERVAL = 3600
+    
+    # Unnamed people not seen for this many days are archived
+    MAX_IDLE_DAYS = 30
+    
+    # Unnamed people seen fewer times than this are archived once they have
+    # not been seen for the grace period (passers-by and false detections)
+    MIN_APPEARANCES = 3
+    RARE_GRACE_HOURS = 24
+    
+    # People evicted per lock acquisition, so recognition is not stalled
+    EVICTION_BATCH_SIZE = 200
+    
+    # Archive file in the storage directory; without a storage directory
+    # evicted people are dropped instead
+    ARCHIVE_FILENAME = "face_archive.jsonl"
+
+class FaceImport:
+    """Constants related to importing face images."""
+    # File extensions accepted as face images
+    IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+    
+    # Detection confidence threshold for imported photos - slightly lower than for
+    # live frames to be more permissive
+    MIN_CONFIDENCE = 0.85
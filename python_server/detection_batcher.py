@@ -0,0 +1,178 @@
+import logging
+import threading
+import time
+import numpy as np
+from constants import DetectionBatching
+from face_processor import DETECTION_X_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+class _DetectionRequest:
+    """One image waiting to be detected as part of a batch."""
+
+    __slots__ = ('image', 'faces', 'error', 'done')
+
+    def __init__(self, image):
+        self.image = image
+        self.faces = None
+        self.error = None
+        self.done = threading.Event()
+
+class DetectionBatcher:
+    """Runs the face detector once for images submitted by several threads.
+
+    Recognition workers of different cameras submit the images they want
+    detected. The first submitter of a batch waits up to WINDOW seconds for
+    others, letterboxes them to a common height, lays them out side by
+    side on one canvas and runs a single YuNet detection on it. Detections
+    are then split by image and moved back to the coordinates of the image
+    each worker submitted, so the fixed cost of a detector call is paid
+    once per batch instead of once per camera.
+
+    YuNet's OpenCV wrapper only takes one image, so a batch is a mosaic
+    rather than an N-image blob; images are separated by a gap, so a face
+    can never span two of them. Batches run one at a time on a detector
+    owned by the batcher, so workers submitting images need no detector
+    of their own.
+    """
+
+    def __init__(self, processor, window=DetectionBatching.WINDOW, max_batch=DetectionBatching.MAX_BATCH,
+                 gap=DetectionBatching.TILE_GAP):
+        """Initialize the batcher.
+
+        Args:
+            processor (FaceProcessor): Processor with loaded models, from whose
+                settings the batcher creates its detector
+            window (float): Seconds the first image of a batch waits for others
+            max_batch (int): Images after which a batch runs without waiting
+                out the window
+            gap (int): Pixels of padding between tiles
+        """
+        self.processor = processor
+        self.window = window
+        self.max_batch = max_batch
+        self.gap = gap
+        self._condition = threading.Condition()
+        self._pending = []
+        self._collecting = False  # Whether a thread is gathering the next batch
+        self._detector_lock = threading.Lock()  # Held while a batch runs on the detector
+        self._detection_model = None
+
+        self.batches = 0
+        self.images = 0
+        self.largest_batch = 0
+
+    def detect(self, image):
+        """Detect faces in an image, possibly together with images from other threads.
+
+        Args:
+            image (numpy.ndarray): BGR image, already cropped and scaled for detection
+
+        Returns:
+            numpy.ndarray: YuNet detections in the coordinates of the image, or None
+        """
+        request = _DetectionRequest(image)
+        with self._condition:
+            self._pending.append(request)
+            leader = not self._collecting
+            if leader:
+                self._collecting = True
+            elif len(self._pending) >= self.max_batch:
+                self._condition.notify_all()
+
+        if leader:
+            deadline = time.monotonic() + self.window
+            with self._condition:
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                # Everything pending joins; there are never more images than worker threads
+                batch, self._pending = self._pending, []
+                self._collecting = False
+            self._run(batch)
+        else:
+            request.done.wait()
+
+        if request.error is not None:
+            raise request.error
+        return request.faces
+
+    def _run(self, batch):
+        """Detect all images of a batch with one detector call and hand out the results."""
+        try:
+            if len(batch) == 1:
+                batch[0].faces = self._detect(batch[0].image)
+            else:
+                canvas, tiles = self._compose([request.image for request in batch])
+                faces = self._detect(canvas)
+                for request, tile in zip(batch, tiles):
+                    request.faces = self._split(faces, *tile)
+        except Exception as e:
+            logger.error(f"Error detecting a batch of {len(batch)} images: {e}")
+            for request in batch:
+                request.error = e
+        finally:
+            with self._condition:
+                self.batches += 1
+                self.images += len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
+            for request in batch:
+                request.done.set()
+
+    def _detect(self, image):
+        """Run the batcher's detector on one image."""
+        with self._detector_lock:
+            if self._detection_model is None:
+                # With batching, the detector of load_models is not needed by any worker
+                self._detection_model = self.processor._claim_loaded_model('detection')
+            if self._detection_model is None:
+                self._detection_model = self.processor._create_worker_detection_model()
+            self._detection_model.setInputSize((image.shape[1], image.shape[0]))
+            return self._detection_model.detect(image)[1]
+
+    def _compose(self, images):
+        """Place images side by side on one canvas, padding each to the tallest.
+
+        Images keep their size: scaling them to a common one would change
+        what the detector sees compared to detecting them one by one, and
+        upscaling the smaller ones would multiply the work.
+
+        Returns:
+            tuple: (canvas, list of (left edge, width, height) per image)
+        """
+        height = max(image.shape[0] for image in images)
+        width = sum(image.shape[1] for image in images) + self.gap * (len(images) - 1)
+        canvas = np.zeros((height, width, 3), dtype=np.uint8)
+        tiles = []
+        left = 0
+        for image in images:
+            canvas[:image.shape[0], left:left + image.shape[1]] = image
+            tiles.append((left, image.shape[1], image.shape[0]))
+            left += image.shape[1] + self.gap
+        return canvas, tiles
+
+    @staticmethod
+    def _split(faces, left, width, height):
+        """Take the detections centered on one image of the canvas and move them back to it."""
+        if faces is None:
+            return None
+        centers_x = faces[:, 0] + faces[:, 2] / 2
+        centers_y = faces[:, 1] + faces[:, 3] / 2
+        mine = (centers_x >= left) & (centers_x < left + width) & (centers_y < height)
+        if not mine.any():
+            return None
+        faces = faces[mine].copy()
+        faces[:, DETECTION_X_COLUMNS] -= left
+        return faces
+
+    def get_status(self):
+        """Get the number of batches run and images detected in them."""
+        with self._condition:
+            return {
+                'batches': self.batches,
+                'images': self.images,
+                'mean_batch': round(self.images / self.batches, 2) if self.batches else None,
+                'largest_batch': self.largest_batch
+            }
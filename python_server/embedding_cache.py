@@ -0,0 +1,108 @@
+import cv2
+import numpy as np
+import logging
+import threading
+import time
+from collections import OrderedDict
+from constants import FeatureCache
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """LRU cache of face embeddings keyed by a perceptual hash of the aligned crop.
+    
+    With a static camera the same face produces nearly identical aligned crops
+    frame after frame, and small changes such as lighting flicker do not change
+    a difference hash, so the SFace embedding can be reused instead of running
+    the network again.
+    """
+    
+    def __init__(self, capacity=FeatureCache.CAPACITY, hash_size=FeatureCache.HASH_SIZE,
+                 max_age=FeatureCache.MAX_AGE):
+        """Initialize the cache.
+        
+        Args:
+            capacity (int): Maximum number of cached embeddings
+            hash_size (int): Side of the difference hash grid
+            max_age (float): Seconds a cached embedding stays valid
+        """
+        self.capacity = capacity
+        self.hash_size = hash_size
+        self.max_age = max_age
+        self._entries = OrderedDict()  # Maps key to (embedding, time cached), oldest first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def crop_hash(self, aligned_face):
+        """Compute a difference hash of an aligned face crop.
+        
+        Each bit records whether a pixel of the downscaled grayscale crop is
+        brighter than its right-hand neighbour, so uniform brightness changes
+        leave the hash unchanged.
+        
+        Args:
+            aligned_face (numpy.ndarray): Aligned 112x112 BGR crop from alignCrop
+            
+        Returns:
+            bytes: Packed hash bits
+        """
+        gray = cv2.cvtColor(aligned_face, cv2.COLOR_BGR2GRAY) if aligned_face.ndim == 3 else aligned_face
+        small = cv2.resize(gray, (self.hash_size + 1, self.hash_size), interpolation=cv2.INTER_AREA)
+        return np.packbits(small[:, 1:] > small[:, :-1]).tobytes()
+    
+    def get_or_compute(self, aligned_face, model_id, compute):
+        """Get the embedding of an aligned crop, computing and caching it on a miss.
+        
+        Args:
+            aligned_face (numpy.ndarray): Aligned face crop
+            model_id (str): Identifies the recognition model, so embeddings from
+                different models are never mixed
+            compute (callable): Called with the crop to compute the embedding
+            
+        Returns:
+            numpy.ndarray: The embedding
+        """
+        key = (model_id, self.crop_hash(aligned_face))
+        now = time.monotonic()
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] <= self.max_age:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        
+        # Compute outside the lock so other threads can keep hitting the cache
+        embedding = compute(aligned_face)
+        if embedding is None:
+            return None
+        
+        with self._lock:
+            self._entries[key] = (embedding, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+        return embedding
+    
+    def clear(self):
+        """Remove every cached embedding (e.g. after the model changes)."""
+        with self._lock:
+            self._entries.clear()
+    
+    def get_stats(self):
+        """Get cache statistics.
+        
+        Returns:
+            dict: Size, capacity, hit and miss counts and the hit rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'capacity': self.capacity,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
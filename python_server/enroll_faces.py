@@ -0,0 +1,314 @@
+"""
+Bulk face enrollment from a directory or archive of labelled photos.
+
+Images are expected in a `person_name/*.jpg` layout; the name of the folder
+that directly contains an image is used as the person's name. Sources can be
+a directory, a .zip file or a tar archive (optionally compressed).
+
+Usage:
+    python enroll_faces.py /path/to/school_photos
+    python enroll_faces.py photos.tar.gz --workers 4 --batch-size 1000
+
+Progress is checkpointed after every batch, so an interrupted run picks up
+where it stopped when started again with the same source. Stop the camera
+server first - both processes would otherwise write the same storage file.
+"""
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import tarfile
+import time
+import zipfile
+from collections import defaultdict
+
+import cv2
+import numpy as np
+
+from constants import FaceImport
+from face_processor import FaceProcessor
+
+logger = logging.getLogger(__name__)
+
+# Face processor of the current worker process, created by _init_worker
+_worker_processor = None
+
+def _init_worker(detection_model_path, recognition_model_path):
+    """Load one set of face models per worker process."""
+    global _worker_processor
+    _worker_processor = FaceProcessor(with_memory=False)
+    if not _worker_processor.load_models(detection_model_path, recognition_model_path):
+        raise RuntimeError("Failed to load face models in worker process")
+
+def _extract_worker(key, source, min_confidence):
+    """Decode one image and extract its face in a worker process.
+
+    Args:
+        key (str): Checkpoint key of the image
+        source (str or bytes): Path of the image file, or its encoded bytes
+        min_confidence (float): Minimum detection confidence
+
+    Returns:
+        tuple: (key, face, error) where face holds the feature, the confidence
+        and a JPEG-encoded thumbnail (cheaper to send back than raw pixels)
+    """
+    if isinstance(source, bytes):
+        img = cv2.imdecode(np.frombuffer(source, np.uint8), cv2.IMREAD_COLOR)
+    else:
+        img = cv2.imread(source)
+    if img is None:
+        return key, None, "Could not read image file"
+
+    face, error = _worker_processor.extract_import_face(img, min_confidence)
+    if face is None:
+        return key, None, error
+
+    thumbnail_jpeg = None
+    if face['thumbnail'] is not None:
+        ok, buffer = cv2.imencode('.jpg', face['thumbnail'], [cv2.IMWRITE_JPEG_QUALITY, 90])
+        if ok:
+            thumbnail_jpeg = buffer.tobytes()
+    return key, {
+        'feature': face['feature'],
+        'confidence': face['confidence'],
+        'thumbnail_jpeg': thumbnail_jpeg
+    }, None
+
+def _person_for(name):
+    """Get the person name for an image path, or None if it is not in a person folder."""
+    parts = [part for part in name.replace('\\', '/').split('/') if part]
+    if len(parts) < 2:
+        return None
+    return parts[-2]
+
+def _is_image(name):
+    return os.path.splitext(name.lower())[1] in FaceImport.IMAGE_EXTENSIONS
+
+def iter_source_images(source):
+    """Yield (key, person_name, path_or_bytes) for every image in a source.
+
+    Directory images are yielded as paths so workers read them directly;
+    archive members are read here and yielded as bytes. Entries are sorted
+    so each person's images are contiguous and runs are reproducible.
+    """
+    if os.path.isdir(source):
+        entries = []
+        for root, _, files in os.walk(source):
+            for filename in files:
+                path = os.path.join(root, filename)
+                key = os.path.relpath(path, source).replace(os.sep, '/')
+                person_name = _person_for(key)
+                if person_name and _is_image(filename):
+                    entries.append((key, person_name, path))
+        yield from sorted(entries)
+
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            names = sorted(name for name in archive.namelist()
+                           if not name.endswith('/') and _person_for(name) and _is_image(name))
+            for name in names:
+                yield name, _person_for(name), archive.read(name)
+
+    elif tarfile.is_tarfile(source):
+        # Tar archives may be compressed streams, so read them in stored order
+        with tarfile.open(source, 'r:*') as archive:
+            for member in archive:
+                if member.isfile() and _person_for(member.name) and _is_image(member.name):
+                    data = archive.extractfile(member).read()
+                    yield member.name, _person_for(member.name), data
+
+    else:
+        raise ValueError(f"Unsupported source (expected a directory, zip or tar archive): {source}")
+
+class EnrollmentCheckpoint:
+    """Append-only record of images already committed to face memory."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        self.done.add(json.loads(line))
+
+    def record(self, keys):
+        """Mark images as committed; only call after memory has been saved."""
+        with open(self.path, 'a') as f:
+            for key in keys:
+                f.write(json.dumps(key) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.update(keys)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.done = set()
+
+class BulkEnroller:
+    """Enrolls a source of labelled photos into FaceMemory using a process pool."""
+
+    def __init__(self, processor, detection_model_path, recognition_model_path,
+                 checkpoint, workers=None, batch_size=500, min_confidence=FaceImport.MIN_CONFIDENCE):
+        self.processor = processor
+        self.detection_model_path = detection_model_path
+        self.recognition_model_path = recognition_model_path
+        self.checkpoint = checkpoint
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.min_confidence = min_confidence
+
+        self.images_processed = 0
+        self.faces_enrolled = 0
+        self.images_skipped = 0
+        self.failures = []
+        self.people = set()
+        self._batch = defaultdict(list)  # Maps person name to faces awaiting commit
+        self._batch_keys = []
+
+    def run(self, source):
+        """Enroll every image in the source that is not in the checkpoint yet."""
+        start_time = time.time()
+        max_in_flight = self.workers * 4
+        in_flight = {}  # Maps future to person name
+
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.detection_model_path, self.recognition_model_path)) as pool:
+            for key, person_name, image_source in iter_source_images(source):
+                if key in self.checkpoint.done:
+                    self.images_skipped += 1
+                    continue
+
+                # Keep a bounded number of images queued so archives are not loaded whole
+                while len(in_flight) >= max_in_flight:
+                    self._collect(in_flight, start_time)
+
+                future = pool.submit(_extract_worker, key, image_source, self.min_confidence)
+                in_flight[future] = person_name
+
+            while in_flight:
+                self._collect(in_flight, start_time)
+
+        self._commit(start_time)
+        return time.time() - start_time
+
+    def _collect(self, in_flight, start_time):
+        """Wait for at least one image to finish and add the results to the batch."""
+        done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            person_name = in_flight.pop(future)
+            key, face, error = future.result()
+            self.images_processed += 1
+            self._batch_keys.append(key)
+            if face is None:
+                self.failures.append((key, error))
+                logger.debug(f"Skipping {key}: {error}")
+            else:
+                self._batch[person_name].append(face)
+
+        if len(self._batch_keys) >= self.batch_size:
+            self._commit(start_time)
+
+    def _commit(self, start_time):
+        """Write the current batch into memory, save it, then checkpoint it."""
+        if not self._batch_keys:
+            return
+
+        for person_name, faces in self._batch.items():
+            for face in faces:
+                thumbnail_jpeg = face.pop('thumbnail_jpeg', None)
+                face['thumbnail'] = None
+                if thumbnail_jpeg:
+                    face['thumbnail'] = cv2.imdecode(np.frombuffer(thumbnail_jpeg, np.uint8), cv2.IMREAD_COLOR)
+            self.processor.enroll_person(person_name, faces)
+            self.faces_enrolled += len(faces)
+            self.people.add(person_name)
+
+        # Only checkpoint images whose results are safely on disk
+        self.processor.memory.save_now()
+        self.checkpoint.record(self._batch_keys)
+
+        elapsed = time.time() - start_time
+        rate = self.images_processed / elapsed if elapsed > 0 else 0.0
+        logger.info(f"Committed {len(self._batch_keys)} images - {self.images_processed} processed, "
+                    f"{self.faces_enrolled} faces enrolled, {rate:.1f} images/sec")
+
+        self._batch = defaultdict(list)
+        self._batch_keys = []
+
+def _default_checkpoint_path(storage_dir, source):
+    source_hash = hashlib.sha1(os.path.abspath(source).encode('utf-8')).hexdigest()[:10]
+    return os.path.join(storage_dir, f"enroll_{source_hash}.checkpoint")
+
+def main():
+    assets_dir = os.path.join(os.path.dirname(__file__), '..', 'assets')
+
+    parser = argparse.ArgumentParser(description='Bulk-enroll faces from a person_name/*.jpg directory or archive')
+    parser.add_argument('source',
+                        help='Directory, .zip or tar archive with one folder of photos per person')
+    parser.add_argument('--storage-dir', default=os.path.join(os.path.dirname(__file__), 'data'),
+                        help='Face memory storage directory (default: the server data directory)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Number of worker processes, each with its own models (default: CPU count)')
+    parser.add_argument('--batch-size', type=int, default=500,
+                        help='Images per save and checkpoint (default: 500)')
+    parser.add_argument('--min-confidence', type=float, default=FaceImport.MIN_CONFIDENCE,
+                        help=f'Minimum face detection confidence (default: {FaceImport.MIN_CONFIDENCE})')
+    parser.add_argument('--checkpoint',
+                        help='Checkpoint file (default: derived from the source path, in the storage directory)')
+    parser.add_argument('--restart', action='store_true',
+                        help='Ignore an existing checkpoint and process every image again')
+    parser.add_argument('--detection-model', default=os.path.join(assets_dir, 'face_detection_yunet_2023mar.onnx'),
+                        help='Path to the YuNet detection model')
+    parser.add_argument('--recognition-model', default=os.path.join(assets_dir, 'face_recognition_sface_2021dec.onnx'),
+                        help='Path to the SFace recognition model')
+    parser.add_argument('--debug', action='store_true',
+                        help='Enable debug logging')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.debug else logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+    os.makedirs(args.storage_dir, exist_ok=True)
+    checkpoint = EnrollmentCheckpoint(args.checkpoint or _default_checkpoint_path(args.storage_dir, args.source))
+    if args.restart:
+        checkpoint.clear()
+    elif checkpoint.done:
+        logger.info(f"Resuming from checkpoint {checkpoint.path}: {len(checkpoint.done)} images already enrolled")
+
+    processor = FaceProcessor(storage_dir=args.storage_dir)
+    try:
+        enroller = BulkEnroller(
+            processor,
+            args.detection_model,
+            args.recognition_model,
+            checkpoint,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            min_confidence=args.min_confidence
+        )
+        elapsed = enroller.run(args.source)
+    finally:
+        processor.memory.shutdown()
+
+    rate = enroller.images_processed / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Enrollment finished in {elapsed:.1f}s: {enroller.images_processed} images processed "
+                f"({rate:.1f} images/sec), {enroller.images_skipped} skipped from checkpoint, "
+                f"{enroller.faces_enrolled} faces enrolled for {len(enroller.people)} people, "
+                f"{len(enroller.failures)} failed")
+    for key, error in enroller.failures[:20]:
+        logger.info(f"  {key}: {error}")
+    if len(enroller.failures) > 20:
+        logger.info(f"  ... and {len(enroller.failures) - 20} more")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+import os
+import json
+import shutil
+import logging
+import datetime
+import threading
+import numpy as np
+from gallery import GalleryPartition
+
+logger = logging.getLogger(__name__)
+
+class FaceArchive:
+    """Cold storage for people evicted from FaceMemory by the retention policy.
+
+    Archived people are appended to a JSON Lines file (one person per line,
+    including the feature vector) and their thumbnails are moved next to it.
+    Nothing here is scanned per frame. The file is only read when it is
+    searched or listed, and nothing read is kept afterwards, so memory use
+    does not grow with the archive; only the number of records is tracked.
+    """
+
+    def __init__(self, storage_dir, filename="face_archive.jsonl"):
+        """Initialize the archive.
+
+        Args:
+            storage_dir (str): Directory holding the archive file
+            filename (str): Name of the archive file
+        """
+        self.path = os.path.join(storage_dir, filename)
+        self.thumbnails_dir = os.path.join(storage_dir, "archive_thumbnails")
+        os.makedirs(self.thumbnails_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._count = None  # Records in the file, counted on first use
+
+    def add(self, people, reason, thumbnails_dir=None):
+        """Append people to the archive and move their thumbnails into it.
+
+        Args:
+            people (list): Person objects already removed from memory
+            reason (str): Why they were archived ('idle' or 'rare')
+            thumbnails_dir (str, optional): Hot thumbnails directory they are moved from
+
+        Returns:
+            int: Number of people archived
+        """
+        if not people:
+            return 0
+
+        archived_at = datetime.datetime.now().isoformat()
+        with self._lock:
+            with open(self.path, 'a') as f:
+                for person in people:
+                    record = person.to_dict()
+                    record['archived_at'] = archived_at
+                    record['archive_reason'] = reason
+                    f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            if self._count is not None:
+                self._count += len(people)
+
+        if thumbnails_dir:
+            for person in people:
+                self._move_thumbnails(person._get_safe_id(), thumbnails_dir, self.thumbnails_dir)
+
+        logger.info(f"Archived {len(people)} people ({reason}) to {self.path}")
+        return len(people)
+
+    def restore(self, person_id, thumbnails_dir=None):
+        """Remove a person from the archive and return their record.
+
+        Args:
+            person_id (str): ID of the archived person
+            thumbnails_dir (str, optional): Hot thumbnails directory to move thumbnails
+                back to; without it they stay archived until restore_thumbnails
+
+        Returns:
+            dict: The most recent archived dict for the ID (usable with
+            Person.from_dict), or None if not found. Older entries for the
+            same ID are dropped as well.
+        """
+        with self._lock:
+            if not os.path.exists(self.path):
+                return None
+
+            found = None
+            removed = 0
+            temp_path = f"{self.path}.tmp"
+            with open(self.path, 'r') as src, open(temp_path, 'w') as dst:
+                for line in src:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        dst.write(line)
+                        continue
+                    if record.get('id') == person_id:
+                        found = record
+                        removed += 1
+                        continue
+                    dst.write(line)
+
+            if found is None:
+                os.remove(temp_path)
+                return None
+            os.replace(temp_path, self.path)
+            if self._count is not None:
+                self._count -= removed
+
+        if thumbnails_dir:
+            self.restore_thumbnails(person_id, thumbnails_dir)
+
+        logger.info(f"Restored {person_id} from the archive")
+        return found
+
+    def restore_thumbnails(self, person_id, thumbnails_dir):
+        """Move the archived thumbnails of a person back to the hot thumbnails directory."""
+        safe_id = "".join(c if c.isalnum() else "_" for c in str(person_id))
+        self._move_thumbnails(safe_id, self.thumbnails_dir, thumbnails_dir)
+
+    def search(self, feature_vector, cosine_threshold, norm_l2_threshold, limit=10):
+        """Find archived people similar to a feature vector.
+
+        Returns:
+            list: Archived person dicts (without features) with a 'similarity'
+            key added, most similar first
+        """
+        latest, partition = self._read(features=True)[1:]
+        matches = partition.similar(feature_vector, cosine_threshold, norm_l2_threshold)
+
+        results = []
+        for person_id, similarity in matches[:limit]:
+            record = dict(latest[person_id])
+            record['similarity'] = similarity
+            results.append(record)
+        return results
+
+    def list_people(self, offset=0, limit=100):
+        """List archived people, most recently archived first.
+
+        Returns:
+            tuple: (total count, list of person dicts without features)
+        """
+        records = self._read()[0]
+        newest_first = records[::-1]
+        return len(records), newest_first[offset:offset + limit]
+
+    def count(self):
+        """Get the number of archived records without parsing the archive."""
+        with self._lock:
+            if self._count is None:
+                self._count = 0
+                if os.path.exists(self.path):
+                    with open(self.path, 'r') as f:
+                        self._count = sum(1 for line in f if line.strip())
+            return self._count
+
+    def _read(self, features=False):
+        """Parse the archive file.
+
+        Args:
+            features (bool): Whether to also build a partition of the latest features
+
+        Returns:
+            tuple: (records oldest first, ID to latest record, GalleryPartition of
+            latest features or None)
+        """
+        with self._lock:
+            records = []
+            latest = {}
+            vectors = {}
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    for line_number, line in enumerate(f, 1):
+                        if not line.strip():
+                            continue
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError as e:
+                            logger.warning(f"Skipping corrupt archive line {line_number}: {e}")
+                            continue
+
+                        feature = record.pop('feature', None)
+                        record.pop('exemplars', None)
+                        records.append(record)
+
+                        # Searches only use the latest entry of an ID archived more than once
+                        latest[record['id']] = record
+                        if features:
+                            vectors.pop(record['id'], None)
+                            vector = GalleryPartition.normalize(feature)
+                            if vector is not None:
+                                vectors[record['id']] = vector
+            self._count = len(records)
+
+        if not features:
+            return records, latest, None
+        if vectors:
+            partition = GalleryPartition(tuple(vectors), np.vstack(list(vectors.values())))
+        else:
+            partition = GalleryPartition.empty()
+        return records, latest, partition
+
+    @staticmethod
+    def _move_thumbnails(safe_id, from_dir, to_dir):
+        """Move one person's thumbnail folder between thumbnail directories."""
+        source = os.path.join(from_dir, safe_id)
+        if not os.path.isdir(source):
+            return
+        destination = os.path.join(to_dir, safe_id)
+        try:
+            if os.path.exists(destination):
+                shutil.rmtree(destination)
+            shutil.move(source, destination)
+        except Exception as e:
+            logger.error(f"Error moving thumbnails for {safe_id}: {e}")
@@ -1,14 +1,25 @@
 import cv2
 import numpy as np
 import logging
+from constants import FaceRecognition as FR
 
 logger = logging.getLogger(__name__)
 
 class FaceComparisonService:
-    """Singleton service that handles face feature comparison."""
+    """Singleton service that handles face feature comparison.
+    
+    Pairwise comparisons go through OpenCV's FaceRecognizerSF.match. The batch
+    methods compute the same cosine and L2 scores with NumPy matrix products,
+    scoring many queries against a whole gallery at once; they do not need
+    the recognizer to be initialized.
+    """
     
     _instance = None
     
+    # Gallery rows scored per chunk in batch methods, bounding temporary memory
+    # to about chunk rows x queries scores
+    CHUNK_ROWS = 8192
+    
     @classmethod
     def get_instance(cls):
         if cls._instance is None:
@@ -19,11 +30,18 @@ class FaceComparisonService:
         self._recognizer = None
         self.is_initialized = False
         
-    def initialize(self, model_path):
-        """Initialize the face recognizer with the provided model."""
+    def initialize(self, model_path=None, recognizer=None):
+        """Initialize the face recognizer with the provided model.
+        
+        Args:
+            model_path (str, optional): Path of the SFace model to load
+            recognizer (cv2.FaceRecognizerSF, optional): Already loaded recognizer
+                to share instead of loading the model a second time; match
+                keeps no state, so it can be shared
+        """
         try:
             # Initialize SFace recognizer from OpenCV
-            self._recognizer = cv2.FaceRecognizerSF.create(
+            self._recognizer = recognizer or cv2.FaceRecognizerSF.create(
                 model_path, 
                 ""  # Empty config string
             )
@@ -149,4 +167,104 @@ class FaceComparisonService:
                 return np.linalg.norm(feature1 - feature2)
             except Exception as e2:
                 logger.error(f"Fallback L2 norm calculation also failed: {e2}")
-                return float('inf')  # Return worst case (infinity) if calculation fails
\ No newline at end of file
+                return float('inf')  # Return worst case (infinity) if calculation fails
+    
+    @staticmethod
+    def normalize_rows(features, normalized=False):
+        """Convert features to a float32 matrix with one (unit-length) feature per row.
+        
+        Args:
+            features (numpy.ndarray): One feature, or several stacked as rows
+            normalized (bool): Whether the features already have unit length
+        """
+        features = np.asarray(features, dtype=np.float32)
+        features = features.reshape(1, -1) if features.ndim == 1 else features.reshape(features.shape[0], -1)
+        if normalized:
+            return features
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        # Zero features stay zero, so they score 0 against everything
+        return features / np.where(norms == 0, 1, norms)
+    
+    def score_batch(self, queries, gallery, normalized=False, chunk_rows=None):
+        """Score every query feature against every gallery feature.
+        
+        Gives the same values as calculate_cosine_distance and
+        calculate_norm_l2_distance for each pair, which both work on
+        normalized features.
+        
+        Args:
+            queries (numpy.ndarray): One feature, or several stacked as rows
+            gallery (numpy.ndarray): Gallery features stacked as rows
+            normalized (bool): Whether all features already have unit length
+            chunk_rows (int, optional): Gallery rows normalized and scored at a time
+            
+        Returns:
+            tuple: (cosine similarities, L2 distances), both float32 arrays of
+            shape (queries, gallery rows)
+        """
+        queries = self.normalize_rows(queries, normalized)
+        gallery = np.asarray(gallery, dtype=np.float32)
+        gallery = gallery.reshape(gallery.shape[0], -1) if gallery.size else gallery.reshape(0, queries.shape[1])
+        chunk_rows = chunk_rows or self.CHUNK_ROWS
+        
+        cosine = np.empty((queries.shape[0], gallery.shape[0]), dtype=np.float32)
+        for start in range(0, gallery.shape[0], chunk_rows):
+            chunk = self.normalize_rows(gallery[start:start + chunk_rows], normalized)
+            np.matmul(queries, chunk.T, out=cosine[:, start:start + chunk.shape[0]])
+        
+        # For unit vectors |a - b|^2 = 2 - 2 * cos(a, b)
+        norm_l2 = np.sqrt(np.maximum(2.0 - 2.0 * cosine, 0.0))
+        return cosine, norm_l2
+    
+    def best_matches(self, queries, gallery, k=1, cosine_threshold=FR.COSINE_THRESHOLD,
+                     norm_l2_threshold=FR.NORM_L2_THRESHOLD, normalized=False, chunk_rows=None):
+        """Find the k most similar gallery features for every query.
+        
+        A gallery feature is a match if it passes either threshold, the same
+        rule as are_features_similar. The gallery is scored a chunk at a time
+        and only the running top k per query is kept, so memory stays bounded
+        by the chunk size regardless of gallery size.
+        
+        Args:
+            queries (numpy.ndarray): One feature, or several stacked as rows
+            gallery (numpy.ndarray): Gallery features stacked as rows
+            k (int): Maximum matches per query
+            cosine_threshold (float): Minimum cosine similarity (higher is more similar)
+            norm_l2_threshold (float): Maximum L2 distance (lower is more similar)
+            normalized (bool): Whether all features already have unit length
+            chunk_rows (int, optional): Gallery rows scored at a time
+            
+        Returns:
+            list: One list per query of (gallery row, cosine, norm_l2) tuples,
+            most similar first
+        """
+        queries = self.normalize_rows(queries, normalized)
+        gallery = np.asarray(gallery, dtype=np.float32)
+        chunk_rows = chunk_rows or self.CHUNK_ROWS
+        
+        best_scores = np.full((queries.shape[0], k), -np.inf, dtype=np.float32)
+        best_rows = np.full((queries.shape[0], k), -1, dtype=np.intp)
+        
+        for start in range(0, gallery.shape[0], chunk_rows):
+            cosine, norm_l2 = self.score_batch(queries, gallery[start:start + chunk_rows], normalized)
+            similar = (cosine >= cosine_threshold) | (norm_l2 <= norm_l2_threshold)
+            
+            # Merge this chunk's matches into the running top k
+            scores = np.hstack([best_scores, np.where(similar, cosine, -np.inf)])
+            rows = np.hstack([best_rows, np.broadcast_to(np.arange(start, start + cosine.shape[1]), cosine.shape)])
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k] if scores.shape[1] > k else \
+                np.broadcast_to(np.arange(scores.shape[1]), (scores.shape[0], scores.shape[1]))
+            best_scores = np.take_along_axis(scores, top, axis=1)
+            best_rows = np.take_along_axis(rows, top, axis=1)
+        
+        order = np.argsort(-best_scores, axis=1, kind='stable')
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        
+        results = []
+        for scores, rows in zip(best_scores.tolist(), best_rows.tolist()):
+            results.append([
+                (row, score, float(np.sqrt(max(2.0 - 2.0 * score, 0.0))))
+                for row, score in zip(rows, scores) if score != -np.inf
+            ])
+        return results
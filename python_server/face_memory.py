@@ -6,12 +6,123 @@ import numpy as np
 import threading
 import time
 import shutil
+import uuid
 from person import Person
+from gallery import GalleryPartition, GalleryProjection
+from face_archive import FaceArchive
+from constants import FaceRecognition, FaceConsolidation, FaceRetention, FaceStorage, CandidateFilter
+from metrics import STAGE_SECONDS, SAVE_SECONDS, LAST_SAVE_SECONDS
 import concurrent.futures
 import queue
+from types import MappingProxyType
 
 logger = logging.getLogger(__name__)
 
+class FaceMemorySnapshot:
+    """Immutable point-in-time view of the people held by FaceMemory.
+    
+    Snapshots are published by FaceMemory on every mutation and swapped in with
+    a single attribute assignment, so readers can grab the current one without
+    locking or copying. The ID -> Person mapping never changes once published;
+    the Person objects it refers to are shared with FaceMemory and keep
+    receiving in-place updates.
+    
+    Named and unnamed people are also exposed as separate GalleryPartition
+    embedding matrices. These are built on first access and derived from the
+    last built partitions by refreshing only the rows that changed, so a burst
+    of updates between two frames costs a single refresh.
+    """
+    
+    __slots__ = ('version', 'people', 'projection', '_base', '_pending', '_rebuild', '_partitions')
+    
+    def __init__(self, version, people, base=None, pending=frozenset(), rebuild=True, projection=None):
+        """Initialize a snapshot.
+        
+        Args:
+            version (int): FaceMemory revision this snapshot was published at
+            people (Mapping): Read-only mapping of ID to Person object
+            base (tuple, optional): (named, unnamed) partitions to derive from
+            pending (frozenset): IDs whose rows changed since `base` was built
+            rebuild (bool): Whether partition membership changed since `base`
+            projection (GalleryProjection, optional): Projection the partitions
+                use for candidate filtering
+        """
+        self.version = version
+        self.people = people
+        self.projection = projection
+        self._base = base
+        self._pending = pending
+        self._rebuild = rebuild or base is None
+        self._partitions = None
+    
+    def derive(self, version, people, changed_ids, membership_changed, projection=None):
+        """Create the next snapshot, carrying over partition state.
+        
+        Args:
+            version (int): Revision of the new snapshot
+            people (Mapping): Read-only mapping of ID to Person object
+            changed_ids (iterable): IDs modified since this snapshot
+            membership_changed (bool): Whether IDs were added, removed or renamed
+            projection (GalleryProjection, optional): Projection for the new snapshot
+        """
+        partitions = self._partitions
+        if partitions is not None:
+            base, pending, rebuild = partitions, frozenset(changed_ids), membership_changed
+        else:
+            # Never built - keep deriving from our base so the chain stays one deep
+            base = self._base
+            pending = self._pending.union(changed_ids)
+            rebuild = self._rebuild or membership_changed
+        
+        # Refreshing most rows costs as much as a rebuild
+        if len(pending) > len(people) // 2:
+            rebuild = True
+        if rebuild:
+            pending = frozenset()
+        return FaceMemorySnapshot(version, people, base, pending, rebuild, projection)
+    
+    @property
+    def named(self):
+        """GalleryPartition of named people."""
+        return self._get_partitions()[0]
+    
+    @property
+    def unnamed(self):
+        """GalleryPartition of unnamed (auto-generated ID) people."""
+        return self._get_partitions()[1]
+    
+    def _get_partitions(self):
+        partitions = self._partitions
+        if partitions is None:
+            partitions = self._build_partitions()
+            # Concurrent builders produce equivalent results, so last write wins
+            self._partitions = partitions
+        return partitions
+    
+    def _build_partitions(self):
+        if not self._rebuild:
+            named, unnamed = self._base
+            
+            # A changed ID missing from both partitions that now has a feature
+            # means membership changed after all
+            needs_rebuild = any(
+                person_id not in named.index and person_id not in unnamed.index
+                and self.people.get(person_id) is not None
+                and self.people[person_id].feature_vector is not None
+                for person_id in self._pending
+            )
+            if not needs_rebuild:
+                named = named.with_updated_rows(self.people, self._pending, self.projection)
+                unnamed = unnamed.with_updated_rows(self.people, self._pending, self.projection)
+                if named is not None and unnamed is not None:
+                    return named, unnamed
+        
+        people = list(self.people.values())
+        return (
+            GalleryPartition.build((p for p in people if p.is_named), self.projection),
+            GalleryPartition.build((p for p in people if not p.is_named), self.projection)
+        )
+
 class FaceMemory:
     """Class that manages storage and retrieval of face recognition data.
     
@@ -19,7 +130,15 @@ class FaceMemory:
     periodically backs up to disk for persistence.
     """
     
-    def __init__(self, storage_dir=None):
+    def __init__(self, storage_dir=None, load=True):
+        """Initialize face memory.
+        
+        Args:
+            storage_dir (str, optional): Directory for the face data, thumbnails and archive
+            load (bool): Whether to load stored faces right away. Otherwise load
+                must be called before the memory is used, which lets a server
+                read a large file while it starts its other parts.
+        """
         self.people = {}  # Maps ID to Person object - all data stays in memory
         self.storage_dir = storage_dir
         
@@ -30,6 +149,28 @@ class FaceMemory:
         self._min_save_cooldown = 45 # Minimum seconds between any save operations (increased from 30)
         self._lock = threading.RLock()  # Reentrant lock for thread safety
         
+        # Change tracking for delta sync - every mutation bumps the revision
+        self._revision = 0
+        self._epoch = uuid.uuid4().hex[:12]  # Identifies this revision history; changes when it restarts
+        self._modified_order = {}  # Maps ID to last modified revision, oldest first
+        self._tombstones = {}  # Maps removed ID to tombstone info, oldest first
+        self._tombstone_horizon = 0  # Changes before this revision can no longer be diffed
+        self._max_tombstones = 10000
+        
+        # Copy-on-write snapshot of self.people for lock-free readers
+        self._people_changed = True  # Whether the ID -> Person mapping changed since last publish
+        self._snapshot = FaceMemorySnapshot(0, MappingProxyType({}))
+        
+        # Background consolidation of duplicate unnamed faces
+        self._consolidation_lock = threading.Lock()  # Only one consolidation runs at a time
+        self._stop_maintenance = threading.Event()  # Stops consolidation, retention and projection threads
+        
+        # Projection for two-stage matching, refit once enough of the gallery changed
+        self._projection = None
+        self._changes_since_fit = 0
+        self._last_consolidation_time = time.time()
+        self._last_consolidation_unnamed = 0  # Unnamed people left after the last run
+        
         # Save status tracking for UI
         self._next_scheduled_save = 0
         self._auto_save_in_progress = False
@@ -40,6 +181,7 @@ class FaceMemory:
         self._save_total_items = 0
         self._save_processed_items = 0
         self._save_current_step = "idle"
+        self._save_started = 0.0  # perf_counter() when the current save began
         
         # Add state variable for UI display
         self._last_save_completed_time = 0
@@ -55,20 +197,59 @@ class FaceMemory:
             self.thumbnails_dir = os.path.join(self.storage_dir, "thumbnails")
             os.makedirs(self.thumbnails_dir, exist_ok=True)
             logger.info(f"Created thumbnails directory at {self.thumbnails_dir}")
-            
-        # Load from persistence if available - this populates the in-memory data
-        self._load_from_storage()
         
-        # Start the periodic save thread
-        self._start_periodic_save()
+        # Cold archive for people evicted by the retention policy
+        self.archive = None
+        if self.storage_dir:
+            self.archive = FaceArchive(self.storage_dir, FaceRetention.ARCHIVE_FILENAME)
         
-        # Create process pool for background saves
+        # Create process pool for background saves. This must exist before the
+        # save thread starts, which reads the save state right away.
         self._process_pool = concurrent.futures.ProcessPoolExecutor(max_workers=1)
         self._save_queue = queue.Queue()
         self._save_in_progress = False
         self._save_results = []  # Store futures for save operations
+        self._serialized = {}  # Maps ID to (last_modified_rev, dict) of the last save
+        
+        # Set once stored faces are loaded and the background threads run
+        self._loaded = threading.Event()
+        if load:
+            self.load()
+    
+    def load(self):
+        """Load stored faces and start the background save and maintenance threads.
         
+        Nothing is saved before this has run, so a partially started memory
+        never overwrites the stored faces. Calling it again does nothing.
+        """
+        if self._loaded.is_set():
+            return
+        
+        # Load from persistence if available - this populates the in-memory data
+        self._load_from_storage()
+        
+        # Start the periodic save thread
+        self._start_periodic_save()
+        
+        # Start merging duplicate unnamed faces in the background
+        if FaceConsolidation.ENABLED:
+            self._start_consolidation()
+        
+        # Start evicting stale unnamed faces in the background
+        if FaceRetention.ENABLED:
+            self._start_retention()
+        
+        # Start fitting the candidate filter projection in the background
+        if CandidateFilter.ENABLED:
+            self._start_projection_refit()
+        
+        self._loaded.set()
         logger.info(f"FaceMemory initialized with {len(self.people)} people loaded from storage")
+    
+    @property
+    def is_loaded(self):
+        """Whether stored faces have been loaded."""
+        return self._loaded.is_set()
         
     def _get_storage_path(self):
         """Get storage file path."""
@@ -88,6 +269,7 @@ class FaceMemory:
         while not getattr(self, "_stop_periodic_save", False):
             try:
                 current_time = time.time()
+                start_save = False
                 
                 with self._lock:
                     # Calculate time until next scheduled save
@@ -105,10 +287,8 @@ class FaceMemory:
                         # Set auto-save flag if triggered by interval
                         self._auto_save_in_progress = save_due_to_interval
                         self._manual_save_requested = self._save_requested
-                        
-                        # Perform the save
-                        self.save_to_storage() # This now initiates the background save
                         self._save_requested = False # Reset manual request flag
+                        start_save = True
                         
                         # Log the save initiation
                         if self._auto_save_in_progress:
@@ -120,6 +300,11 @@ class FaceMemory:
                         logger.debug(f"Save needed but cooldown active. {self._min_save_cooldown - (current_time - self._last_save_time):.1f}s remaining.")
                         # Ensure the save is requested so it happens after cooldown
                         self._save_requested = True 
+                
+                # Perform the save outside the lock so writers are not blocked
+                # while people are serialized from the snapshot
+                if start_save:
+                    self.save_to_storage() # This initiates the background save
                         
             except Exception as e:
                 logger.error(f"Error in periodic save worker: {e}", exc_info=True)
@@ -192,6 +377,22 @@ class FaceMemory:
                     
                 logger.info(f"Loaded {len(self.people)} people from storage")
                 
+                # Restore the revision counter. Tombstones are not persisted, so
+                # clients that last synced before this point must do a full resync.
+                max_person_rev = max((p.last_modified_rev for p in self.people.values()), default=0)
+                self._revision = max(int(data.get('revision', 0) or 0), max_person_rev)
+                self._tombstone_horizon = self._revision
+                self._tombstones.clear()
+                # Unsaved changes before a restart are lost, so the restored
+                # revision may be lower than what clients have seen
+                self._epoch = uuid.uuid4().hex[:12]
+                self._modified_order = {
+                    person_id: person.last_modified_rev
+                    for person_id, person in sorted(self.people.items(), key=lambda item: item[1].last_modified_rev)
+                }
+                self._people_changed = True
+                self._publish_snapshot()
+                
                 # Set last save time to track when we last loaded or saved
                 self._last_save_time = time.time()
                 
@@ -206,7 +407,11 @@ class FaceMemory:
         except Exception as e:
             logger.error(f"Error loading face data: {e}", exc_info=True)
             # Proceed with empty memory if loading fails
-            self.people.clear()
+            with self._lock:
+                self.people.clear()
+                self._modified_order.clear()
+                self._people_changed = True
+                self._publish_snapshot()
             
     def save_to_storage(self):
         """Prepare data and save to persistent storage in a background process."""
@@ -216,77 +421,90 @@ class FaceMemory:
             return
             
         try:
-            people_count = len(self.people)
-            logger.info(f"Preparing {people_count} people for storage at {storage_path}")
-            
-            # This block prepares data while holding the lock, but doesn't perform I/O
+            # People are updated in place, so they are serialized under the lock,
+            # a batch at a time; people unchanged since the last save reuse its dicts
             with self._lock:
                 if self._save_in_progress:
                     logger.debug("Save already in progress, skipping duplicate save")
                     return
                     
                 self._save_in_progress = True
-                
-                # Reset progress indicators
-                self._save_progress = 0.0
-                self._save_total_items = people_count + 2  # People + validation + writing
-                self._save_processed_items = 0
-                self._save_current_step = "preparing"
-                
-                # Convert all people to dictionaries with JSON-safe values
-                try:
-                    people_data = []
-                    for i, person in enumerate(self.people.values()):
-                        try:
-                            person_dict = self._validate_json_data(person.to_dict())
-                            people_data.append(person_dict)
-                            
-                            # Update progress (70% of progress is person processing)
-                            self._save_processed_items = i + 1
-                            self._save_progress = (self._save_processed_items / self._save_total_items) * 0.7
-                            
-                        except Exception as e:
-                            logger.error(f"Error processing person {person.id} for JSON: {e}")
-                            continue
-                except Exception as e:
-                    logger.error(f"Error converting people to dicts: {e}")
-                    self._save_in_progress = False
-                    self._save_current_step = "error"
-                    raise
-                
-                # Update progress
-                self._save_current_step = "validating"
-                self._save_progress = 0.75
-                
-                # Create data structure with metadata
-                data = {
-                    'people': people_data,
-                    'timestamp': datetime.datetime.now().isoformat(),
-                    'version': '1.0',
-                    'count': people_count
-                }
-                
-                # Serialize data to JSON string before passing to worker process
-                # This avoids serialization issues with complex Python objects
-                try:
-                    json_data = json.dumps(data, indent=2, default=self._json_serializer)
-                except TypeError as e:
-                    logger.error(f"JSON serialization error: {e}")
-                    self._identify_json_problem(data)
-                    self._save_in_progress = False
-                    self._save_current_step = "error"
-                    raise
+                self._save_started = time.perf_counter()
+                snapshot = self._snapshot
+            
+            people_count = len(snapshot.people)
+            logger.info(f"Preparing {people_count} people for storage at {storage_path}")
+            
+            # This block prepares data but doesn't perform I/O
+            # Reset progress indicators
+            self._save_progress = 0.0
+            self._save_total_items = people_count + 2  # People + validation + writing
+            self._save_processed_items = 0
+            self._save_current_step = "preparing"
+            
+            # Convert all people to dictionaries with JSON-safe values
+            try:
+                people_data = []
+                serialized = {}
+                people = list(snapshot.people.values())
+                for start in range(0, len(people), FaceStorage.SERIALIZE_BATCH_SIZE):
+                    with self._lock:
+                        for person in people[start:start + FaceStorage.SERIALIZE_BATCH_SIZE]:
+                            try:
+                                cached = self._serialized.get(person.id)
+                                if cached is not None and cached[0] == person.last_modified_rev:
+                                    person_dict = cached[1]
+                                else:
+                                    person_dict = self._validate_json_data(person.to_dict())
+                                serialized[person.id] = (person.last_modified_rev, person_dict)
+                                people_data.append(person_dict)
+                            except Exception as e:
+                                logger.error(f"Error processing person {person.id} for JSON: {e}")
+                                continue
                     
-                # Create a backup of the existing file if it exists
-                backup_path = f"{storage_path}.bak"
-                backup_exists = os.path.exists(storage_path)
+                    # Update progress (70% of progress is person processing)
+                    self._save_processed_items = min(len(people), start + FaceStorage.SERIALIZE_BATCH_SIZE)
+                    self._save_progress = (self._save_processed_items / self._save_total_items) * 0.7
+                self._serialized = serialized
+            except Exception as e:
+                logger.error(f"Error converting people to dicts: {e}")
+                self._save_in_progress = False
+                self._save_current_step = "error"
+                raise
+            
+            # Update progress
+            self._save_current_step = "validating"
+            self._save_progress = 0.75
+            
+            # Create data structure with metadata
+            data = {
+                'people': people_data,
+                'timestamp': datetime.datetime.now().isoformat(),
+                'version': '1.0',
+                'count': people_count,
+                'revision': snapshot.version
+            }
+            
+            # Serialize data to JSON string before passing to worker process
+            # This avoids serialization issues with complex Python objects
+            try:
+                json_data = json.dumps(data, indent=2, default=self._json_serializer)
+            except TypeError as e:
+                logger.error(f"JSON serialization error: {e}")
+                self._identify_json_problem(data)
+                self._save_in_progress = False
+                self._save_current_step = "error"
+                raise
                 
-                # Update progress
-                self._save_current_step = "writing"
-                self._save_progress = 0.85
+            # Create a backup of the existing file if it exists
+            backup_path = f"{storage_path}.bak"
+            backup_exists = os.path.exists(storage_path)
             
+            # Update progress
+            self._save_current_step = "writing"
+            self._save_progress = 0.85
+        
             # Submit the actual save operation to the process pool
-            # This happens outside the lock to avoid blocking
             future = self._process_pool.submit(
                 self._save_worker,
                 storage_path,
@@ -368,6 +586,10 @@ class FaceMemory:
                 self._save_progress = 1.0 if result["success"] else 0.0
                 
                 if result["success"]:
+                    duration = time.perf_counter() - self._save_started
+                    SAVE_SECONDS.observe(duration)
+                    LAST_SAVE_SECONDS.set(duration)
+                    
                     # Update last save time ONLY on successful completion
                     self._last_save_time = time.time()
                     # Set flag to show completed status in UI for longer
@@ -476,6 +698,15 @@ class FaceMemory:
         self._stop_periodic_save = True
         if hasattr(self, '_save_thread') and self._save_thread.is_alive():
             self._save_thread.join(timeout=5)
+        
+        # Stop the consolidation and retention threads
+        self._stop_maintenance.set()
+        if hasattr(self, '_consolidation_thread') and self._consolidation_thread.is_alive():
+            self._consolidation_thread.join(timeout=5)
+        if hasattr(self, '_retention_thread') and self._retention_thread.is_alive():
+            self._retention_thread.join(timeout=5)
+        if hasattr(self, '_projection_thread') and self._projection_thread.is_alive():
+            self._projection_thread.join(timeout=5)
             
         # Wait for any pending save operations to complete
         if hasattr(self, '_save_results') and self._save_results:
@@ -487,20 +718,34 @@ class FaceMemory:
             except Exception as e:
                 logger.error(f"Error waiting for pending saves: {e}")
         
-        # Do a final synchronous save to ensure latest data is persisted
-        try:
-            # Use a direct save method that doesn't use the process pool
-            self._direct_save_to_storage()
-            logger.info("Final save completed during shutdown")
-        except Exception as e:
-            logger.error(f"Error during final save: {e}", exc_info=True)
-            
+        # Do a final synchronous save to ensure latest data is persisted. A
+        # memory that never finished loading would overwrite the stored faces.
+        if not self._loaded.is_set():
+            logger.warning("Face memory was not loaded, skipping the final save")
+        else:
+            try:
+                # Use a direct save method that doesn't use the process pool
+                self._direct_save_to_storage()
+                logger.info("Final save completed during shutdown")
+            except Exception as e:
+                logger.error(f"Error during final save: {e}", exc_info=True)
+
         # Shutdown the process pool
         if hasattr(self, '_process_pool'):
             self._process_pool.shutdown(wait=False)
             
         logger.info("FaceMemory shutdown complete")
     
+    def save_now(self):
+        """Synchronously write all people to storage, blocking until done.
+        
+        Meant for batch tools that need to know data is on disk (e.g. before
+        recording a checkpoint); the server relies on background saves instead.
+        """
+        self._direct_save_to_storage()
+        with self._lock:
+            self._last_save_time = time.time()
+    
     def _direct_save_to_storage(self):
         """Direct synchronous save method for shutdown."""
         storage_path = self._get_storage_path()
@@ -522,7 +767,8 @@ class FaceMemory:
                     'people': people_data,
                     'timestamp': datetime.datetime.now().isoformat(),
                     'version': '1.0',
-                    'count': len(people_data)
+                    'count': len(people_data),
+                    'revision': self._revision
                 }
                 
                 # Create backup
@@ -541,24 +787,191 @@ class FaceMemory:
                 logger.error(f"Error in direct save: {e}", exc_info=True)
                 raise
         
-    def get_person(self, person_id):
-        """Get a person by ID from memory (fast lookup)."""
+    def _mark_modified(self, person, publish=True):
+        """Bump the revision and stamp it on a person that was added or changed.
+        
+        Must be called with the lock held.
+        
+        Args:
+            person (Person): Person that was added or changed
+            publish (bool): Publish a snapshot now; pass False when changing many
+                people at once and call _publish_snapshot after the last one
+        """
+        self._revision += 1
+        person.last_modified_rev = self._revision
+        
+        # Move the ID to the end so the order stays sorted by revision
+        self._modified_order.pop(person.id, None)
+        self._modified_order[person.id] = self._revision
+        
+        # A person re-using a removed ID is no longer a tombstone
+        self._tombstones.pop(person.id, None)
+        
+        if publish:
+            self._publish_snapshot(changed_ids=(person.id,))
+    
+    def _mark_removed(self, person_id, reason, replaced_by=None, publish=True):
+        """Bump the revision and record a tombstone for a removed person ID.
+        
+        Must be called with the lock held.
+        
+        Args:
+            person_id (str): ID that no longer exists
+            reason (str): Why it was removed ('renamed', 'merged' or 'archived')
+            replaced_by (str, optional): ID that now holds this person's data
+            publish (bool): Publish a snapshot now; pass False when removing many
+                people at once and call _publish_snapshot after the last one
+        """
+        self._revision += 1
+        self._modified_order.pop(person_id, None)
+        self._tombstones.pop(person_id, None)
+        self._tombstones[person_id] = {
+            'id': person_id,
+            'reason': reason,
+            'replaced_by': replaced_by,
+            'rev': self._revision
+        }
+        
+        # Keep tombstones bounded; clients older than the oldest dropped one must resync
+        while len(self._tombstones) > self._max_tombstones:
+            oldest_id = next(iter(self._tombstones))
+            dropped = self._tombstones.pop(oldest_id)
+            self._tombstone_horizon = max(self._tombstone_horizon, dropped['rev'])
+        
+        self._people_changed = True
+        if publish:
+            self._publish_snapshot()
+    
+    def _publish_snapshot(self, changed_ids=()):
+        """Publish a new snapshot for the current revision.
+        
+        Must be called with the lock held. The people mapping is only copied
+        when IDs were added or removed; updates to existing people reuse it.
+        
+        Args:
+            changed_ids (iterable): IDs whose data changed in this mutation
+        """
+        membership_changed = self._people_changed
+        if membership_changed:
+            people = MappingProxyType(dict(self.people))
+            self._people_changed = False
+        else:
+            people = self._snapshot.people
+        self._changes_since_fit += max(len(changed_ids), 1)
+        
+        # Single attribute assignment, so readers see either the old or new snapshot
+        self._snapshot = self._snapshot.derive(self._revision, people, changed_ids, membership_changed,
+                                               self._projection)
+    
+    def get_snapshot(self):
+        """Get the current immutable snapshot of people without locking.
+        
+        Hot paths should take one snapshot and use it for a whole frame.
+        """
+        return self._snapshot
+    
+    def get_revision(self):
+        """Get the current revision number of the face memory."""
+        with self._lock:
+            return self._revision
+    
+    def get_epoch(self):
+        """Get the ID of the revision history that get_revision counts in."""
+        with self._lock:
+            return self._epoch
+    
+    def get_changes(self, since_rev, epoch=None):
+        """Get people added, changed or removed after a given revision.
+        
+        Revisions are only comparable within one epoch: after a restart the
+        revision restored from storage can be lower than one a client saw
+        before, so a client from another epoch gets a full resync.
+        
+        Args:
+            since_rev (int): Revision the client last synced at (0 for everything)
+            epoch (str, optional): Epoch returned with `since_rev`; required
+                for a delta when `since_rev` is above 0
+            
+        Returns:
+            dict: A dictionary containing:
+                - revision: Current revision to use for the next call
+                - epoch: Current epoch to send with the next call
+                - full_resync: True if changes since `since_rev` are no longer known
+                  and `changed` contains every person instead
+                - changed: List of Person objects modified after `since_rev`
+                - removed: List of tombstone dicts for IDs removed after `since_rev`
+        """
         with self._lock:
-            return self.people.get(person_id)
+            full_resync = (since_rev < self._tombstone_horizon or since_rev > self._revision
+                           or (since_rev > 0 and epoch != self._epoch))
+            
+            if full_resync:
+                changed = list(self.people.values())
+                removed = []
+            else:
+                # Walk newest first and stop at the first entry that is not newer
+                changed = []
+                for person_id in reversed(self._modified_order):
+                    if self._modified_order[person_id] <= since_rev:
+                        break
+                    changed.append(self.people[person_id])
+                changed.reverse()
+                
+                removed = []
+                for person_id in reversed(self._tombstones):
+                    tombstone = self._tombstones[person_id]
+                    if tombstone['rev'] <= since_rev:
+                        break
+                    removed.append(dict(tombstone))
+                removed.reverse()
+            
+            return {
+                'revision': self._revision,
+                'epoch': self._epoch,
+                'full_resync': full_resync,
+                'changed': changed,
+                'removed': removed
+            }
+        
+    def get_person(self, person_id):
+        """Get a person by ID from memory (fast lock-free lookup)."""
+        return self._snapshot.people.get(person_id)
     
     def add_person(self, person_id, feature_vector, is_named=False):
         """Add a new person to memory."""
-        with self._lock:
+        with STAGE_SECONDS.labels(stage='update').time(), self._lock:
             person = Person(person_id, feature_vector, is_named, thumbnails_dir=self.thumbnails_dir)
             self.people[person_id] = person
+            self._people_changed = True
+            self._mark_modified(person)
             self._save_requested = True
             return person
     
+    def add_thumbnail(self, person_id, thumbnail_img):
+        """Add a thumbnail image to a person in memory.
+        
+        Args:
+            person_id (str): ID of the person
+            thumbnail_img (numpy.ndarray): The thumbnail image (cropped face)
+            
+        Returns:
+            str: Path to saved thumbnail file or None if failed
+        """
+        with STAGE_SECONDS.labels(stage='thumbnail').time(), self._lock:
+            person = self.people.get(person_id)
+            if not person:
+                return None
+            
+            filepath = person.add_thumbnail(thumbnail_img)
+            if filepath:
+                self._mark_modified(person)
+            return filepath
+    
     def update_person(self, person_id, feature_vector=None, box=None, 
-                     confidence=None, match_score=None, increment_count=True):
+                     confidence=None, match_score=None, increment_count=True, count_increment=1):
         """Update a person's data in memory."""
-        with self._lock:
-            person = self.get_person(person_id)
+        with STAGE_SECONDS.labels(stage='update').time(), self._lock:
+            person = self.people.get(person_id)
             if not person:
                 return None
                 
@@ -573,16 +986,47 @@ class FaceMemory:
                 person.update_match(match_score)
                 
             if increment_count:
-                person.increment_count()
+                person.increment_count(count_increment)
                 
             # Always update last seen time
             person.update_last_seen()
             
+            self._mark_modified(person)
+            
             # Request a save since data was modified
             self._save_requested = True
             
             return person
     
+    def record_sightings(self, sightings):
+        """Count people as seen again without a new feature vector.
+        
+        Used for faces whose identity was carried over from an earlier frame
+        by box overlap, so they still count towards appearances and last seen.
+        
+        Args:
+            sightings (list): (person_id, box, confidence) tuples
+            
+        Returns:
+            dict: Maps each ID still in memory to its updated Person
+        """
+        updated = {}
+        with STAGE_SECONDS.labels(stage='update').time(), self._lock:
+            for person_id, box, confidence in sightings:
+                person = self.people.get(person_id)
+                if not person:
+                    continue
+                person.update_detection(box, confidence)
+                person.increment_count()
+                person.update_last_seen()
+                self._mark_modified(person, publish=False)
+                updated[person_id] = person
+            
+            if updated:
+                self._publish_snapshot(changed_ids=updated)
+                self._save_requested = True
+        return updated
+    
     def rename_person(self, old_id, new_id):
         """Rename a person in memory."""
         with self._lock:
@@ -630,17 +1074,27 @@ class FaceMemory:
             self.people[new_id] = person
             del self.people[old_id]
             
+            self._mark_removed(old_id, 'renamed', replaced_by=new_id)
+            self._mark_modified(person)
+            
             # Request a save since data was modified
             self._save_requested = True
             
             logger.info(f"Renamed person {old_id} to {new_id}")
             return True
     
-    def merge_people(self, source_id, target_id):
-        """Merge two people in memory, keeping the target person."""
+    def merge_people(self, source_id, target_id, publish=True):
+        """Merge two people in memory, keeping the target person.
+        
+        Args:
+            source_id (str): Person merged away
+            target_id (str): Person that is kept
+            publish (bool): Publish a snapshot now; pass False when merging many
+                people at once and call _publish_snapshot after the last one
+        """
         with self._lock:
-            source = self.get_person(source_id)
-            target = self.get_person(target_id)
+            source = self.people.get(source_id)
+            target = self.people.get(target_id)
             
             if not source:
                 logger.error(f"Cannot merge: Source person {source_id} not found")
@@ -661,15 +1115,10 @@ class FaceMemory:
             if source.last_seen > target.last_seen:
                 target.last_seen = source.last_seen
                 
-            # Update feature vector with weighted average if possible
-            if source.feature_vector is not None and target.feature_vector is not None:
-                # Weight by appearance count
-                total_count = source.appearance_count + target.appearance_count
-                if total_count > 0:
-                    source_weight = source.appearance_count / total_count
-                    target_weight = target.appearance_count / total_count
-                    target.feature_vector = (target_weight * target.feature_vector + 
-                                            source_weight * source.feature_vector)
+            # Pool both exemplar sets and keep the most diverse ones
+            source_exemplars = source.get_exemplars()
+            if source_exemplars is not None:
+                target.add_exemplars(source_exemplars)
             
             # Merge thumbnails - copy thumbnail files from source to target
             if self.thumbnails_dir and source.thumbnails and target.person_thumbnails_dir:
@@ -716,65 +1165,447 @@ class FaceMemory:
             # Remove source person
             del self.people[source_id]
             
+            self._mark_removed(source_id, 'merged', replaced_by=target_id, publish=False)
+            self._mark_modified(target, publish=publish)
+            
             # Request a save since data was modified
             self._save_requested = True
             
             logger.info(f"Merged person {source_id} into {target_id}")
             return True
     
-    def find_similar_people(self, feature_vector, threshold=0.6):
-        """Find people with similar feature vectors in memory."""
-        with self._lock:
-            similar_people = []
+    def _start_consolidation(self):
+        """Start a background thread that periodically merges duplicate unnamed faces."""
+        self._consolidation_thread = threading.Thread(target=self._consolidation_worker, daemon=True)
+        self._consolidation_thread.start()
+        logger.info("Started unnamed face consolidation thread")
+    
+    def _consolidation_worker(self):
+        """Worker function that consolidates once enough new unnamed faces have appeared."""
+        while not self._stop_maintenance.wait(FaceConsolidation.CHECK_INTERVAL):
+            try:
+                unnamed_count = len(self._snapshot.unnamed)
+                new_unnamed = unnamed_count - self._last_consolidation_unnamed
+                overdue = (time.time() - self._last_consolidation_time) >= FaceConsolidation.MAX_INTERVAL
+                
+                if new_unnamed >= FaceConsolidation.MIN_NEW_UNNAMED or (overdue and unnamed_count > 1):
+                    self.consolidate_unnamed_faces(dry_run=False)
+            except Exception as e:
+                logger.error(f"Error in consolidation worker: {e}", exc_info=True)
+    
+    def consolidate_unnamed_faces(self, dry_run=True, cosine_threshold=FaceRecognition.COSINE_THRESHOLD,
+                                  norm_l2_threshold=FaceRecognition.NORM_L2_THRESHOLD):
+        """Cluster unnamed people and merge each cluster into a single person.
+        
+        A new unnamed person is created whenever a face matches nobody, so the
+        same person often ends up as many unnamed entries, and every frame has
+        to score all of them. Unnamed people whose features pass the matching
+        thresholds are linked, and each connected group is merged into its
+        member with the most appearances (members that do not match it directly
+        form groups of their own). Named people are never touched.
+        
+        Args:
+            dry_run (bool): Only report the clusters without merging anything
+            cosine_threshold (float): Minimum cosine similarity to link two people
+            norm_l2_threshold (float): Maximum L2 distance to link two people
             
-            for person_id, person in self.people.items():
-                if person.feature_vector is None:
-                    continue
-                    
-                # Calculate cosine similarity
-                similarity = self._calculate_similarity(feature_vector, person.feature_vector)
+        Returns:
+            dict: Report of the clusters found and merges made, or None if
+            another consolidation is already running
+        """
+        if not self._consolidation_lock.acquire(blocking=False):
+            logger.info("Consolidation already in progress, skipping")
+            return None
+        
+        try:
+            start_time = time.time()
+            
+            # Cluster a snapshot so recognition keeps running meanwhile
+            snapshot = self._snapshot
+            partition = snapshot.unnamed
+            clusters = self._cluster_unnamed(snapshot, partition, cosine_threshold, norm_l2_threshold)
+            duplicates = sum(len(cluster['duplicates']) for cluster in clusters)
+            
+            merged = 0
+            skipped = 0
+            if not dry_run and clusters:
+                merged, skipped = self._merge_clusters(clusters)
+            
+            report = {
+                'dry_run': dry_run,
+                'unnamed_people': len(partition),
+                'clusters': clusters,
+                'cluster_count': len(clusters),
+                'duplicates': duplicates,
+                'merged': merged,
+                'skipped': skipped,
+                'cosine_threshold': cosine_threshold,
+                'norm_l2_threshold': norm_l2_threshold,
+                'elapsed_ms': round((time.time() - start_time) * 1000, 2),
+                'completed_at': datetime.datetime.now().isoformat()
+            }
+            
+            if not dry_run:
+                self._last_consolidation_time = time.time()
+                self._last_consolidation_unnamed = len(self._snapshot.unnamed)
+            
+            logger.info(f"{'Dry-run consolidation' if dry_run else 'Consolidation'} of {len(partition)} unnamed people: "
+                        f"{len(clusters)} clusters, {duplicates} duplicates, {merged} merged, {skipped} skipped "
+                        f"in {report['elapsed_ms']:.0f}ms")
+            return report
+        finally:
+            self._consolidation_lock.release()
+    
+    def _cluster_unnamed(self, snapshot, partition, cosine_threshold, norm_l2_threshold):
+        """Group the people in the unnamed partition into connected clusters.
+        
+        Returns:
+            list: One dict per cluster with more than one member, holding the
+            target ID, the duplicate IDs to merge into it and their total appearances
+        """
+        # Union-find over people in the partition, linking every pair that passes a threshold
+        parent = list(range(len(partition)))
+        
+        def find(position):
+            while parent[position] != position:
+                parent[position] = parent[parent[position]]
+                position = parent[position]
+            return position
+        
+        for positions_a, positions_b in partition.similar_pairs(cosine_threshold, norm_l2_threshold,
+                                                                FaceConsolidation.BLOCK_SIZE):
+            for position_a, position_b in zip(positions_a.tolist(), positions_b.tolist()):
+                root_a = find(position_a)
+                root_b = find(position_b)
+                if root_a != root_b:
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+        
+        groups = {}
+        for position in range(len(partition)):
+            groups.setdefault(find(position), []).append(position)
+        
+        # Linking pairs alone can chain different people together through a few
+        # borderline faces, so duplicates must also match the person they are
+        # merged into. Members that do not are clustered again among themselves.
+        cutoff = GalleryPartition.cosine_cutoff(cosine_threshold, norm_l2_threshold)
+        
+        clusters = []
+        for positions in groups.values():
+            # Keep the most established person; ties go to the one seen first
+            members = sorted((snapshot.people[partition.ids[position]] for position in positions),
+                             key=lambda p: (-p.appearance_count, p.first_seen))
+            
+            while len(members) > 1:
+                target = members[0]
+                target_rows = partition.rows_of(target.id)
+                scores = [float((partition.rows_of(p.id) @ target_rows.T).max()) for p in members[1:]]
                 
-                if similarity >= threshold:
-                    similar_people.append((person_id, similarity))
+                duplicates = [p for p, score in zip(members[1:], scores) if score >= cutoff]
+                if duplicates:
+                    clusters.append({
+                        'target': target.id,
+                        'duplicates': [p.id for p in duplicates],
+                        'appearances': target.appearance_count + sum(p.appearance_count for p in duplicates)
+                    })
+                members = [p for p, score in zip(members[1:], scores) if score < cutoff]
+        
+        clusters.sort(key=lambda c: len(c['duplicates']), reverse=True)
+        return clusters
+    
+    def _merge_clusters(self, clusters):
+        """Merge cluster duplicates into their targets, a batch at a time.
+        
+        Returns:
+            tuple: (merged, skipped) counts
+        """
+        merges = [(source_id, cluster['target'])
+                  for cluster in clusters for source_id in cluster['duplicates']]
+        merged = 0
+        skipped = 0
+        
+        for start in range(0, len(merges), FaceConsolidation.MERGE_BATCH_SIZE):
+            with self._lock:
+                changed_ids = set()
+                for source_id, target_id in merges[start:start + FaceConsolidation.MERGE_BATCH_SIZE]:
+                    # Either side may have been named, merged or removed since clustering
+                    source = self.people.get(source_id)
+                    target = self.people.get(target_id)
+                    if source is None or target is None or source.is_named or target.is_named:
+                        skipped += 1
+                        continue
                     
-            # Sort by similarity (highest first)
-            similar_people.sort(key=lambda x: x[1], reverse=True)
+                    if self.merge_people(source_id, target_id, publish=False):
+                        changed_ids.add(target_id)
+                        merged += 1
+                    else:
+                        skipped += 1
+                
+                # One snapshot per batch rather than one copy of the people per merge
+                if changed_ids:
+                    self._publish_snapshot(changed_ids=changed_ids)
             
-            return similar_people
+            # Give recognition threads a chance to take the lock between batches
+            time.sleep(0.01)
+        
+        return merged, skipped
+    
+    def _start_retention(self):
+        """Start a background thread that periodically applies the retention policy."""
+        self._retention_thread = threading.Thread(target=self._retention_worker, daemon=True)
+        self._retention_thread.start()
+        logger.info("Started face retention thread")
+    
+    def _retention_worker(self):
+        """Worker function that evicts stale unnamed people on every check."""
+        while not self._stop_maintenance.wait(FaceRetention.CHECK_INTERVAL):
+            try:
+                self.apply_retention(dry_run=False)
+            except Exception as e:
+                logger.error(f"Error in retention worker: {e}", exc_info=True)
+    
+    def _retention_reason(self, person, now):
+        """Get why a person should be evicted, or None to keep them."""
+        if person.is_named:
+            return None
+        if now - person.last_seen > datetime.timedelta(days=FaceRetention.MAX_IDLE_DAYS):
+            return 'idle'
+        if (person.appearance_count < FaceRetention.MIN_APPEARANCES and
+                now - person.last_seen > datetime.timedelta(hours=FaceRetention.RARE_GRACE_HOURS)):
+            return 'rare'
+        return None
     
-    def _calculate_similarity(self, vec1, vec2):
-        """Calculate cosine similarity between two vectors."""
-        dot_product = np.dot(vec1, vec2)
-        norm1 = np.linalg.norm(vec1)
-        norm2 = np.linalg.norm(vec2)
+    def apply_retention(self, dry_run=True):
+        """Evict stale unnamed people from memory into the cold archive.
         
-        if norm1 == 0 or norm2 == 0:
-            return 0
+        Unnamed people are archived when they have not been seen for
+        FaceRetention.MAX_IDLE_DAYS, or when they were seen fewer than
+        FaceRetention.MIN_APPEARANCES times and not at all during the grace period.
+        Named people are never evicted.
+        
+        Args:
+            dry_run (bool): Only report who would be evicted
             
-        return dot_product / (norm1 * norm2)
+        Returns:
+            dict: Report with the evicted IDs grouped by reason
+        """
+        start_time = time.time()
+        now = datetime.datetime.now()
+        
+        # Find candidates on a snapshot, then re-check each one under the lock
+        candidates = [person.id for person in self._snapshot.people.values()
+                      if self._retention_reason(person, now)]
+        
+        evicted = {'idle': [], 'rare': []}
+        if dry_run:
+            for person_id in candidates:
+                person = self._snapshot.people[person_id]
+                evicted[self._retention_reason(person, now)].append(person_id)
+        else:
+            for start in range(0, len(candidates), FaceRetention.EVICTION_BATCH_SIZE):
+                removed = {'idle': [], 'rare': []}
+                with self._lock:
+                    for person_id in candidates[start:start + FaceRetention.EVICTION_BATCH_SIZE]:
+                        person = self.people.get(person_id)
+                        reason = self._retention_reason(person, now) if person else None
+                        if reason is None:
+                            continue
+                        del self.people[person_id]
+                        self._mark_removed(person_id, 'archived', publish=False)
+                        removed[reason].append(person)
+                    
+                    if removed['idle'] or removed['rare']:
+                        self._publish_snapshot()
+                        self._save_requested = True
+                
+                # Write the archive outside the lock so recognition is not stalled
+                for reason, people in removed.items():
+                    if self.archive:
+                        self.archive.add(people, reason, self.thumbnails_dir)
+                    elif self.thumbnails_dir:
+                        for person in people:
+                            shutil.rmtree(person.person_thumbnails_dir, ignore_errors=True)
+                    evicted[reason].extend(person.id for person in people)
+        
+        report = {
+            'dry_run': dry_run,
+            'evicted': len(evicted['idle']) + len(evicted['rare']),
+            'idle': evicted['idle'],
+            'rare': evicted['rare'],
+            'remaining_people': len(self._snapshot.people),
+            'archived_people': self.archive.count() if self.archive else 0,
+            'max_idle_days': FaceRetention.MAX_IDLE_DAYS,
+            'min_appearances': FaceRetention.MIN_APPEARANCES,
+            'elapsed_ms': round((time.time() - start_time) * 1000, 2)
+        }
+        
+        if report['evicted'] or not dry_run:
+            logger.info(f"{'Dry-run retention' if dry_run else 'Retention'}: {report['evicted']} unnamed people evicted "
+                        f"({len(evicted['idle'])} idle, {len(evicted['rare'])} rare), "
+                        f"{report['remaining_people']} remain in memory")
+        return report
     
-    def get_all_people(self):
-        """Get all people from memory (returns a copy for thread safety)."""
+    def search_archive(self, feature_vector, limit=10, cosine_threshold=FaceRecognition.COSINE_THRESHOLD,
+                       norm_l2_threshold=FaceRecognition.NORM_L2_THRESHOLD):
+        """Search the cold archive for people similar to a feature vector.
+        
+        Returns:
+            list: Archived person dicts with a 'similarity' key, most similar first
+        """
+        if not self.archive:
+            return []
+        return self.archive.search(feature_vector, cosine_threshold, norm_l2_threshold, limit)
+    
+    def restore_from_archive(self, person_id):
+        """Move an archived person back into memory.
+        
+        Returns:
+            Person: The restored person, or None if the ID is not archived or already in memory
+        """
+        if not self.archive:
+            return None
+        
+        if person_id in self._snapshot.people:
+            logger.error(f"Cannot restore {person_id}: ID is already in memory")
+            return None
+        
+        # Rewriting the archive file happens outside the lock so recognition is not stalled
+        record = self.archive.restore(person_id)
+        if record is None:
+            logger.error(f"Cannot restore {person_id}: not found in archive")
+            return None
+        
+        person = Person(person_id, thumbnails_dir=self.thumbnails_dir)
+        person.from_dict(record)
+        
         with self._lock:
-            # Return a copy to prevent concurrent modification issues
-            return dict(self.people)
+            if person_id in self.people:
+                # Created while the archive was rewritten; keep the archived record
+                logger.error(f"Cannot restore {person_id}: ID is already in memory")
+                restored = False
+            else:
+                # Count the restore as a sighting so the policy does not evict them right away
+                person.update_last_seen()
+                self.people[person_id] = person
+                self._people_changed = True
+                self._mark_modified(person)
+                self._save_requested = True
+                restored = True
+        
+        if not restored:
+            self.archive.add([person], record.get('archive_reason', 'restored'))
+            return None
+        if self.thumbnails_dir:
+            self.archive.restore_thumbnails(person_id, self.thumbnails_dir)
+        return person
+    
+    def _start_projection_refit(self):
+        """Start a background thread that keeps the candidate filter projection fitted."""
+        self._projection_thread = threading.Thread(target=self._projection_worker, daemon=True)
+        self._projection_thread.start()
+        logger.info("Started candidate filter projection thread")
+    
+    def _projection_worker(self):
+        """Worker function that refits the projection when the gallery changed significantly."""
+        while not self._stop_maintenance.wait(CandidateFilter.REFIT_CHECK_INTERVAL):
+            try:
+                self.refit_projection()
+            except Exception as e:
+                logger.error(f"Error in projection worker: {e}", exc_info=True)
+    
+    def refit_projection(self, force=False):
+        """Fit the candidate filter projection to the current gallery if needed.
+        
+        A projection is only kept while some partition is large enough to use
+        it, and is refit once the number of changes since the last fit reaches
+        CandidateFilter.REFIT_CHANGE_RATIO of the rows it was fitted on.
+        
+        Args:
+            force (bool): Refit even if the gallery has not changed enough
+            
+        Returns:
+            bool: True if a new projection was published
+        """
+        snapshot = self._snapshot
+        matrices = [p.matrix for p in (snapshot.named, snapshot.unnamed) if len(p)]
+        largest = max((m.shape[0] for m in matrices), default=0)
+        
+        if largest < CandidateFilter.MIN_GALLERY_ROWS:
+            if self._projection is not None:
+                with self._lock:
+                    self._projection = None
+                    self._publish_snapshot()
+                logger.info("Gallery shrank below the candidate filter size, dropped projection")
+            return False
+        
+        projection = self._projection
+        if (not force and projection is not None and
+                self._changes_since_fit < CandidateFilter.REFIT_CHANGE_RATIO * projection.fitted_rows):
+            return False
+        
+        # Fitting works on the snapshot's matrices, so the lock is only taken to publish
+        start_time = time.time()
+        dims = {m.shape[1] for m in matrices}
+        if len(dims) != 1:
+            return False
+        projection = GalleryProjection.fit(np.vstack(matrices))
+        if projection is None:
+            return False
+        
+        with self._lock:
+            self._projection = projection
+            self._publish_snapshot()
+            self._changes_since_fit = 0
+        
+        logger.info(f"Fitted {projection.components.shape[1]}-D candidate filter projection on "
+                    f"{projection.fitted_rows} embedding rows in {(time.time() - start_time) * 1000:.0f}ms")
+        return True
+    
+    def find_similar_people(self, feature_vector, threshold=0.6):
+        """Find people with similar feature vectors in memory.
+        
+        Each person is scored by their most similar exemplar, with one batch
+        product per partition of the current snapshot.
+        """
+        similar_people = []
+        
+        snapshot = self._snapshot
+        for partition in (snapshot.named, snapshot.unnamed):
+            cosine, _ = partition.scores(feature_vector)
+            if cosine is None:
+                continue
+            for position in np.flatnonzero(cosine >= threshold):
+                similar_people.append((partition.ids[position], float(cosine[position])))
+                
+        # Sort by similarity (highest first)
+        similar_people.sort(key=lambda x: x[1], reverse=True)
+        
+        return similar_people
+    
+    def get_all_people(self):
+        """Get all people from memory as a read-only mapping.
+        
+        Returns the mapping of the current snapshot, so no lock is taken and
+        nothing is copied. It stays valid while memory keeps changing.
+        """
+        return self._snapshot.people
     
     def get_stats(self):
         """Get statistics about the face memory."""
-        with self._lock:
-            total_people = len(self.people)
-            named_people = sum(1 for p in self.people.values() if p.is_named)
-            unnamed_people = total_people - named_people
-            total_appearances = sum(p.appearance_count for p in self.people.values())
-            
-            return {
-                'total_people': total_people,
-                'named_people': named_people,
-                'unnamed_people': unnamed_people,
-                'total_appearances': total_appearances,
-                'last_save_time': datetime.datetime.fromtimestamp(self._last_save_time).isoformat(),
-                'in_memory': True  # Flag to indicate we're using in-memory storage
-            }
+        snapshot = self._snapshot
+        total_people = len(snapshot.people)
+        named_people = sum(1 for p in snapshot.people.values() if p.is_named)
+        unnamed_people = total_people - named_people
+        total_appearances = sum(p.appearance_count for p in snapshot.people.values())
+        
+        return {
+            'total_people': total_people,
+            'named_people': named_people,
+            'unnamed_people': unnamed_people,
+            'total_appearances': total_appearances,
+            'last_save_time': datetime.datetime.fromtimestamp(self._last_save_time).isoformat(),
+            'revision': snapshot.version,
+            'in_memory': True  # Flag to indicate we're using in-memory storage
+        }
     
     def get_save_status(self):
         """Get the current save status for UI display.
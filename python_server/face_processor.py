@@ -5,23 +5,63 @@ import os
 import time
 import uuid
 import datetime
-from constants import FaceRecognition as FR
+import threading
+import concurrent.futures
+import functools
+import inference
+from constants import FaceRecognition as FR, FaceImport, FeatureCache, Inference, RecognitionSchedule
 from face_comparison_service import FaceComparisonService
+from embedding_cache import EmbeddingCache
 from face_memory import FaceMemory
-from person import Person
+from gallery import GalleryPartition
+from metrics import STAGE_SECONDS, FRAMES_TOTAL, FACES_DETECTED_TOTAL, FACES_RECOGNIZED_TOTAL, NEW_IDENTITIES_TOTAL
+from recognition_scheduler import AdaptiveScheduler
 
 logger = logging.getLogger(__name__)
 
+# Columns of YuNet detections holding x and y positions: the box corner and
+# the five landmarks. Columns 2 and 3 are the box width and height
+DETECTION_X_COLUMNS = [0, 4, 6, 8, 10, 12]
+DETECTION_Y_COLUMNS = [1, 5, 7, 9, 11, 13]
+
 class FaceProcessor:
     """Class for handling face detection and recognition using OpenCV and ONNX models."""
     
-    def __init__(self, storage_dir=None):
+    def __init__(self, storage_dir=None, with_memory=True, load_memory=True):
+        """Initialize the face processor.
+        
+        Args:
+            storage_dir (str, optional): Directory for face memory storage
+            with_memory (bool): Whether to load FaceMemory. Extraction-only
+                processors (e.g. in worker processes) leave it out.
+            load_memory (bool): Whether to load stored faces right away;
+                otherwise memory.load must be called before processing
+        """
         self.detection_model = None
         self.recognition_model = None
+        self._detection_model_path = None
+        self._recognition_model_path = None
+        self._worker_models = threading.local()  # Per-thread models for worker pools
+        self._worker_models_lock = threading.Lock()
+        self._unclaimed_models = {}  # Models load_models created that no thread has taken yet
+        self._backend_id = cv2.dnn.DNN_BACKEND_DEFAULT
+        self._target_id = cv2.dnn.DNN_TARGET_CPU
+        self._num_threads = None  # Threads setting applied on every thread that runs inference
+        self._warmup = True  # Whether models created for worker threads are warmed up
+        self._inference_status = None  # Backend, target, threads and warm-up time of the loaded models
         self.comparison_service = FaceComparisonService.get_instance()
         
+        # Reuses embeddings of near-identical aligned crops across frames
+        self.embedding_cache = EmbeddingCache() if FeatureCache.ENABLED else None
+        
         # Replace all dictionaries with FaceMemory
-        self.memory = FaceMemory(storage_dir=storage_dir or os.path.join(os.path.dirname(__file__), 'data'))
+        self.memory = None
+        if with_memory:
+            self.memory = FaceMemory(storage_dir=storage_dir or os.path.join(os.path.dirname(__file__), 'data'),
+                                     load=load_memory)
+        
+        # Skips detection and recognition on some frames when they cannot keep up
+        self.scheduler = AdaptiveScheduler(self) if with_memory and RecognitionSchedule.ENABLED else None
         
         # Get the local timezone for accurate timestamp tracking
         self.local_timezone = self._get_local_timezone()
@@ -42,154 +82,401 @@ class FaceProcessor:
             logger.warning(f"Error getting local timezone: {e}. Falling back to UTC.")
             return datetime.timezone.utc
     
-    def load_models(self, detection_model_path, recognition_model_path):
-        """Load the face detection and recognition models."""
+    def load_models(self, detection_model_path, recognition_model_path, backend=Inference.BACKEND,
+                    target=Inference.TARGET, num_threads=Inference.NUM_THREADS, warmup=Inference.WARMUP):
+        """Load the face detection and recognition models.
+        
+        Args:
+            detection_model_path (str): Path of the YuNet model
+            recognition_model_path (str): Path of the SFace model
+            backend (str): OpenCV DNN backend name from inference.BACKENDS, or
+                'auto' to time the CPU backends and use the fastest
+            target (str): OpenCV DNN target name from inference.TARGETS
+            num_threads (int, optional): Threads OpenCV uses per inference
+            warmup (bool): Whether to run dummy inferences before returning
+        """
         try:
             # Check if models exist
             if not os.path.exists(detection_model_path):
                 raise FileNotFoundError(f"Detection model not found at {detection_model_path}")
             if not os.path.exists(recognition_model_path):
                 raise FileNotFoundError(f"Recognition model not found at {recognition_model_path}")
-                
-            # Load YuNet face detection model
-            self.detection_model = cv2.FaceDetectorYN.create(
-                detection_model_path, 
-                "", 
-                (320, 320),  # Input size can be adjusted
-                FR.DETECTION_CONFIDENCE_THRESHOLD,  # Score threshold
-                0.3,  # NMS threshold
-                5000  # Top K
-            )
             
-            # Initialize recognition model in comparison service
-            if not self.comparison_service.initialize(recognition_model_path):
+            inference.set_num_threads(num_threads)
+            autotune_timings = None
+            if backend == 'auto':
+                target = 'cpu'
+                backend, autotune_timings = inference.autotune(functools.partial(
+                    self._create_models, detection_model_path, recognition_model_path))
+            backend_id, target_id = inference.resolve(backend, target)
+            
+            self.detection_model, self.recognition_model = self._create_models(
+                detection_model_path, recognition_model_path, backend_id, target_id)
+            
+            # The comparison service shares the recognizer instead of loading SFace again
+            if not self.comparison_service.initialize(recognizer=self.recognition_model):
                 raise Exception("Failed to initialize comparison service")
-                
-            # Load SFace recognition model for features extraction
-            self.recognition_model = cv2.FaceRecognizerSF.create(
-                recognition_model_path, 
-                ""
-            )
             
-            logger.info("Face detection and recognition models loaded successfully")
+            # Allocate the networks now rather than on the first frame
+            warmup_seconds = inference.warm_up(self.detection_model, self.recognition_model) if warmup else None
+            
+            self._detection_model_path = detection_model_path
+            self._recognition_model_path = recognition_model_path
+            self._backend_id, self._target_id = backend_id, target_id
+            self._num_threads, self._warmup = num_threads, warmup
+            self._inference_status = {
+                'backend': backend,
+                'target': target,
+                'threads': cv2.getNumThreads(),
+                'warmup_ms': round(warmup_seconds * 1000, 1) if warmup_seconds is not None else None,
+                'autotune_ms': autotune_timings
+            }
+            if self.embedding_cache is not None:
+                self.embedding_cache.clear()
+            
+            # Models load on a startup thread that never serves frames, so the
+            # first thread to process one takes them over as its worker models
+            with self._worker_models_lock:
+                self._unclaimed_models = {'detection': self.detection_model,
+                                          'recognition': self.recognition_model}
+            
+            logger.info(f"Face detection and recognition models loaded successfully "
+                        f"(backend {backend}, target {target}, {cv2.getNumThreads()} threads, warm-up "
+                        f"{'skipped' if warmup_seconds is None else f'{warmup_seconds * 1000:.0f}ms'})")
             return True
         except Exception as e:
             logger.error(f"Error loading face models: {e}")
             return False
     
+    def _create_models(self, detection_model_path, recognition_model_path, backend_id, target_id):
+        """Create a detection and a recognition model on the given DNN backend and target.
+        
+        Both load side by side; OpenCV releases the GIL while it reads and parses them.
+        
+        Returns:
+            tuple: (detection_model, recognition_model)
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix='model-load') as executor:
+            detection_future = executor.submit(self._create_detection_model, detection_model_path, backend_id, target_id)
+            recognition_future = executor.submit(cv2.FaceRecognizerSF.create, recognition_model_path, "",
+                                                 backend_id, target_id)
+            return detection_future.result(), recognition_future.result()
+    
+    def _create_detection_model(self, detection_model_path, backend_id=None, target_id=None):
+        """Create a YuNet face detection model, by default on the backend and target of the loaded models."""
+        return cv2.FaceDetectorYN.create(
+            detection_model_path, 
+            "", 
+            (320, 320),  # Input size can be adjusted
+            FR.DETECTION_CONFIDENCE_THRESHOLD,  # Score threshold
+            0.3,  # NMS threshold
+            5000,  # Top K
+            self._backend_id if backend_id is None else backend_id,
+            self._target_id if target_id is None else target_id
+        )
+    
+    def ensure_models_loaded(self):
+        """Load the bundled models if they have not been loaded yet."""
+        if self.detection_model is not None and self.recognition_model is not None:
+            return True
+            
+        logger.error("Face models not loaded, attempting to load them now.")
+        assets_dir = os.path.join(os.path.dirname(__file__),'..', 'assets')
+        detection_model_path = os.path.join(assets_dir, 'face_detection_yunet_2023mar.onnx')
+        recognition_model_path = os.path.join(assets_dir, 'face_recognition_sface_2021dec.onnx')
+        return self.load_models(detection_model_path, recognition_model_path)
+    
+    def _get_worker_models(self):
+        """Get detection and recognition models private to the calling thread.
+        
+        OpenCV models keep per-call state (such as the detector input size),
+        so threads running in parallel each need their own instances.
+        
+        Returns:
+            tuple: (detection_model, recognition_model), or None if models were never loaded
+        """
+        if not self._models_configured():
+            return None
+        return self._get_worker_detection_model(), self._get_worker_recognition_model()
+    
+    def _models_configured(self):
+        """Check whether load_models succeeded, so worker models can be created."""
+        return self._detection_model_path is not None and self._recognition_model_path is not None
+    
+    def _claim_loaded_model(self, kind):
+        """Take the 'detection' or 'recognition' model of load_models, or None if a thread already took it."""
+        with self._worker_models_lock:
+            return self._unclaimed_models.pop(kind, None)
+    
+    def _get_worker_detection_model(self):
+        """Get the calling thread's detector, creating it on first use; models must be loaded."""
+        model = getattr(self._worker_models, 'detection', None)
+        if model is None:
+            model = self._claim_loaded_model('detection')
+            if model is None:
+                model = self._create_worker_detection_model()
+            self._worker_models.detection = model
+        return model
+    
+    def _get_worker_recognition_model(self):
+        """Get the calling thread's recognizer, creating it on first use; models must be loaded."""
+        model = getattr(self._worker_models, 'recognition', None)
+        if model is None:
+            model = self._claim_loaded_model('recognition')
+            if model is None:
+                model = self._create_worker_recognition_model()
+            self._worker_models.recognition = model
+        return model
+    
+    def _create_worker_detection_model(self):
+        """Create a detector for the calling thread, set up and warmed up like the loaded models."""
+        inference.set_num_threads(self._num_threads)
+        model = self._create_detection_model(self._detection_model_path)
+        warmup_seconds = inference.warm_up(model, None) if self._warmup else None
+        self._log_worker_model('detection', warmup_seconds)
+        return model
+    
+    def _create_worker_recognition_model(self):
+        """Create a recognizer for the calling thread, set up and warmed up like the loaded models."""
+        inference.set_num_threads(self._num_threads)
+        model = cv2.FaceRecognizerSF.create(self._recognition_model_path, "", self._backend_id, self._target_id)
+        warmup_seconds = inference.warm_up(None, model) if self._warmup else None
+        self._log_worker_model('recognition', warmup_seconds)
+        return model
+    
+    @staticmethod
+    def _log_worker_model(kind, warmup_seconds):
+        logger.debug(f"Created face {kind} model for thread {threading.current_thread().name} "
+                     f"(warm-up {'skipped' if warmup_seconds is None else f'{warmup_seconds * 1000:.0f}ms'})")
+    
+    def _compute_feature(self, aligned_face, recognition_model=None):
+        """Compute the embedding of an aligned face, using the embedding cache if enabled."""
+        recognition_model = recognition_model or self.recognition_model
+        if self.embedding_cache is None:
+            return recognition_model.feature(aligned_face)
+        return self.embedding_cache.get_or_compute(
+            aligned_face,
+            self._recognition_model_path,
+            lambda crop: recognition_model.feature(crop).copy()
+        )
+    
+    def get_status(self):
+        """Get runtime statistics of the processing pipeline."""
+        return {
+            'inference': self._inference_status,
+            'embedding_cache': self.embedding_cache.get_stats() if self.embedding_cache is not None else None,
+            'scheduler': self.scheduler.get_status() if self.scheduler is not None else None
+        }
+    
     def _get_next_face_id(self):
         """Generate a unique ID for new faces."""
         unique_id = str(uuid.uuid4())[:8]  # Use just the first 8 characters for brevity
         return f"Face_{unique_id}"
             
-    def detect_faces(self, frame):
-        """Detect faces in the frame."""
-        if self.detection_model is None:
-            logger.error("Detection model not loaded")
-            return frame, []
+    def run_detection(self, frame, scale=1.0, roi=None, batcher=None):
+        """Run the face detector, optionally on a downscaled copy of the frame.
+        
+        Args:
+            frame (numpy.ndarray): Full-resolution frame
+            scale (float): Size of the image the detector sees relative to the frame
+            roi (RegionOfInterest, optional): Only the bounding box of its regions
+                is detected on, and faces centered outside them are dropped
+            batcher (DetectionBatcher, optional): Detects the frame together with
+                frames submitted by other threads
             
-        # Set input size
+        Returns:
+            numpy.ndarray: YuNet detections (boxes and landmarks in full-frame
+            coordinates), or None if no face was found
+        """
         height, width, _ = frame.shape
-        self.detection_model.setInputSize((width, height))
+        offset_x, offset_y = 0, 0
+        image = frame
+        if roi is not None:
+            x1, y1, x2, y2 = roi.bounds(width, height)
+            if x2 <= x1 or y2 <= y1:
+                return None
+            # Cropping is a view, so it costs nothing before the resize
+            image = frame[y1:y2, x1:x2]
+            offset_x, offset_y = x1, y1
+        
+        crop_height, crop_width = image.shape[:2]
+        if scale != 1.0:
+            scaled_size = (max(1, int(crop_width * scale)), max(1, int(crop_height * scale)))
+            image = cv2.resize(image, scaled_size, interpolation=cv2.INTER_AREA)
+            
+        if not self._models_configured():
+            return None
         
         # Detect faces
-        faces = self.detection_model.detect(frame)
+        with STAGE_SECONDS.labels(stage='detect').time():
+            if batcher is not None:
+                faces = batcher.detect(image)
+            else:
+                # Set input size on this thread's detector, as camera workers detect in parallel
+                detection_model = self._get_worker_detection_model()
+                detection_model.setInputSize((image.shape[1], image.shape[0]))
+                faces = detection_model.detect(image)[1]
+        FRAMES_TOTAL.inc()
+        if faces is None or image is frame:
+            if faces is not None:
+                FACES_DETECTED_TOTAL.inc(len(faces))
+            return faces
         
-        # If no faces detected, return original frame
-        if faces[1] is None:
-            return frame, []
+        # Map boxes and landmarks (alternating x and y) back to the full frame;
+        # box width and height are only scaled
+        faces = faces.copy()
+        faces[:, 0:14:2] *= crop_width / image.shape[1]
+        faces[:, 1:14:2] *= crop_height / image.shape[0]
+        faces[:, DETECTION_X_COLUMNS] += offset_x
+        faces[:, DETECTION_Y_COLUMNS] += offset_y
+        if roi is not None:
+            faces = roi.filter_detections(faces, width, height)
+        if faces is not None:
+            FACES_DETECTED_TOTAL.inc(len(faces))
+        return faces
+    
+    def find_faces(self, frame, roi=None):
+        """Detect faces in the frame without drawing anything.
+        
+        Args:
+            frame (numpy.ndarray): Full-resolution frame
+            roi (RegionOfInterest, optional): Limits detection to parts of the frame
+        
+        Returns:
+            list: Dicts with 'box' and 'confidence' for each face above the threshold
+        """
+        if self.detection_model is None:
+            logger.error("Detection model not loaded")
+            return []
+            
+        faces = self.run_detection(frame, roi=roi)
+        if faces is None:
+            return []
             
-        # Draw bounding boxes around detected faces
-        result_frame = frame.copy()
         detected_faces = []
-        
-        for face_info in faces[1]:
-            # Extract face information
-            box = list(map(int, face_info[:4]))
+        for face_info in faces:
             confidence = face_info[4]
             
-            # Only process faces with confidence above threshold
+            # Only keep faces with confidence above threshold
             if confidence < FR.DETECTION_CONFIDENCE_THRESHOLD:
                 continue
                 
-            x, y, w, h = box
-            # Draw rectangle around face
-            cv2.rectangle(result_frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-            cv2.putText(result_frame, f"Confidence: {confidence:.2f}", (x, y - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-            
-            # Store face information
             detected_faces.append({
-                'box': box,
+                'box': list(map(int, face_info[:4])),
                 'confidence': float(confidence)
             })
             
+        return detected_faces
+    
+    def detect_faces(self, frame):
+        """Detect faces in the frame and return an annotated copy with the results."""
+        detected_faces = self.find_faces(frame)
+        if not detected_faces:
+            return frame, []
+        result_frame = frame.copy()
+        self.render_detections(result_frame, detected_faces)
         return result_frame, detected_faces
     
-    def _find_matching_tracked_face(self, face_feature, face_box):
-        """Find if the current face matches any tracked face."""
+    @staticmethod
+    def _scale_box(box, scale):
+        """Scale an (x, y, w, h) box from the processed frame to the output frame."""
+        if scale == 1.0:
+            return box
+        return [int(round(value * scale)) for value in box]
+    
+    def render_detections(self, frame, detected_faces, scale=1.0):
+        """Draw detection results onto a frame in place.
+        
+        Args:
+            frame (numpy.ndarray): Output frame to draw on
+            detected_faces (list): Results of find_faces
+            scale (float): Output frame size relative to the frame that was processed
+        """
+        for face in detected_faces:
+            x, y, w, h = self._scale_box(face['box'], scale)
+            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+            cv2.putText(frame, f"Confidence: {face['confidence']:.2f}", (x, y - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        return frame
+    
+    def _find_matching_tracked_face(self, face_feature, face_box, snapshot=None):
+        """Find if the current face matches any tracked face.
+        
+        Args:
+            face_feature (numpy.ndarray): Feature vector of the face
+            face_box (list): Bounding box [x, y, width, height]
+            snapshot (FaceMemorySnapshot, optional): Snapshot to match against,
+                defaults to the current one
+        """
+        snapshot = snapshot or self.memory.get_snapshot()
+        
+        # Tracked faces can be either named or unnamed, so check both partitions
         best_match_id = None
         best_match_score = 0.0
-        
-        # Check all people in memory
-        for person_id, person in self.memory.get_all_people().items():
-            if person.feature_vector is None:
-                continue
-                
-            # Check similarity
-            is_similar = self.comparison_service.are_features_similar(
-                face_feature, 
-                person.feature_vector,
-                cosine_threshold=FR.COSINE_THRESHOLD,
-                norm_l2_threshold=FR.NORM_L2_THRESHOLD
+        for partition in (snapshot.named, snapshot.unnamed):
+            person_id, cosine_score, _ = partition.best_match(
+                face_feature,
+                FR.COSINE_THRESHOLD,
+                FR.NORM_L2_THRESHOLD
             )
-            
-            # Only get confidence scores if the faces are similar
-            if is_similar:
-                # Get the cosine score for ranking matches
-                cosine_score = self.comparison_service.calculate_cosine_distance(
-                    face_feature, person.feature_vector)
-                
-                if cosine_score > best_match_score:
-                    best_match_id = person_id
-                    best_match_score = cosine_score
+            if person_id is not None and cosine_score > best_match_score:
+                best_match_id = person_id
+                best_match_score = cosine_score
         
         return best_match_id, best_match_score
     
-    def _find_matching_known_face(self, face_feature):
-        """Find if the current face matches any named person in memory."""
-        best_match_id = None
-        best_cosine_score = 0.0
-        best_norm_l2_score = float('inf')
+    def _find_matching_known_face(self, face_feature, snapshot=None):
+        """Find if the current face matches any named person in memory.
         
-        # Check each named person for a match
-        for person_id, person in self.memory.get_all_people().items():
-            if not person.is_named or person.feature_vector is None:
-                continue
-                
-            # Check similarity first
-            is_similar = self.comparison_service.are_features_similar(
-                face_feature, 
-                person.feature_vector,
-                cosine_threshold=FR.COSINE_THRESHOLD,
-                norm_l2_threshold=FR.NORM_L2_THRESHOLD
-            )
-            
-            # Only get confidence scores if the faces are similar
-            if is_similar:
-                # Get the confidence scores for ranking matches
-                cosine_score = self.comparison_service.calculate_cosine_distance(
-                    face_feature, person.feature_vector)
-                norm_l2_score = self.comparison_service.calculate_norm_l2_distance(
-                    face_feature, person.feature_vector)
-                
-                if cosine_score > best_cosine_score:
-                    best_match_id = person_id
-                    best_cosine_score = cosine_score
-                    best_norm_l2_score = norm_l2_score
+        Args:
+            face_feature (numpy.ndarray): Feature vector of the face
+            snapshot (FaceMemorySnapshot, optional): Snapshot to match against,
+                defaults to the current one
+        """
+        snapshot = snapshot or self.memory.get_snapshot()
+        
+        # Only the named partition is scored; large partitions pick candidates
+        # from a low-dimensional projection before exact re-ranking
+        best_match_id, best_cosine_score, best_norm_l2_score = snapshot.named.best_match(
+            face_feature,
+            FR.COSINE_THRESHOLD,
+            FR.NORM_L2_THRESHOLD
+        )
         
         return best_match_id, (best_cosine_score, best_norm_l2_score)
     
+    def _merge_similar_unnamed_faces(self, face_features, person_id, log_prefix=""):
+        """Merge unnamed faces similar to any of the given features into a named person.
+        
+        All features are matched against one snapshot before any merge happens.
+        
+        Args:
+            face_features (list): Feature vectors of the named person's faces
+            person_id (str): ID of the named person to merge into
+            log_prefix (str): Prefix for log messages
+            
+        Returns:
+            int: Number of unnamed faces merged
+        """
+        # Only the unnamed partition can contain merge candidates; score every
+        # feature against it in one batch
+        unnamed = self.memory.get_snapshot().unnamed
+        candidate_ids = []
+        if face_features:
+            cosine, norm_l2 = unnamed.scores_batch(np.vstack([np.reshape(f, (1, -1)) for f in face_features]))
+            if cosine is not None:
+                similar = ((cosine >= FR.COSINE_THRESHOLD) | (norm_l2 <= FR.NORM_L2_THRESHOLD)).any(axis=0)
+                best = cosine.max(axis=0)
+                for position in np.flatnonzero(similar)[np.argsort(-best[similar], kind='stable')]:
+                    if unnamed.ids[position] != person_id:
+                        candidate_ids.append(unnamed.ids[position])
+        
+        for candidate_id in candidate_ids:
+            logger.info(f"{log_prefix}Merging similar unnamed face {candidate_id} into {person_id}")
+            self.memory.merge_people(candidate_id, person_id)
+        
+        return len(candidate_ids)
+    
     def get_face_counts(self):
         """Return the count of appearances for each tracked face."""
         result = {}
@@ -231,29 +518,108 @@ class FaceProcessor:
         return self.memory.merge_people(source_face_id, target_face_id)
     
     def recognize_faces(self, frame):
-        """Detect and recognize faces in the frame."""
+        """Detect and recognize faces in the frame and return an annotated copy with the results."""
+        recognized_faces = self.analyze_faces(frame)
+        if not recognized_faces:
+            return frame, []
+        result_frame = frame.copy()
+        self.render_recognitions(result_frame, recognized_faces)
+        return result_frame, recognized_faces
+    
+    def render_recognitions(self, frame, recognized_faces, scale=1.0):
+        """Draw recognition results onto a frame in place.
+        
+        Args:
+            frame (numpy.ndarray): Output frame to draw on
+            recognized_faces (list): Results of analyze_faces
+            scale (float): Output frame size relative to the frame that was processed
+        """
+        for face in recognized_faces:
+            x, y, w, h = self._scale_box(face['box'], scale)
+            
+            # Color based on recognition status
+            if face['named_person']:
+                color = (0, 255, 0)  # Green for recognized named people
+            else:
+                color = (0, 165, 255)  # Orange for tracked but unnamed faces
+            
+            # Draw rectangle and label with more detailed information
+            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+            
+            # Display more informative labels for better UI
+            label = f"{face['id']}"
+            if face['named_person']:
+                sub_label = f"Seen {face['appearance_count']} times"
+            else:
+                sub_label = f"Confidence: {face['match_score']:.2f}"
+                
+            # Draw main label
+            cv2.putText(frame, label, (x, y - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+            
+            # Draw sub-label
+            cv2.putText(frame, sub_label, (x, y + h + 20),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+        return frame
+    
+    def process_frame(self, frame, roi=None):
+        """Recognize faces in a live frame through the adaptive scheduler.
+        
+        Unlike analyze_faces, results may be reused from earlier frames or
+        carried over by box overlap when the scheduler is skipping work.
+        
+        Args:
+            frame (numpy.ndarray): Full-resolution frame
+            roi (RegionOfInterest, optional): Limits detection to parts of the frame
+        
+        Returns:
+            list: Recognized face dicts, most recently seen first
+        """
+        if self.scheduler is None:
+            return self.analyze_faces(frame, roi=roi)
+        return self.scheduler.process(frame, roi)
+    
+    def analyze_faces(self, frame, detections=None, roi=None, features=None):
+        """Detect and recognize faces in the frame, updating face memory.
+        
+        Nothing is drawn and the frame is not copied; image endpoints draw the
+        results afterwards with render_recognitions.
+        
+        Args:
+            frame (numpy.ndarray): Full-resolution frame
+            detections (numpy.ndarray, optional): Output of run_detection for
+                this frame, if the caller already ran the detector
+            roi (RegionOfInterest, optional): Limits detection to parts of the
+                frame when `detections` is not given
+            features (list, optional): Embeddings of `detections`, in the same
+                order, if they were computed elsewhere (see extract_frame_faces)
+        
+        Returns:
+            list: Recognized face dicts, most recently seen first
+        """
         if self.detection_model is None or self.recognition_model is None:
             logger.error("Detection or recognition model not loaded")
-            return frame, []
+            return []
             
         # First detect faces
-        height, width, _ = frame.shape
-        self.detection_model.setInputSize((width, height))
-        faces = self.detection_model.detect(frame)
+        faces = detections if detections is not None else self.run_detection(frame, roi=roi)
         
-        # If no faces detected, return original frame
-        if faces[1] is None:
-            return frame, []
+        # If no faces detected, there is nothing to recognize
+        if faces is None or len(faces) == 0:
+            return []
             
-        result_frame = frame.copy()
+        recognition_model = self._get_worker_recognition_model() if features is None else None
         recognized_faces = []
         current_time = time.time()
         current_datetime = datetime.datetime.now(self.local_timezone)
         
+        # Take exactly one snapshot of memory for matching all faces in this frame
+        snapshot = self.memory.get_snapshot()
+        
         # Track if we made any updates that require saving
         made_updates = False
         
-        for face_info in faces[1]:
+        for index, face_info in enumerate(faces):
             # Extract face information
             box = list(map(int, face_info[:4]))
             confidence = face_info[4]
@@ -262,19 +628,18 @@ class FaceProcessor:
             if confidence < FR.DETECTION_CONFIDENCE_THRESHOLD:
                 continue
                 
-            x, y, w, h = box
-            
-            # Extract aligned face for recognition
-            aligned_face = self.recognition_model.alignCrop(frame, face_info)
-            
-            # Get face feature
-            face_feature = self.recognition_model.feature(aligned_face)
+            if features is not None:
+                face_feature = features[index]
+            else:
+                face_feature = self._embed_face(frame, face_info, recognition_model)
             
             # First, try to match with tracked faces to maintain consistent ID
-            tracked_face_id, tracked_match_score = self._find_matching_tracked_face(face_feature, box)
+            with STAGE_SECONDS.labels(stage='match').time():
+                tracked_face_id, tracked_match_score = self._find_matching_tracked_face(face_feature, box, snapshot)
             
             # Create a thumbnail from the face region
-            thumbnail_img = self._create_thumbnail_from_face(frame, face_info)
+            with STAGE_SECONDS.labels(stage='thumbnail').time():
+                thumbnail_img = self._create_thumbnail_from_face(frame, face_info)
             
             # If we found a tracked face match, use that ID
             if tracked_face_id:
@@ -295,7 +660,7 @@ class FaceProcessor:
                 
                 # Add thumbnail to person if available
                 if thumbnail_img is not None and person:
-                    person.add_thumbnail(thumbnail_img)
+                    self.memory.add_thumbnail(face_id, thumbnail_img)
                     
                 made_updates = True
             else:
@@ -306,7 +671,8 @@ class FaceProcessor:
                 match_scores = (0.0, float('inf'))
                 
                 # Use the dedicated method to find matching known face
-                known_face_id, match_scores = self._find_matching_known_face(face_feature)
+                with STAGE_SECONDS.labels(stage='match').time():
+                    known_face_id, match_scores = self._find_matching_known_face(face_feature, snapshot)
                 
                 if known_face_id:
                     face_id = known_face_id
@@ -325,7 +691,7 @@ class FaceProcessor:
                     
                     # Add thumbnail to person if available
                     if thumbnail_img is not None and person:
-                        person.add_thumbnail(thumbnail_img)
+                        self.memory.add_thumbnail(face_id, thumbnail_img)
                         
                     made_updates = True
                 
@@ -333,6 +699,7 @@ class FaceProcessor:
                 if not face_id:
                     face_id = self._get_next_face_id()
                     match_confidence = 0.0
+                    NEW_IDENTITIES_TOTAL.inc()
                     
                     # Add new person to memory
                     person = self.memory.add_person(
@@ -351,7 +718,7 @@ class FaceProcessor:
                     
                     # Add thumbnail to the new person
                     if thumbnail_img is not None and person:
-                        person.add_thumbnail(thumbnail_img)
+                        self.memory.add_thumbnail(face_id, thumbnail_img)
                         
                     made_updates = True
             
@@ -360,34 +727,9 @@ class FaceProcessor:
             if not person:
                 continue  # Skip if person not found (shouldn't happen)
                 
-            # Color based on recognition status
-            if named_person:
-                color = (0, 255, 0)  # Green for recognized named people
-            else:
-                color = (0, 165, 255)  # Orange for tracked but unnamed faces
-            
             # Get appearance count
             appearance_count = person.appearance_count
             
-            # Draw rectangle and label with more detailed information
-            cv2.rectangle(result_frame, (x, y), (x + w, y + h), color, 2)
-            
-            # Display more informative labels for better UI
-            if named_person:
-                label = f"{face_id}"
-                sub_label = f"Seen {appearance_count} times"
-            else:
-                label = f"{face_id}"
-                sub_label = f"Confidence: {match_confidence:.2f}"
-                
-            # Draw main label
-            cv2.putText(result_frame, label, (x, y - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-            
-            # Draw sub-label
-            cv2.putText(result_frame, sub_label, (x, y + h + 20),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
-            
             # Store recognized face information with count and timestamp
             recognized_faces.append({
                 'box': box,
@@ -402,6 +744,8 @@ class FaceProcessor:
                 'thumbnail_url': person.get_thumbnail_url() if person else None
             })
         
+        FACES_RECOGNIZED_TOTAL.inc(len(recognized_faces))
+        
         # Sort the recognized faces by recency (newest first)
         recognized_faces.sort(key=lambda face: face['last_seen'], reverse=True)
         
@@ -422,20 +766,67 @@ class FaceProcessor:
                 self._last_save_request_time = current_time
                 self._face_updates_since_save = 0  # Reset counter
             
-        return result_frame, recognized_faces
+        return recognized_faces
+        
+    def _embed_face(self, frame, face_info, recognition_model):
+        """Align a detected face and compute its embedding, reusing that of a near-identical crop."""
+        with STAGE_SECONDS.labels(stage='align').time():
+            aligned_face = recognition_model.alignCrop(frame, face_info)
+        with STAGE_SECONDS.labels(stage='embed').time():
+            return self._compute_feature(aligned_face, recognition_model)
+    
+    def extract_frame_faces(self, frame, roi=None):
+        """Detect faces and compute their embeddings, without matching them.
+        
+        Worker processes run this part of recognition; analyze_faces then
+        matches the results against face memory in the server process.
+        
+        Args:
+            frame (numpy.ndarray): Full-resolution frame
+            roi (RegionOfInterest, optional): Limits detection to parts of the frame
+        
+        Returns:
+            tuple: (detections above the confidence threshold, or None if there
+            are none, and a list with the embedding of each of them)
+        """
+        faces = self.run_detection(frame, roi=roi)
+        if faces is None:
+            return None, []
+        faces = faces[faces[:, 4] >= FR.DETECTION_CONFIDENCE_THRESHOLD]
+        if len(faces) == 0:
+            return None, []
+        recognition_model = self._get_worker_recognition_model()
+        return faces, [np.array(self._embed_face(frame, face_info, recognition_model)) for face_info in faces]
+    
+    def get_model_options(self):
+        """Get the arguments of load_models that loaded the current models, to load them elsewhere.
         
-    def detect_best_face(self, img):
+        Returns:
+            tuple: (detection_model_path, recognition_model_path, dict of the
+            other load_models arguments), or None if no models were loaded
+        """
+        if not self._models_configured():
+            return None
+        return self._detection_model_path, self._recognition_model_path, {
+            'backend': self._inference_status['backend'],
+            'target': self._inference_status['target'],
+            'num_threads': self._num_threads,
+            'warmup': self._warmup
+        }
+    
+    def detect_best_face(self, img, detection_model=None):
         """Detect the face with the highest confidence in an image."""
-        if self.detection_model is None:
+        detection_model = detection_model or self.detection_model
+        if detection_model is None:
             logger.error("Detection model not loaded")
             return None, 0
             
         # Set input size for detection
         height, width, _ = img.shape
-        self.detection_model.setInputSize((width, height))
+        detection_model.setInputSize((width, height))
         
         # Detect faces
-        faces = self.detection_model.detect(img)
+        faces = detection_model.detect(img)
         
         # If no faces detected, return None
         if faces[1] is None or len(faces[1]) == 0:
@@ -453,16 +844,17 @@ class FaceProcessor:
                 
         return best_face, best_confidence
     
-    def extract_face_feature(self, img, face_info):
+    def extract_face_feature(self, img, face_info, recognition_model=None):
         """Extract face features from aligned face."""
-        if self.recognition_model is None:
+        recognition_model = recognition_model or self.recognition_model
+        if recognition_model is None:
             logger.error("Recognition model not loaded")
             return None
             
         try:
             # Align and extract face
-            aligned_face = self.recognition_model.alignCrop(img, face_info)
-            face_feature = self.recognition_model.feature(aligned_face)
+            aligned_face = recognition_model.alignCrop(img, face_info)
+            face_feature = recognition_model.feature(aligned_face)
             return face_feature
         except Exception as e:
             logger.error(f"Error extracting face feature: {e}")
@@ -511,23 +903,7 @@ class FaceProcessor:
         
         # Check if this face is similar to any existing tracked face
         # and merge if appropriate - but only for unnamed faces
-        for person_id, person in self.memory.get_all_people().items():
-            if person.is_named or person_id == face_id:
-                continue  # Skip named people and the face we just added
-                
-            if person.feature_vector is None:
-                continue
-                
-            is_similar = self.comparison_service.are_features_similar(
-                face_feature, 
-                person.feature_vector,
-                FR.COSINE_THRESHOLD, 
-                FR.NORM_L2_THRESHOLD
-            )
-            
-            if is_similar:
-                logger.info(f"Merging similar unnamed face {person_id} into {face_id}")
-                self.memory.merge_people(person_id, face_id)
+        self._merge_similar_unnamed_faces([face_feature], face_id)
         
         # Save changes to disk
         self.memory.request_save()
@@ -535,99 +911,121 @@ class FaceProcessor:
         logger.info(f"Successfully added face: {face_id}")
         return True
 
+    def extract_import_face(self, img, min_confidence=FaceImport.MIN_CONFIDENCE):
+        """Detect the best face in an import image and compute its embedding.
+        
+        Uses per-thread models, so it can run on several worker threads at once.
+        Nothing is written to memory.
+        
+        Args:
+            img (numpy.ndarray): Decoded BGR image
+            min_confidence (float): Minimum detection confidence
+                
+        Returns:
+            tuple: (face, error) where face is a dict with 'feature', 'confidence'
+            and 'thumbnail' on success (error is None), or None with an error message
+        """
+        models = self._get_worker_models()
+        if models is None:
+            return None, "Face models not loaded"
+        detection_model, recognition_model = models
+        
+        # 1. Detect the best face
+        face_info, confidence = self.detect_best_face(img, detection_model)
+        if face_info is None:
+            return None, "No face detected"
+        if confidence < min_confidence:
+            return None, f"Face confidence too low: {confidence:.2f} < {min_confidence}"
+        
+        # 2. Extract face features
+        face_feature = self.extract_face_feature(img, face_info, recognition_model)
+        if face_feature is None:
+            return None, "Failed to extract face features"
+        
+        # 3. Generate a thumbnail from the face for display
+        thumbnail_img = self._create_thumbnail_from_face(img, face_info)
+        
+        return {
+            'feature': face_feature,
+            'confidence': float(confidence),
+            'thumbnail': thumbnail_img
+        }, None
+    
+    def enroll_person(self, person_name, faces):
+        """Add or update a named person from faces extracted from several images.
+        
+        All embeddings go into a single memory update, where the most diverse
+        ones are kept as the person's exemplars; unnamed faces similar to any
+        of them are merged in one pass, and one save is requested.
+        
+        Args:
+            person_name (str): Name of the person
+            faces (list): Face dicts returned by extract_import_face
+            
+        Returns:
+            int: Number of unnamed faces merged into the person
+        """
+        if not faces:
+            return 0
+        
+        features = [GalleryPartition.normalize(face['feature']) for face in faces]
+        features = [feature for feature in features if feature is not None]
+        if not features:
+            return 0
+        stacked_features = np.vstack(features)
+        best_confidence = max(face['confidence'] for face in faces)
+        
+        if self.memory.get_person(person_name):
+            self.memory.update_person(
+                person_name,
+                feature_vector=stacked_features,
+                box=[0, 0, 100, 100],  # Default box
+                confidence=best_confidence,
+                count_increment=len(faces)
+            )
+            logger.info(f"Updated existing person: {person_name} from {len(faces)} images")
+        else:
+            self.memory.add_person(
+                person_name,
+                feature_vector=None,
+                is_named=True
+            )
+            self.memory.update_person(
+                person_name,
+                feature_vector=stacked_features,
+                box=[0, 0, 100, 100],  # Default box
+                confidence=best_confidence,
+                count_increment=len(faces)
+            )
+            logger.info(f"Added new person: {person_name} from {len(faces)} images")
+        
+        # Only the 5 latest thumbnails are kept, so add the most confident ones last
+        thumbnail_faces = [face for face in faces if face.get('thumbnail') is not None]
+        thumbnail_faces.sort(key=lambda face: face['confidence'])
+        for face in thumbnail_faces[-5:]:
+            self.memory.add_thumbnail(person_name, face['thumbnail'])
+        
+        # Check for similar unnamed faces and merge them
+        merged = self._merge_similar_unnamed_faces(features, person_name, log_prefix="Import: ")
+        
+        # Request save after import
+        self.memory.request_save()
+        
+        return merged
+    
     def process_imported_face_image(self, img, person_name):
         """Process a single face image for batch import and add to known faces."""
         try:
             # Ensure models are loaded
-            if self.detection_model is None or self.recognition_model is None:
-                logger.error("Face models not loaded, cannot process imported image.")
-                # Attempt to load models if not already loaded
-                assets_dir = os.path.join(os.path.dirname(__file__),'..', 'assets')
-                detection_model_path = os.path.join(assets_dir, 'face_detection_yunet_2023mar.onnx')
-                recognition_model_path = os.path.join(assets_dir, 'face_recognition_sface_2021dec.onnx')
-                if not self.load_models(detection_model_path, recognition_model_path):
-                    return False, None
-            
-            # 1. Use the shared method to detect the best face
-            face_info, confidence = self.detect_best_face(img)
-            
-            # Check if a face was detected and meets confidence threshold
-            # Use a slightly lower threshold for import to be more permissive
-            min_import_confidence = 0.85
-            if face_info is None or confidence < min_import_confidence:
-                if face_info is None:
-                    logger.warning(f"No face detected in image for {person_name}")
-                else:
-                    logger.warning(f"Face confidence too low for import ({person_name}): {confidence:.2f} < {min_import_confidence}")
+            if not self.ensure_models_loaded():
                 return False, None
-                
-            # 2. Use the shared method to extract face features 
-            face_feature = self.extract_face_feature(img, face_info)
-            if face_feature is None:
-                logger.error(f"Failed to extract face features for {person_name}")
+            
+            face, error = self.extract_import_face(img)
+            if face is None:
+                logger.warning(f"Import failed for {person_name}: {error}")
                 return False, None
-
-            # 3. Generate a thumbnail from the face for display
-            thumbnail_img = self._create_thumbnail_from_face(img, face_info)
-                
-            # 4. Update the person in memory
-            existing_person = self.memory.get_person(person_name)
-            if existing_person:
-                # Update existing person
-                self.memory.update_person(
-                    person_name,
-                    feature_vector=face_feature,
-                    box=[0, 0, 100, 100],  # Default box
-                    confidence=confidence,
-                    increment_count=True
-                )
-                # Add thumbnail
-                if thumbnail_img is not None:
-                    existing_person.add_thumbnail(thumbnail_img)
-                logger.info(f"Updated existing person: {person_name}")
-            else:
-                # Create new person
-                person = self.memory.add_person(
-                    person_name,
-                    feature_vector=face_feature,
-                    is_named=True
-                )
-                
-                # Add thumbnail to the new person
-                if thumbnail_img is not None and person:
-                    person.add_thumbnail(thumbnail_img)
-                
-                # Update detection info
-                self.memory.update_person(
-                    person_name,
-                    box=[0, 0, 100, 100],  # Default box
-                    confidence=confidence,
-                    increment_count=False  # Already initialized to 1
-                )
-                logger.info(f"Added new person: {person_name}")
-                
-            # 4. Check for similar unnamed faces and merge them
-            for person_id, person in self.memory.get_all_people().items():
-                if person.is_named or person_id == person_name:
-                    continue  # Skip named people and the face we just added
-                
-                if person.feature_vector is None:
-                    continue
-                    
-                is_similar = self.comparison_service.are_features_similar(
-                    face_feature, 
-                    person.feature_vector,
-                    FR.COSINE_THRESHOLD, 
-                    FR.NORM_L2_THRESHOLD
-                )
-                
-                if is_similar:
-                    logger.info(f"Import: Merging similar unnamed face {person_id} into {person_name}")
-                    self.memory.merge_people(person_id, person_name)
             
-            # Request save after import
-            self.memory.request_save()
-                    
+            self.enroll_person(person_name, [face])
             return True, person_name
             
         except Exception as e:
@@ -0,0 +1,193 @@
+import collections
+import logging
+import multiprocessing
+import numpy as np
+from multiprocessing import shared_memory
+from constants import FrameRing
+
+logger = logging.getLogger(__name__)
+
+# A frame in the ring: its slot and the sequence number it was written with.
+# Refs are small and picklable, so they are what crosses thread and process boundaries
+FrameRef = collections.namedtuple('FrameRef', ['slot', 'seq'])
+
+class FrameOverwrittenError(Exception):
+    """The slot of a FrameRef now holds a newer frame."""
+
+# Columns of the per-slot header
+_SEQ, _HEIGHT, _WIDTH, _CHANNELS, _REFS = range(5)
+_HEADER_COLUMNS = 5
+# Slot reference count while the writer copies a frame in
+_WRITING = -1
+# Ring-wide counters kept after the slot headers
+_NEXT_SEQ, _WRITES, _DROPPED = range(3)
+_COUNTERS = 3
+
+class SharedFrameRing:
+    """Fixed ring of frame slots in shared memory, for handing frames over without copies.
+
+    Writers copy a decoded frame into a free slot once and pass on a
+    FrameRef; readers in other threads or processes map the slot as a
+    NumPy array instead of receiving a pickled copy of the pixels.
+
+    Each slot has a reference count. A slot is only reused once nobody
+    holds a reference, oldest frame first, so a frame cannot change while
+    it is read. When every slot is referenced, write drops the frame
+    rather than wait, as capture must never block on recognition. Sequence
+    numbers tell a stale FrameRef from the frame now in its slot.
+
+    One process creates the ring; others attach to it by the descriptor
+    passed to them when they start (e.g. as initargs of a process pool).
+    """
+
+    def __init__(self, shm, slots, slot_bytes, lock, owner):
+        self._shm = shm
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self._lock = lock
+        self._owner = owner
+        header_bytes = (slots * _HEADER_COLUMNS + _COUNTERS) * 8
+        self._header = np.ndarray((slots, _HEADER_COLUMNS), dtype=np.int64, buffer=shm.buf)
+        self._counters = np.ndarray((_COUNTERS,), dtype=np.int64, buffer=shm.buf,
+                                    offset=slots * _HEADER_COLUMNS * 8)
+        self._data = np.ndarray((slots, slot_bytes), dtype=np.uint8, buffer=shm.buf, offset=header_bytes)
+
+    @classmethod
+    def create(cls, slots, max_width=FrameRing.MAX_WIDTH, max_height=FrameRing.MAX_HEIGHT, channels=3,
+               context=None):
+        """Allocate a ring in a new shared memory block.
+
+        Args:
+            slots (int): Number of frames the ring holds
+            max_width (int): Widest frame that fits in a slot
+            max_height (int): Tallest frame that fits in a slot
+            channels (int): Channels per pixel
+            context (multiprocessing.context.BaseContext, optional): Context of the
+                processes that will attach, which the lock must match
+
+        Returns:
+            SharedFrameRing: The ring, owning the shared memory block
+        """
+        slot_bytes = max_width * max_height * channels
+        size = (slots * _HEADER_COLUMNS + _COUNTERS) * 8 + slots * slot_bytes
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        ring = cls(shm, slots, slot_bytes, (context or multiprocessing).Lock(), owner=True)
+        ring._header[:] = 0
+        ring._counters[:] = 0
+        ring._counters[_NEXT_SEQ] = 1
+        logger.info(f"Created shared frame ring {shm.name}: {slots} slots of {slot_bytes / 1e6:.1f} MB")
+        return ring
+
+    def descriptor(self):
+        """Get what another process needs to attach; pass it when the process starts."""
+        return {'name': self._shm.name, 'slots': self.slots, 'slot_bytes': self.slot_bytes, 'lock': self._lock}
+
+    @classmethod
+    def attach(cls, descriptor):
+        """Attach to a ring created by another process.
+
+        Args:
+            descriptor (dict): Result of descriptor() in the creating process
+        """
+        shm = shared_memory.SharedMemory(name=descriptor['name'])
+        return cls(shm, descriptor['slots'], descriptor['slot_bytes'], descriptor['lock'], owner=False)
+
+    def write(self, frame, refs=1):
+        """Copy a frame into the oldest free slot.
+
+        Args:
+            frame (numpy.ndarray): uint8 image of shape (height, width) or (height, width, channels)
+            refs (int): References the writer takes on the new frame; each is
+                given up with release
+
+        Returns:
+            FrameRef: The written frame, or None if every slot is referenced
+            and the frame was dropped
+
+        Raises:
+            ValueError: If the frame does not fit in a slot
+        """
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        if frame.nbytes > self.slot_bytes:
+            raise ValueError(f"Frame of {frame.nbytes} bytes does not fit in slots of {self.slot_bytes} bytes")
+
+        with self._lock:
+            free = np.flatnonzero(self._header[:, _REFS] == 0)
+            if free.size == 0:
+                self._counters[_DROPPED] += 1
+                return None
+            slot = int(free[np.argmin(self._header[free, _SEQ])])
+            # Invalidate the old frame before its pixels change
+            self._header[slot, _SEQ] = 0
+            self._header[slot, _REFS] = _WRITING
+
+        # Copy outside the lock, so readers of other slots are not held up
+        self._data[slot, :frame.nbytes] = frame.reshape(-1)
+
+        height, width = frame.shape[:2]
+        with self._lock:
+            seq = int(self._counters[_NEXT_SEQ])
+            self._counters[_NEXT_SEQ] += 1
+            self._counters[_WRITES] += 1
+            self._header[slot] = (seq, height, width, frame.shape[2] if frame.ndim == 3 else 1, refs)
+        return FrameRef(slot, seq)
+
+    def acquire(self, ref):
+        """Take a reference on a frame, keeping its slot from being reused.
+
+        Returns:
+            bool: False if the frame was already overwritten
+        """
+        with self._lock:
+            if self._header[ref.slot, _SEQ] != ref.seq or self._header[ref.slot, _REFS] < 0:
+                return False
+            self._header[ref.slot, _REFS] += 1
+            return True
+
+    def release(self, ref):
+        """Give up a reference taken by write or acquire."""
+        with self._lock:
+            if self._header[ref.slot, _SEQ] == ref.seq and self._header[ref.slot, _REFS] > 0:
+                self._header[ref.slot, _REFS] -= 1
+
+    def read(self, ref):
+        """Map a frame as an array backed by shared memory, without copying it.
+
+        The caller must hold a reference on the frame for as long as it uses
+        the array, and must not write to it.
+
+        Raises:
+            FrameOverwrittenError: If the slot holds a newer frame
+        """
+        with self._lock:
+            seq, height, width, channels, refs = (int(value) for value in self._header[ref.slot])
+        if seq != ref.seq or refs < 0:
+            raise FrameOverwrittenError(f"Slot {ref.slot} no longer holds frame {ref.seq}")
+        shape = (height, width, channels) if channels > 1 else (height, width)
+        view = self._data[ref.slot, :height * width * channels].reshape(shape)
+        view.flags.writeable = False
+        return view
+
+    def get_status(self):
+        """Get the slot count, slots in use and frames written and dropped."""
+        with self._lock:
+            return {
+                'slots': self.slots,
+                'slot_mb': round(self.slot_bytes / 1e6, 1),
+                'in_use': int(np.count_nonzero(self._header[:, _REFS] != 0)),
+                'writes': int(self._counters[_WRITES]),
+                'dropped': int(self._counters[_DROPPED])
+            }
+
+    def close(self):
+        """Detach from the shared memory; the creating process also frees it.
+
+        Arrays returned by read must no longer be in use.
+        """
+        self._header = self._counters = self._data = None
+        try:
+            self._shm.close()
+        except BufferError:
+            logger.warning(f"Frames of ring {self._shm.name} are still referenced; leaving it mapped")
+        if self._owner:
+            self._shm.unlink()
@@ -0,0 +1,352 @@
+import numpy as np
+import logging
+from constants import CandidateFilter
+from face_comparison_service import FaceComparisonService
+
+logger = logging.getLogger(__name__)
+
+class GalleryProjection:
+    """Linear projection of embeddings to a few dimensions for candidate filtering.
+    
+    Fitted as the top principal directions of the stored embeddings without
+    centering them, so dot products between projected vectors approximate
+    cosine similarities between the original normalized ones.
+    """
+    
+    __slots__ = ('components', 'fitted_rows')
+    
+    def __init__(self, components, fitted_rows):
+        """Initialize a projection.
+        
+        Args:
+            components (numpy.ndarray): float32 array of shape (dim, dimensions)
+            fitted_rows (int): Number of gallery rows when it was fitted
+        """
+        self.components = components
+        self.fitted_rows = fitted_rows
+    
+    @classmethod
+    def fit(cls, matrix, dimensions=CandidateFilter.DIMENSIONS, max_samples=CandidateFilter.MAX_FIT_SAMPLES):
+        """Fit a projection to normalized embeddings, one per row.
+        
+        Returns:
+            GalleryProjection: The fitted projection, or None if there are too few rows
+        """
+        if matrix.shape[0] < dimensions or matrix.shape[1] <= dimensions:
+            return None
+        
+        sample = matrix
+        if matrix.shape[0] > max_samples:
+            rows = np.random.default_rng(0).choice(matrix.shape[0], max_samples, replace=False)
+            sample = matrix[rows]
+        
+        _, _, vt = np.linalg.svd(sample, full_matrices=False)
+        return cls(np.ascontiguousarray(vt[:dimensions].T, dtype=np.float32), matrix.shape[0])
+    
+    def project(self, vectors):
+        """Project embeddings (a vector or rows of a matrix) to the low-dimensional space."""
+        return vectors @ self.components
+
+class GalleryPartition:
+    """Immutable embedding matrix for a subset of the people in FaceMemory.
+
+    FaceMemory keeps one partition for named people and one for unnamed
+    people, so each query only scores the people it can actually match.
+    Rows are L2-normalized so cosine similarity is a single matrix-vector
+    product; the L2 distance between normalized vectors follows from it,
+    which matches what OpenCV's FaceRecognizerSF.match computes.
+
+    Each person owns a block of `width` rows holding their exemplar
+    embeddings, and scores per person are the maximum over their block.
+    People with fewer exemplars have their block padded by repeating their
+    own rows, which leaves the maximum unchanged and keeps the layout fixed,
+    so an update only overwrites one block.
+
+    Partitions with at least CandidateFilter.MIN_GALLERY_ROWS rows also keep
+    a projected copy of the matrix when given a GalleryProjection, which
+    best_match uses to pick candidates before scoring them exactly.
+    """
+
+    __slots__ = ('ids', 'index', 'matrix', 'width', 'projection', 'projected')
+
+    def __init__(self, ids, matrix, width=1, projection=None, projected=None):
+        """Initialize a partition.
+
+        Args:
+            ids (tuple): Person IDs, in the order of their row blocks
+            matrix (numpy.ndarray): float32 array of shape (len(ids) * width, dim) with normalized rows
+            width (int): Rows per person
+            projection (GalleryProjection, optional): Projection used for candidate filtering
+            projected (numpy.ndarray, optional): `matrix` already projected with `projection`
+        """
+        self.ids = ids
+        self.index = {person_id: position for position, person_id in enumerate(ids)}
+        self.matrix = matrix
+        self.width = width
+
+        # Only large partitions with a compatible projection filter candidates
+        if (projection is None or matrix.shape[0] < CandidateFilter.MIN_GALLERY_ROWS
+                or projection.components.shape[0] != matrix.shape[1]):
+            projection = None
+            projected = None
+        elif projected is None:
+            projected = projection.project(matrix)
+        self.projection = projection
+        self.projected = projected
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rows_of(self, person_id):
+        """Get the exemplar rows of a person in the partition (including padding)."""
+        start = self.index[person_id] * self.width
+        return self.matrix[start:start + self.width]
+
+    @staticmethod
+    def _pad(block, width):
+        """Repeat a block's rows until it has `width` rows."""
+        if len(block) == width:
+            return block
+        return block[np.arange(width) % len(block)]
+
+    @staticmethod
+    def normalize(feature):
+        """Flatten a feature vector to float32 and scale it to unit length.
+
+        Returns:
+            numpy.ndarray: Normalized 1-D vector, or None if the feature is empty or zero
+        """
+        if feature is None:
+            return None
+        vector = np.asarray(feature, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        if vector.size == 0 or norm == 0:
+            return None
+        return vector / norm
+
+    @staticmethod
+    def cosine_cutoff(cosine_threshold, norm_l2_threshold):
+        """Combine the cosine and L2 thresholds into one cosine threshold.
+        
+        For unit vectors L2 distance is sqrt(2 - 2 * cosine), so passing either
+        threshold is the same as passing the lower of the two cosine values.
+        """
+        return min(cosine_threshold, 1.0 - (norm_l2_threshold ** 2) / 2.0)
+
+    @classmethod
+    def empty(cls):
+        """Create a partition with no people."""
+        return cls((), np.zeros((0, 0), dtype=np.float32))
+
+    @classmethod
+    def build(cls, people, projection=None):
+        """Build a partition from Person objects, skipping those without features.
+
+        Args:
+            people (iterable): Person objects to include
+            projection (GalleryProjection, optional): Projection for candidate filtering
+        """
+        ids = []
+        blocks = []
+        for person in people:
+            block = person.get_exemplars()
+            if block is None:
+                continue
+            ids.append(person.id)
+            blocks.append(block)
+
+        if not blocks:
+            return cls.empty()
+        width = max(len(block) for block in blocks)
+        return cls(tuple(ids), np.vstack([cls._pad(block, width) for block in blocks]), width, projection)
+
+    def with_updated_rows(self, people, changed_ids, projection=None):
+        """Create a copy of this partition with the rows of changed people refreshed.
+
+        Args:
+            people (Mapping): ID to Person mapping the rows are read from
+            changed_ids (iterable): IDs whose feature vectors may have changed
+            projection (GalleryProjection, optional): Projection for candidate filtering;
+                the projected copy is recomputed if it differs from the current one
+
+        Returns:
+            GalleryPartition: The updated partition, or None if membership would
+            change (e.g. a member lost its feature) or a person now has more
+            exemplars than the block width, and a full rebuild is needed
+        """
+        matrix = None
+        projected = None
+        keep_projection = projection is self.projection and self.projected is not None
+        for person_id in changed_ids:
+            position = self.index.get(person_id)
+            if position is None:
+                continue
+            person = people.get(person_id)
+            block = person.get_exemplars() if person else None
+            if block is None or block.shape[1] != self.matrix.shape[1] or len(block) > self.width:
+                return None
+            if matrix is None:
+                matrix = self.matrix.copy()
+                projected = self.projected.copy() if keep_projection else None
+            start = position * self.width
+            matrix[start:start + self.width] = self._pad(block, self.width)
+            if projected is not None:
+                projected[start:start + self.width] = projection.project(matrix[start:start + self.width])
+
+        if matrix is None:
+            if projection is self.projection:
+                return self
+            matrix = self.matrix
+        return GalleryPartition(self.ids, matrix, self.width, projection, projected)
+
+    def scores(self, query):
+        """Score a query feature against every person in the partition.
+
+        Args:
+            query (numpy.ndarray): Query feature vector
+
+        Returns:
+            tuple: (cosine similarities, L2 distances) as 1-D arrays with one
+            entry per person, taken from their best-matching exemplar, or
+            (None, None) if the partition is empty or the query is invalid
+        """
+        vector = self.normalize(query)
+        if not self.ids or vector is None or vector.shape[0] != self.matrix.shape[1]:
+            return None, None
+        cosine, norm_l2 = self.scores_batch(vector)
+        return cosine[0], norm_l2[0]
+
+    def scores_batch(self, queries):
+        """Score several query features against every person in the partition at once.
+
+        Args:
+            queries (numpy.ndarray): Query feature vectors stacked as rows
+
+        Returns:
+            tuple: (cosine similarities, L2 distances) as arrays of shape
+            (queries, people), or (None, None) if the partition is empty or
+            the queries have the wrong dimension
+        """
+        service = FaceComparisonService.get_instance()
+        queries = service.normalize_rows(queries)
+        if not self.ids or queries.shape[1] != self.matrix.shape[1]:
+            return None, None
+
+        cosine, norm_l2 = service.score_batch(queries, self.matrix, normalized=True)
+        if self.width > 1:
+            cosine = cosine.reshape(cosine.shape[0], -1, self.width).max(axis=2)
+            norm_l2 = norm_l2.reshape(norm_l2.shape[0], -1, self.width).min(axis=2)
+        return cosine, norm_l2
+
+    def candidate_scores(self, query, top_k=CandidateFilter.TOP_K):
+        """Score a query against the people most likely to match it.
+
+        Scores every row in the projected space, then re-scores the people
+        owning the `top_k` best rows with full-dimensional cosine similarity.
+        Partitions without a projected copy score everyone exactly.
+
+        Returns:
+            tuple: (person positions, cosine similarities, L2 distances) as
+            1-D arrays, or (None, None, None) if the partition is empty or the
+            query is invalid
+        """
+        if self.projected is None:
+            cosine, norm_l2 = self.scores(query)
+            if cosine is None:
+                return None, None, None
+            return np.arange(len(self.ids)), cosine, norm_l2
+
+        vector = self.normalize(query)
+        if vector is None or vector.shape[0] != self.matrix.shape[1]:
+            return None, None, None
+
+        approximate = self.projected @ self.projection.project(vector)
+        count = min(top_k * self.width, approximate.shape[0])
+        top_rows = np.argpartition(-approximate, count - 1)[:count]
+        positions = np.unique(top_rows // self.width)
+
+        rows = (positions[:, None] * self.width + np.arange(self.width)).reshape(-1)
+        cosine, norm_l2 = FaceComparisonService.get_instance().score_batch(vector, self.matrix[rows], normalized=True)
+        cosine = cosine[0].reshape(-1, self.width).max(axis=1)
+        norm_l2 = norm_l2[0].reshape(-1, self.width).min(axis=1)
+        return positions, cosine, norm_l2
+
+    def best_match(self, query, cosine_threshold, norm_l2_threshold, top_k=CandidateFilter.TOP_K):
+        """Find the most similar person that passes either threshold.
+
+        Args:
+            top_k (int): People re-ranked exactly when candidates are filtered
+
+        Returns:
+            tuple: (person_id, cosine_score, norm_l2_score), or (None, 0.0, inf)
+        """
+        if self.projected is None:
+            # Exemplar blocks are padded with their own rows, so the best row
+            # belongs to the best person; the service scores in bounded chunks
+            vector = self.normalize(query)
+            if not self.ids or vector is None or vector.shape[0] != self.matrix.shape[1]:
+                return None, 0.0, float('inf')
+            matches = FaceComparisonService.get_instance().best_matches(
+                vector, self.matrix, 1, cosine_threshold, norm_l2_threshold, normalized=True)[0]
+            if not matches:
+                return None, 0.0, float('inf')
+            row, cosine, norm_l2 = matches[0]
+            return self.ids[row // self.width], cosine, norm_l2
+
+        positions, cosine, norm_l2 = self.candidate_scores(query, top_k)
+        if cosine is None:
+            return None, 0.0, float('inf')
+
+        similar = (cosine >= cosine_threshold) | (norm_l2 <= norm_l2_threshold)
+        if not similar.any():
+            return None, 0.0, float('inf')
+
+        best = int(np.argmax(np.where(similar, cosine, -np.inf)))
+        return self.ids[positions[best]], float(cosine[best]), float(norm_l2[best])
+
+    def similar(self, query, cosine_threshold, norm_l2_threshold, exclude=None):
+        """Find every person that passes either threshold.
+
+        Args:
+            exclude (str, optional): Person ID to leave out of the results
+
+        Returns:
+            list: (person_id, cosine_score) tuples, most similar first
+        """
+        cosine, norm_l2 = self.scores(query)
+        if cosine is None:
+            return []
+
+        similar = (cosine >= cosine_threshold) | (norm_l2 <= norm_l2_threshold)
+        rows = np.flatnonzero(similar)
+        rows = rows[np.argsort(-cosine[rows], kind='stable')]
+        return [(self.ids[row], float(cosine[row])) for row in rows if self.ids[row] != exclude]
+
+    def similar_pairs(self, cosine_threshold, norm_l2_threshold, block_size=1024):
+        """Find pairs of people with any exemplars passing either threshold, one block at a time.
+
+        Only the upper triangle of the row similarity matrix is computed, and
+        at most `block_size` x rows scores are held in memory at once. A pair
+        may be yielded more than once if several of their exemplars match.
+
+        Yields:
+            tuple: (positions_a, positions_b) arrays of person positions, never equal
+        """
+        if len(self.ids) < 2:
+            return
+
+        threshold = self.cosine_cutoff(cosine_threshold, norm_l2_threshold)
+
+        count = self.matrix.shape[0]
+        for start in range(0, count - 1, block_size):
+            end = min(start + block_size, count)
+            block = self.matrix[start:end] @ self.matrix[start:].T
+            rows, cols = np.nonzero(block >= threshold)
+            rows = rows + start
+            cols = cols + start
+            upper = rows < cols
+            people_a = rows[upper] // self.width
+            people_b = cols[upper] // self.width
+            different = people_a != people_b
+            if different.any():
+                yield people_a[different], people_b[different]
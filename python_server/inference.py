@@ -0,0 +1,154 @@
+import logging
+import statistics
+import time
+import cv2
+import numpy as np
+from constants import Inference
+
+logger = logging.getLogger(__name__)
+
+# Names of the OpenCV DNN backends and targets, for those this OpenCV build knows
+BACKENDS = {name: getattr(cv2.dnn, constant) for name, constant in (
+    ('default', 'DNN_BACKEND_DEFAULT'),
+    ('opencv', 'DNN_BACKEND_OPENCV'),
+    ('openvino', 'DNN_BACKEND_INFERENCE_ENGINE'),
+    ('cuda', 'DNN_BACKEND_CUDA'),
+    ('vulkan', 'DNN_BACKEND_VKCOM'),
+    ('timvx', 'DNN_BACKEND_TIMVX'),
+    ('cann', 'DNN_BACKEND_CANN'),
+) if hasattr(cv2.dnn, constant)}
+
+TARGETS = {name: getattr(cv2.dnn, constant) for name, constant in (
+    ('cpu', 'DNN_TARGET_CPU'),
+    ('cpu_fp16', 'DNN_TARGET_CPU_FP16'),
+    ('opencl', 'DNN_TARGET_OPENCL'),
+    ('opencl_fp16', 'DNN_TARGET_OPENCL_FP16'),
+    ('cuda', 'DNN_TARGET_CUDA'),
+    ('cuda_fp16', 'DNN_TARGET_CUDA_FP16'),
+    ('vulkan', 'DNN_TARGET_VULKAN'),
+    ('npu', 'DNN_TARGET_NPU'),
+) if hasattr(cv2.dnn, constant)}
+
+# Size of the aligned face crops SFace embeds
+RECOGNITION_INPUT_SIZE = (112, 112)
+
+def resolve(backend, target):
+    """Map backend and target names to cv2.dnn constants.
+
+    Args:
+        backend (str): Name from BACKENDS
+        target (str): Name from TARGETS
+
+    Returns:
+        tuple: (backend_id, target_id)
+
+    Raises:
+        ValueError: If a name is unknown to this OpenCV build
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown DNN backend '{backend}', expected one of {', '.join(BACKENDS)}")
+    if target not in TARGETS:
+        raise ValueError(f"Unknown DNN target '{target}', expected one of {', '.join(TARGETS)}")
+    return BACKENDS[backend], TARGETS[target]
+
+def cpu_backends():
+    """Names of the backends that can run on the CPU in this OpenCV build.
+
+    'default' is left out, as it stands for one of the others.
+    """
+    available = []
+    for name, backend_id in BACKENDS.items():
+        if name == 'default':
+            continue
+        try:
+            if cv2.dnn.DNN_TARGET_CPU in cv2.dnn.getAvailableTargets(backend_id):
+                available.append(name)
+        except cv2.error:
+            continue
+    return available
+
+def set_num_threads(num_threads):
+    """Set the threads OpenCV uses within one operation; None keeps the current setting.
+
+    Depending on the parallel framework OpenCV was built with, the setting
+    may only apply to the calling thread, so threads running inference set it too.
+    """
+    if num_threads is None:
+        return
+    cv2.setNumThreads(int(num_threads))
+    logger.debug(f"OpenCV uses {cv2.getNumThreads()} threads")
+
+def _run_detection(detection_model, size):
+    detection_model.setInputSize(size)
+    detection_model.detect(np.zeros((size[1], size[0], 3), dtype=np.uint8))
+
+def _run_recognition(recognition_model):
+    recognition_model.feature(np.zeros((RECOGNITION_INPUT_SIZE[1], RECOGNITION_INPUT_SIZE[0], 3), dtype=np.uint8))
+
+def _run_models(detection_model, recognition_model, size):
+    _run_detection(detection_model, size)
+    _run_recognition(recognition_model)
+
+def warm_up(detection_model, recognition_model, sizes=Inference.WARMUP_SIZES):
+    """Run dummy inferences, allocating the networks ahead of real frames.
+
+    The detector runs once per input size, the recognizer once.
+
+    Args:
+        detection_model (cv2.FaceDetectorYN, optional): Detector to warm up
+        recognition_model (cv2.FaceRecognizerSF, optional): Recognizer to warm up
+        sizes (tuple): Detector input sizes as (width, height)
+
+    Returns:
+        float: Seconds the warm-up took
+    """
+    start = time.perf_counter()
+    if detection_model is not None:
+        for size in sizes:
+            _run_detection(detection_model, size)
+    if recognition_model is not None:
+        _run_recognition(recognition_model)
+    return time.perf_counter() - start
+
+def autotune(create_models, sizes=Inference.WARMUP_SIZES, runs=Inference.AUTOTUNE_RUNS):
+    """Time every backend available for the CPU and pick the fastest.
+
+    Each backend gets its own models, warmed up first, then timed on
+    detection at the largest warm-up size plus one embedding.
+
+    Args:
+        create_models (callable): Takes (backend_id, target_id) and returns
+            (detection_model, recognition_model)
+        sizes (tuple): Detector input sizes as (width, height)
+        runs (int): Timed inferences per backend
+
+    Returns:
+        tuple: (name of the fastest backend, dict mapping each backend name
+        to its median milliseconds per inference, or None if it failed)
+    """
+    candidates = cpu_backends()
+    if len(candidates) <= 1:
+        # Nothing to choose from, so skip the benchmark
+        return (candidates[0] if candidates else 'default'), {}
+
+    size = max(sizes, key=lambda s: s[0] * s[1])
+    timings = {}
+    for name in candidates:
+        try:
+            detection_model, recognition_model = create_models(*resolve(name, 'cpu'))
+            warm_up(detection_model, recognition_model, sizes)
+            durations = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                _run_models(detection_model, recognition_model, size)
+                durations.append(time.perf_counter() - start)
+            timings[name] = round(statistics.median(durations) * 1000, 2)
+        except Exception as e:
+            logger.warning(f"DNN backend {name} failed during auto-tuning: {e}")
+            timings[name] = None
+
+    measured = {name: ms for name, ms in timings.items() if ms is not None}
+    best = min(measured, key=measured.get) if measured else 'default'
+    logger.info(f"Auto-tuned DNN backend: {best} "
+                f"({', '.join(f'{name} {ms}ms' if ms is not None else f'{name} failed' for name, ms in timings.items())})")
+    return best, timings
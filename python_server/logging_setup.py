@@ -0,0 +1,126 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import time
+from constants import Logging
+
+_listener = None
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that leaves formatting to the listener thread.
+
+    The stock QueueHandler formats each record before queueing it. Here only
+    the message is merged with its arguments, which keeps the record safe to
+    hand over; timestamps, levels and tracebacks are formatted off the
+    calling thread.
+    """
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+def configure_logging(level=logging.INFO):
+    """Send log records through a queue to a background thread that writes them.
+
+    Threads that log - the event loop above all - only put records on a
+    queue, so a slow terminal or SD card never blocks them. Calling this
+    again only changes the level.
+
+    Args:
+        level (int): Level of the root logger
+
+    Returns:
+        logging.handlers.QueueListener: The listener writing the records
+    """
+    global _listener
+    root = logging.getLogger()
+    root.setLevel(level)
+    if _listener is not None:
+        return _listener
+
+    output = logging.StreamHandler()
+    output.setFormatter(logging.Formatter(Logging.FORMAT, Logging.DATE_FORMAT))
+    log_queue = queue.SimpleQueue()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_DeferredQueueHandler(log_queue))
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
+
+class _RouteStats:
+    """Requests to one route since its last access log line."""
+
+    __slots__ = ('requests', 'total_ms', 'max_ms', 'since', 'last_line', 'last_warning', 'suppressed')
+
+    def __init__(self, now):
+        self.requests = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.since = now
+        self.last_line = None
+        self.last_warning = None
+        self.suppressed = 0
+
+class AccessLog:
+    """Sampled, rate-limited access log of the HTTP server.
+
+    The dashboard polls several endpoints many times a second, so logging
+    every request would flood the log. Each route instead gets at most one
+    line per ACCESS_LOG_INTERVAL, summarizing the requests since the last
+    one; slow and failing requests are logged as warnings at most once per
+    ACCESS_LOG_WARNING_INTERVAL. Lines carry route, status and duration as
+    record attributes for structured handlers.
+    """
+
+    def __init__(self, interval=Logging.ACCESS_LOG_INTERVAL, slow_ms=Logging.SLOW_REQUEST_MS,
+                 warning_interval=Logging.ACCESS_LOG_WARNING_INTERVAL):
+        """Initialize the access log.
+
+        Args:
+            interval (float): Seconds between summary lines per route
+            slow_ms (float): Requests taking longer are logged as warnings
+            warning_interval (float): Seconds between warnings per route
+        """
+        self.interval = interval
+        self.slow_ms = slow_ms
+        self.warning_interval = warning_interval
+        self._logger = logging.getLogger('access')
+        self._routes = {}  # Maps route to _RouteStats
+
+    def record(self, request, route, status, duration_ms):
+        """Account for a finished request; only called from the event loop."""
+        if not self._logger.isEnabledFor(logging.WARNING):
+            return
+        now = time.monotonic()
+        stats = self._routes.get(route)
+        if stats is None:
+            stats = self._routes[route] = _RouteStats(now)
+        stats.requests += 1
+        stats.total_ms += duration_ms
+        stats.max_ms = max(stats.max_ms, duration_ms)
+
+        if status >= 500 or duration_ms >= self.slow_ms:
+            if stats.last_warning is None or now - stats.last_warning >= self.warning_interval:
+                self._logger.warning("%s %s %d in %.1fms from %s (%d similar suppressed)",
+                                     request.method, request.path, status, duration_ms, request.remote,
+                                     stats.suppressed,
+                                     extra={'route': route, 'status': status, 'duration_ms': duration_ms})
+                stats.last_warning = now
+                stats.suppressed = 0
+            else:
+                stats.suppressed += 1
+
+        # The first request of a route is logged right away
+        if stats.last_line is None or now - stats.last_line >= self.interval:
+            self._logger.info("%s %s %d in %.1fms from %s - %d requests in %.0fs, mean %.1fms, max %.1fms",
+                              request.method, route, status, duration_ms, request.remote, stats.requests,
+                              now - stats.since, stats.total_ms / stats.requests, stats.max_ms,
+                              extra={'route': route, 'status': status, 'duration_ms': duration_ms})
+            stats.requests = 0
+            stats.total_ms = stats.max_ms = 0.0
+            stats.since = stats.last_line = now
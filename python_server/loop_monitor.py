@@ -0,0 +1,76 @@
+import asyncio
+import collections
+import time
+import numpy as np
+from constants import EventLoopMonitor
+
+class LoopLagMonitor:
+    """Measures how late the event loop runs its callbacks.
+
+    A task sleeps for a fixed interval and records how much later than
+    requested it wakes up. Anything that blocks the loop - a slow handler,
+    inference or file I/O on the loop thread - shows up as lag, and every
+    request waiting on the loop is delayed by about the same amount.
+    """
+
+    def __init__(self, interval=EventLoopMonitor.INTERVAL, window=EventLoopMonitor.WINDOW):
+        """Initialize the monitor.
+
+        Args:
+            interval (float): Seconds between wake-ups
+            window (float): Seconds of recent samples kept for percentiles
+        """
+        self.interval = interval
+        self._samples = collections.deque(maxlen=max(1, int(window / interval)))
+        self._max_ms = 0.0
+        self._total = 0
+        self._task = None
+
+    def start(self):
+        """Start measuring on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop measuring."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (time.perf_counter() - start - self.interval) * 1000)
+            self._samples.append(lag_ms)
+            self._max_ms = max(self._max_ms, lag_ms)
+            self._total += 1
+
+    def get_status(self):
+        """Get lag statistics in milliseconds.
+
+        Returns:
+            dict: Percentiles over the recent window, the maximum since start
+            and the number of samples taken
+        """
+        status = {
+            'interval_ms': round(self.interval * 1000, 1),
+            'samples': self._total,
+            'max_ms': round(self._max_ms, 2)
+        }
+        if self._samples:
+            values = np.fromiter(self._samples, dtype=np.float64)
+            p50, p99 = np.percentile(values, [50, 99])
+            status.update({
+                'window_samples': int(values.size),
+                'last_ms': round(float(values[-1]), 2),
+                'mean_ms': round(float(values.mean()), 2),
+                'p50_ms': round(float(p50), 2),
+                'p99_ms': round(float(p99), 2),
+                'window_max_ms': round(float(values.max()), 2)
+            })
+        return status
@@ -1,6 +1,10 @@
 import asyncio
 import argparse
+import json
 import logging
+from constants import DetectionBatching, FrameRing, Inference
+from inference import BACKENDS, TARGETS
+from logging_setup import configure_logging
 from server import CameraProviderServer
 
 logger = logging.getLogger(__name__)
@@ -8,28 +12,76 @@ logger = logging.getLogger(__name__)
 async def main():
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Camera Provider Server for Raspberry Pi and other platforms')
-    parser.add_argument('--camera', choices=['auto', 'picamera', 'picamera2', 'opencv'], default='auto',
-                      help='Camera type to use (auto, picamera, picamera2, or opencv). Default is auto.')
+    parser.add_argument('--camera', choices=['auto', 'picamera', 'picamera2', 'opencv', 'file'], default='auto',
+                      help='Camera type to use (auto, picamera, picamera2, opencv, or file). Default is auto.')
     parser.add_argument('--debug', action='store_true',
                       help='Enable debug logging')
     parser.add_argument('--camera-index', type=int, default=0,
                       help='Camera index for OpenCV (default: 0)')
+    parser.add_argument('--source',
+                      help='Video file or image directory replayed by --camera file')
+    parser.add_argument('--pacing', choices=['realtime', 'fixed', 'fast'], default='realtime',
+                      help='Replay pacing for --camera file: the source frame rate, --fps, or as fast as possible (default: realtime)')
+    parser.add_argument('--fps', type=float,
+                      help='Frame rate for --pacing fixed and replay timestamps (default: the source frame rate)')
+    parser.add_argument('--no-loop', action='store_true',
+                      help='Stop at the end of the --source instead of starting over')
     parser.add_argument('--host', default='0.0.0.0',
                       help='Host IP to bind to (default: 0.0.0.0)')
     parser.add_argument('--port', type=int, default=12345,
                       help='Port to listen on (default: 12345)')
+    parser.add_argument('--cameras',
+                      help='JSON file listing cameras to run in one process, e.g. '
+                           '[{"id": "door", "type": "opencv", "index": 0}, {"id": "hall", "type": "picamera2"}]. '
+                           'Overrides --camera and --camera-index.')
+    parser.add_argument('--workers', type=int,
+                      help='Recognition worker threads shared by all cameras (default: one per camera, up to the CPU count)')
+    parser.add_argument('--batch-detection', action=argparse.BooleanOptionalAction, default=DetectionBatching.ENABLED,
+                      help='Detect faces of cameras whose frames arrive together with one detector call')
+    parser.add_argument('--worker-processes', type=int, default=FrameRing.PROCESSES,
+                      help='Processes that detect faces and compute embeddings in multi-camera mode, reading '
+                           f'frames from shared memory (default: {FrameRing.PROCESSES}, recognize on threads)')
+    parser.add_argument('--dnn-backend', choices=['auto'] + list(BACKENDS), default=Inference.BACKEND,
+                      help='OpenCV DNN backend of the face models; auto times the CPU backends at startup '
+                           f'and uses the fastest (default: {Inference.BACKEND})')
+    parser.add_argument('--dnn-target', choices=list(TARGETS), default=Inference.TARGET,
+                      help=f'OpenCV DNN target of the face models (default: {Inference.TARGET})')
+    parser.add_argument('--dnn-threads', type=int, default=Inference.NUM_THREADS,
+                      help="Threads OpenCV uses per inference (default: OpenCV's choice, one per core)")
+    parser.add_argument('--no-warmup', action='store_true',
+                      help='Skip the dummy inferences that prepare the models at startup')
+    parser.add_argument('--data-dir',
+                      help='Directory for face memory and settings (default: the data directory next to the server)')
     
     args = parser.parse_args()
+    if args.camera == 'file' and not args.source and not args.cameras:
+        parser.error('--camera file requires --source')
     
-    # Set logging level based on arguments
-    if args.debug:
-        logging.getLogger().setLevel(logging.DEBUG)
+    # Log through a background thread, at the level given by the arguments
+    configure_logging(logging.DEBUG if args.debug else logging.INFO)
     
-    logger.info(f"Starting camera provider with camera_type={args.camera}, camera_index={args.camera_index}")
+    cameras = None
+    if args.cameras:
+        with open(args.cameras, 'r') as f:
+            cameras = json.load(f)
+        logger.info(f"Starting camera provider with {len(cameras)} cameras: {', '.join(str(c['id']) for c in cameras)}")
+    else:
+        logger.info(f"Starting camera provider with camera_type={args.camera}, camera_index={args.camera_index}")
     logger.info(f"Server will bind to {args.host}:{args.port}")
     
+    camera_options = None
+    if args.camera == 'file':
+        camera_options = {'source': args.source, 'pacing': args.pacing, 'fps': args.fps, 'loop': not args.no_loop}
+    
+    inference_options = {'backend': args.dnn_backend, 'target': args.dnn_target,
+                         'num_threads': args.dnn_threads, 'warmup': Inference.WARMUP and not args.no_warmup}
+    
     # Create and start server with specified camera type
-    server = CameraProviderServer(camera_type=args.camera, camera_index=args.camera_index)
+    server = CameraProviderServer(camera_type=args.camera, camera_index=args.camera_index,
+                                  host=args.host, port=args.port, cameras=cameras, workers=args.workers,
+                                  camera_options=camera_options, storage_dir=args.data_dir,
+                                  inference_options=inference_options, batch_detection=args.batch_detection,
+                                  worker_processes=args.worker_processes)
     try:
         await server.start()
         # Keep the server running
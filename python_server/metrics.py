@@ -0,0 +1,232 @@
+import bisect
+import contextlib
+import logging
+import math
+import threading
+import time
+from constants import Metrics
+
+logger = logging.getLogger(__name__)
+
+class _Value:
+    """One labelled time series of a metric."""
+
+    def __init__(self, metric):
+        self._metric = metric
+        self._lock = threading.Lock()
+        self._value = 0.0
+        self._function = None
+        if metric.kind == 'histogram':
+            self._counts = [0] * (len(metric.buckets) + 1)
+
+    def inc(self, amount=1):
+        """Add to a counter or gauge."""
+        if amount < 0 and self._metric.kind == 'counter':
+            raise ValueError("Counters can only increase")
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        """Subtract from a gauge."""
+        self.inc(-amount)
+
+    def set(self, value):
+        """Set a gauge."""
+        with self._lock:
+            self._value = float(value)
+
+    def set_function(self, function):
+        """Read a gauge from a callable whenever metrics are collected."""
+        self._function = function
+
+    def observe(self, value):
+        """Record a value in a histogram."""
+        index = bisect.bisect_left(self._metric.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._value += value
+
+    @contextlib.contextmanager
+    def time(self):
+        """Observe the seconds spent in a with-block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def get(self):
+        """Get the current value, calling the gauge function if one is set."""
+        if self._function is not None:
+            return float(self._function())
+        with self._lock:
+            return self._value
+
+    def get_histogram(self):
+        """Get the cumulative bucket counts, sum and count of a histogram."""
+        with self._lock:
+            counts, total = list(self._counts), self._value
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total, running
+
+class Metric:
+    """A named metric with optional labels, in the Prometheus data model.
+
+    Metrics without labels are used directly (COUNTER.inc()); labelled ones
+    through labels (COUNTER.labels(stage='detect').inc()).
+    """
+
+    def __init__(self, kind, name, documentation, labelnames=(), buckets=None):
+        """Initialize a metric.
+
+        Args:
+            kind (str): 'counter', 'gauge' or 'histogram'
+            name (str): Metric name
+            documentation (str): Help text
+            labelnames (tuple): Names of the labels
+            buckets (tuple, optional): Upper bounds of histogram buckets
+        """
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) if buckets else ()
+        self._lock = threading.Lock()
+        self._values = {}  # Maps a tuple of label values to a _Value
+        if not self.labelnames:
+            # Unlabelled metrics are reported from the start, even before their first update
+            self.labels()
+
+    def labels(self, **labels):
+        """Get the time series for a set of label values."""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} needs labels {self.labelnames}, got {tuple(labels)}")
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        value = self._values.get(key)
+        if value is None:
+            with self._lock:
+                value = self._values.setdefault(key, _Value(self))
+        return value
+
+    def _unlabelled(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} needs labels {self.labelnames}")
+        return self.labels()
+
+    def inc(self, amount=1):
+        self._unlabelled().inc(amount)
+
+    def dec(self, amount=1):
+        self._unlabelled().dec(amount)
+
+    def set(self, value):
+        self._unlabelled().set(value)
+
+    def set_function(self, function):
+        self._unlabelled().set_function(function)
+
+    def observe(self, value):
+        self._unlabelled().observe(value)
+
+    def time(self):
+        return self._unlabelled().time()
+
+    def render(self):
+        """Format the metric in the Prometheus text exposition format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            labels = dict(zip(self.labelnames, key))
+            if self.kind == 'histogram':
+                cumulative, total, count = value.get_histogram()
+                for bound, bucket_count in zip(self.buckets + (math.inf,), cumulative):
+                    lines.append(f"{self.name}_bucket{_format_labels(labels, le=_format_value(bound))} {bucket_count}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+            else:
+                try:
+                    sample = value.get()
+                except Exception as e:
+                    logger.debug(f"Skipping {self.name}{key}: {e}")
+                    continue
+                lines.append(f"{self.name}{_format_labels(labels)} {_format_value(sample)}")
+        return "\n".join(lines)
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _format_labels(labels, **extra):
+    labels = dict(labels, **extra)
+    if not labels:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+class MetricsRegistry:
+    """Collection of metrics rendered together by the /metrics endpoint."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Metric('counter', name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Metric('gauge', name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=Metrics.STAGE_BUCKETS):
+        return self._register(Metric('histogram', name, documentation, labelnames, buckets))
+
+    def render(self):
+        """Format all metrics in the Prometheus text exposition format."""
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+# Pipeline stages: capture, decode, detect, align, embed, match, update, thumbnail, encode
+STAGE_SECONDS = REGISTRY.histogram(
+    'camera_server_stage_seconds', 'Time spent in each stage of frame processing', ['stage'])
+REQUEST_SECONDS = REGISTRY.histogram(
+    'camera_server_request_seconds', 'Time to handle HTTP requests, by route and status',
+    ['route', 'status'], buckets=Metrics.REQUEST_BUCKETS)
+
+FRAMES_TOTAL = REGISTRY.counter(
+    'camera_server_frames_detected_total', 'Frames the face detector ran on')
+FACES_DETECTED_TOTAL = REGISTRY.counter(
+    'camera_server_faces_detected_total', 'Faces found by the detector')
+FACES_RECOGNIZED_TOTAL = REGISTRY.counter(
+    'camera_server_faces_recognized_total', 'Faces embedded and matched against face memory')
+NEW_IDENTITIES_TOTAL = REGISTRY.counter(
+    'camera_server_new_identities_total', 'Faces that matched nobody and became new people')
+
+GALLERY_PEOPLE = REGISTRY.gauge(
+    'camera_server_gallery_people', 'People in face memory', ['kind'])
+GALLERY_ROWS = REGISTRY.gauge(
+    'camera_server_gallery_rows', 'Embedding rows scored when matching a face', ['kind'])
+QUEUE_DEPTH = REGISTRY.gauge(
+    'camera_server_queue_depth', 'Work waiting in background queues', ['queue'])
+SAVE_SECONDS = REGISTRY.histogram(
+    'camera_server_save_seconds', 'Time from starting a face memory save until it is on disk',
+    buckets=Metrics.SAVE_BUCKETS)
+LAST_SAVE_SECONDS = REGISTRY.gauge(
+    'camera_server_last_save_seconds', 'Duration of the last successful face memory save')
+EVENT_LOOP_LAG_SECONDS = REGISTRY.gauge(
+    'camera_server_event_loop_lag_seconds', 'Event loop lag over the recent window', ['quantile'])
+EVENT_LOOP_STALLS_TOTAL = REGISTRY.counter(
+    'camera_server_event_loop_stalls_total', 'Times the event loop was blocked longer than the stall threshold')
@@ -4,6 +4,7 @@ import numpy as np
 import logging
 import os
 import cv2
+from constants import FaceRecognition
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +26,7 @@ class Person:
         """
         self.id = id
         self.feature_vector = feature_vector
+        self.exemplars = None  # Normalized embeddings, one per row; see get_exemplars()
         self.is_named = is_named
         self.appearance_count = 0
         
@@ -39,6 +41,9 @@ class Person:
         # Recognition scoring
         self.last_match_score = 0.0
         
+        # FaceMemory revision at which this person was last modified (for delta sync)
+        self.last_modified_rev = 0
+        
         # Store thumbnails as file paths instead of base64 data
         self.thumbnails = []  # List of thumbnail file paths
         self.thumbnail_count = 0
@@ -60,23 +65,110 @@ class Person:
     def update_feature(self, feature_vector):
         """Update the person's feature vector.
         
+        The new feature is added to the person's exemplars instead of being
+        blended into a single average, so the identity does not drift toward
+        whatever was seen last.
+        
         Args:
-            feature_vector (numpy.ndarray): New feature vector
+            feature_vector (numpy.ndarray): New feature vector, or several stacked as rows
         """
         # If we don't have a feature vector yet, just set it
-        if self.feature_vector is None:
+        if self.feature_vector is None and np.atleast_2d(feature_vector).shape[0] == 1:
             self.feature_vector = feature_vector
             return
-            
-        # Otherwise, we could do a weighted average to slowly evolve the feature
-        # This helps the face adapt to different conditions over time
-        # The weight for the new feature can be adjusted (0.3 gives 30% weight to new)
-        weight = 0.3  
-        self.feature_vector = (1 - weight) * self.feature_vector + weight * feature_vector
         
-    def increment_count(self):
-        """Increment appearance count."""
-        self.appearance_count += 1
+        self.add_exemplars(feature_vector)
+    
+    def get_exemplars(self):
+        """Get the person's exemplar embeddings as a matrix.
+        
+        People without exemplars yet (e.g. loaded from older storage) have a
+        single exemplar taken from their feature vector.
+        
+        Returns:
+            numpy.ndarray: float32 array of shape (count, dim) with normalized
+            rows, or None if the person has no features
+        """
+        if self.exemplars is not None:
+            return self.exemplars
+        if self.feature_vector is None:
+            return None
+        return self._normalize_rows(self.feature_vector)
+    
+    def add_exemplars(self, vectors):
+        """Add embeddings to the exemplars, keeping a bounded, diverse set.
+        
+        Args:
+            vectors (numpy.ndarray): One embedding, or several stacked as rows
+        """
+        vectors = self._normalize_rows(vectors)
+        if vectors is None:
+            return
+        
+        current = self.get_exemplars()
+        if current is not None and current.shape[1] == vectors.shape[1]:
+            vectors = np.vstack([current, vectors])
+        
+        self.exemplars = self.select_exemplars(vectors, FaceRecognition.MAX_EXEMPLARS)
+        
+        # Keep the feature vector as the mean face for clients and for storage
+        mean = self.exemplars.mean(axis=0)
+        norm = np.linalg.norm(mean)
+        if norm > 0:
+            mean = mean / norm
+        self.feature_vector = mean.reshape(1, -1).astype(np.float32)
+    
+    @staticmethod
+    def select_exemplars(candidates, count):
+        """Pick a diverse subset of normalized embeddings by greedy k-center selection.
+        
+        Starts from the embedding closest to the mean, then repeatedly adds the
+        candidate least similar to everything picked so far, so near-duplicate
+        views are dropped and distinct poses and lighting are kept.
+        
+        Args:
+            candidates (numpy.ndarray): Normalized embeddings, one per row
+            count (int): Maximum number of exemplars to keep
+        """
+        if len(candidates) <= count:
+            return candidates
+        
+        similarity = candidates @ candidates.T
+        selected = [int(np.argmax(similarity.mean(axis=1)))]
+        closest = similarity[selected[0]].copy()  # Similarity to the nearest selected exemplar
+        while len(selected) < count:
+            closest[selected] = np.inf
+            row = int(np.argmin(closest))
+            selected.append(row)
+            closest = np.maximum(closest, similarity[row])
+        return candidates[selected]
+    
+    @staticmethod
+    def _normalize_rows(vectors):
+        """Convert embeddings to a float32 matrix with unit-length rows.
+        
+        Returns:
+            numpy.ndarray: Normalized rows (zero rows dropped), or None if none are left
+        """
+        if vectors is None:
+            return None
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if vectors.size == 0:
+            return None
+        vectors = vectors.reshape(vectors.shape[0], -1)
+        norms = np.linalg.norm(vectors, axis=1)
+        valid = norms > 0
+        if not valid.any():
+            return None
+        return vectors[valid] / norms[valid, None]
+        
+    def increment_count(self, amount=1):
+        """Increment appearance count.
+        
+        Args:
+            amount (int): Number of appearances to add
+        """
+        self.appearance_count += amount
         
     def update_last_seen(self, timestamp=None):
         """Update last seen timestamp.
@@ -226,11 +318,13 @@ class Person:
             'first_seen': first_seen_str,
             'last_seen': last_seen_str,
             'feature': feature_list,
+            'exemplars': self.exemplars.tolist() if self.exemplars is not None else None,
             'last_box': self.last_box,
             'last_confidence': float(self.last_confidence) if self.last_confidence is not None else None,
             'last_match_score': float(self.last_match_score) if self.last_match_score is not None else None,
             'thumbnails': self.thumbnails,  # Now stores filenames, not base64 data
-            'thumbnail_count': self.thumbnail_count
+            'thumbnail_count': self.thumbnail_count,
+            'last_modified_rev': int(self.last_modified_rev)
         }
         
     def from_dict(self, data):
@@ -243,6 +337,8 @@ class Person:
             # Ensure feature vector is a float32 ndarray (same as what the model produces)
             # This is critical to prevent type mismatches during feature comparison
             self.feature_vector = np.array(data['feature'], dtype=np.float32)
+        if data.get('exemplars'):
+            self.exemplars = self._normalize_rows(data['exemplars'])
         if 'is_named' in data:
             self.is_named = data['is_named']
         if 'count' in data:
@@ -257,6 +353,8 @@ class Person:
             self.last_confidence = data['last_confidence']
         if 'last_match_score' in data:
             self.last_match_score = data['last_match_score']
+        if 'last_modified_rev' in data:
+            self.last_modified_rev = int(data['last_modified_rev'] or 0)
         
         # Load thumbnail filenames
         if 'thumbnails' in data and isinstance(data['thumbnails'], list):
@@ -0,0 +1,193 @@
+import asyncio
+import collections
+import datetime
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from constants import Profiler
+from metrics import EVENT_LOOP_STALLS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+# Innermost frames of threads that are waiting rather than working
+IDLE_FUNCTIONS = {
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('selectors.py', 'select'),
+    ('queue.py', 'get'),
+    ('thread.py', '_worker'),
+    ('connection.py', '_poll'),
+    ('connection.py', '_recv'),
+}
+
+def _frame_name(frame):
+    """Name a stack frame by function, file and first line, so samples anywhere in a function add up."""
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _is_idle(frame):
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_FUNCTIONS
+
+class StackSampler:
+    """Statistical profiler sampling the Python stacks of all threads.
+
+    Every interval the current frame of each thread is read with
+    sys._current_frames and its stack is counted. Nothing is traced in
+    between, so overhead stays low enough to run on a busy server, and
+    the result covers the event loop, camera, worker and save threads at
+    once. Output is in the collapsed stack format read by flamegraph.pl,
+    speedscope and similar tools.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()  # Only one profile runs at a time
+
+    def sample(self, duration, interval=Profiler.SAMPLE_INTERVAL, include_idle=False):
+        """Sample all threads for a while.
+
+        Args:
+            duration (float): Seconds to sample
+            interval (float): Seconds between samples
+            include_idle (bool): Also count threads that are waiting on a lock,
+                queue or socket
+
+        Returns:
+            tuple: (Counter mapping collapsed stacks to sample counts, number of samples taken)
+
+        Raises:
+            RuntimeError: If another profile is already running
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            own_id = threading.get_ident()
+            stacks = collections.Counter()
+            samples = 0
+            deadline = time.monotonic() + duration
+            while time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_id or (not include_idle and _is_idle(frame)):
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_name(frame))
+                        frame = frame.f_back
+                    stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                    stacks[';'.join(reversed(stack))] += 1
+                samples += 1
+                time.sleep(interval)
+            return stacks, samples
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def collapse(stacks):
+        """Format sampled stacks as collapsed stack lines, most frequent first."""
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+class StallDetector:
+    """Logs what the event loop is running when it stays blocked too long.
+
+    A heartbeat task on the loop records when it last ran, and a watchdog
+    thread checks it. If the loop has not come back for longer than the
+    threshold, the watchdog takes the loop thread's stack while the
+    offending callback is still running and logs it, which is what makes
+    a stall attributable, unlike measuring lag afterwards.
+    """
+
+    def __init__(self, threshold=Profiler.STALL_THRESHOLD, interval=Profiler.STALL_CHECK_INTERVAL,
+                 history=Profiler.STALL_HISTORY):
+        """Initialize the detector.
+
+        Args:
+            threshold (float): Seconds the loop may be blocked before a stall is reported
+            interval (float): Seconds between heartbeats and watchdog checks
+            history (int): Number of recent stalls kept for get_status
+        """
+        self.threshold = threshold
+        self.interval = interval
+        self._stalls = collections.deque(maxlen=history)
+        self._stall_count = 0
+        self._longest = 0.0
+        self._last_beat = None
+        self._loop_thread_id = None
+        self._task = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """Start watching the running event loop."""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop_event.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name='stall-detector', daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        """Stop watching."""
+        if self._task is None:
+            return
+        self._stop_event.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.get_running_loop().run_in_executor(None, self._thread.join, 1.0)
+
+    async def _heartbeat(self):
+        while True:
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _watch(self):
+        """Watchdog thread: report a stall once per blocked stretch, then its full duration."""
+        stalled_since = None
+        while not self._stop_event.wait(self.interval):
+            last_beat = self._last_beat
+            blocked = time.monotonic() - last_beat
+            # Heartbeats are interval apart, so only time beyond that counts as blocked
+            if blocked - self.interval > self.threshold:
+                if stalled_since != last_beat:
+                    stalled_since = last_beat
+                    self._report(blocked)
+            elif stalled_since is not None:
+                self._finish(last_beat - stalled_since - self.interval)
+                stalled_since = None
+
+    def _report(self, blocked):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else "(stack unavailable)\n"
+        self._stall_count += 1
+        EVENT_LOOP_STALLS_TOTAL.inc()
+        self._stalls.append({
+            'time': datetime.datetime.now().isoformat(),
+            'blocked_ms': round(blocked * 1000, 1),
+            'stack': stack
+        })
+        logger.warning(f"Event loop blocked for over {blocked * 1000:.0f}ms, currently running:\n{stack}")
+
+    def _finish(self, duration):
+        """Record how long a reported stall lasted in the end."""
+        self._longest = max(self._longest, duration)
+        if self._stalls:
+            self._stalls[-1]['blocked_ms'] = round(max(self._stalls[-1]['blocked_ms'], duration * 1000), 1)
+        logger.info(f"Event loop recovered after a {duration * 1000:.0f}ms stall")
+
+    def get_status(self):
+        """Get the stall threshold, counts and the most recent stalls with their stacks."""
+        return {
+            'threshold_ms': round(self.threshold * 1000, 1),
+            'stalls': self._stall_count,
+            'longest_ms': round(self._longest * 1000, 1),
+            'recent': list(self._stalls)
+        }
@@ -0,0 +1,258 @@
+import logging
+import threading
+import time
+from constants import FaceRecognition as FR, RecognitionSchedule
+
+logger = logging.getLogger(__name__)
+
+def box_iou(box_a, box_b):
+    """Compute the intersection over union of two (x, y, w, h) boxes."""
+    ax, ay, aw, ah = box_a
+    bx, by, bw, bh = box_b
+    overlap_w = min(ax + aw, bx + bw) - max(ax, bx)
+    overlap_h = min(ay + ah, by + bh) - max(ay, by)
+    if overlap_w <= 0 or overlap_h <= 0:
+        return 0.0
+    intersection = overlap_w * overlap_h
+    return intersection / float(aw * ah + bw * bh - intersection)
+
+class AdaptiveScheduler:
+    """Decides how much work FaceProcessor does per frame to keep up with requests.
+
+    On slow hardware running detection and recognition on every frame takes
+    longer than the time between frames, so requests queue up. The scheduler
+    measures the latency of each stage and moves along RecognitionSchedule.LEVELS:
+
+    - the detector runs on a downscaled frame, and only every few frames;
+      frames in between reuse the previous results
+    - full recognition (embedding, matching and memory updates) only runs
+      every few detector runs; in between, each detected box keeps the
+      identity of the previous face it overlaps most
+
+    A frame arriving while another is processed does not queue behind it; it
+    waits for that frame and shares its results.
+    """
+
+    def __init__(self, processor, levels=RecognitionSchedule.LEVELS,
+                 target_utilization=RecognitionSchedule.TARGET_UTILIZATION,
+                 latency_slo_ms=RecognitionSchedule.LATENCY_SLO_MS, batcher=None):
+        """Initialize the scheduler.
+
+        Args:
+            processor (FaceProcessor): Processor with loaded models and face memory
+            levels (tuple): (detection scale, detection interval, recognition interval)
+                tuples, from most to least work
+            target_utilization (float): Target fraction of time spent processing frames
+            latency_slo_ms (float): Target average processing latency per frame
+            batcher (DetectionBatcher, optional): Batches detections with other cameras
+        """
+        self.processor = processor
+        self.batcher = batcher
+        self.levels = levels
+        self.target_utilization = target_utilization
+        self.latency_slo_ms = latency_slo_ms
+        self.level = 0
+
+        # Exponentially weighted averages of stage latencies and frame timing (ms)
+        self._ewma = {'detect_ms': None, 'recognize_ms': None, 'frame_ms': None, 'arrival_ms': None}
+
+        self._condition = threading.Condition()
+        self._busy = False
+        self._generation = 0  # Incremented whenever a frame finishes processing
+        self._last_results = []
+        self._last_arrival = None
+        self._last_adjust_time = time.monotonic()
+        self._frames_since_detection = None  # None forces work on the next frame
+        self._detections_since_recognition = None
+
+        self.frames = 0
+        self.detections = 0
+        self.recognitions = 0
+        self.reused = 0
+        self.coalesced = 0
+
+    @property
+    def detection_scale(self):
+        return self.levels[self.level][0]
+
+    @property
+    def detect_interval(self):
+        return self.levels[self.level][1]
+
+    @property
+    def recognize_interval(self):
+        return self.levels[self.level][2]
+
+    def process(self, frame, roi=None):
+        """Get the recognized faces for a frame, skipping work as the current level allows.
+
+        Args:
+            frame (numpy.ndarray): Full-resolution frame
+            roi (RegionOfInterest, optional): Limits detection to parts of the frame
+
+        Returns:
+            list: Recognized face dicts in the format of FaceProcessor.analyze_faces
+        """
+        with self._condition:
+            now = time.monotonic()
+            if self._last_arrival is not None:
+                self._update('arrival_ms', (now - self._last_arrival) * 1000)
+            self._last_arrival = now
+
+            # Single flight: share the results of the frame already being processed
+            if self._busy:
+                generation = self._generation
+                while self._busy and self._generation == generation:
+                    self._condition.wait()
+                self.coalesced += 1
+                return self._copy_results(self._last_results)
+            self._busy = True
+
+        start = time.perf_counter()
+        results = None
+        try:
+            results = self._process_frame(frame, roi)
+            return self._copy_results(results)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._condition:
+                if results is not None:
+                    self._last_results = results
+                self._update('frame_ms', elapsed)
+                self.frames += 1
+                self._busy = False
+                self._generation += 1
+                self._condition.notify_all()
+                self._adjust()
+
+    def _process_frame(self, frame, roi):
+        """Run the stages due for this frame and return its results."""
+        if self._frames_since_detection is not None and self._frames_since_detection + 1 < self.detect_interval:
+            self._frames_since_detection += 1
+            self.reused += 1
+            return self._last_results
+        self._frames_since_detection = 0
+
+        start = time.perf_counter()
+        detections = self.processor.run_detection(frame, self.detection_scale, roi, self.batcher)
+        self._update('detect_ms', (time.perf_counter() - start) * 1000)
+        self.detections += 1
+        if detections is None:
+            return []
+
+        if self._detections_since_recognition is not None and self._detections_since_recognition + 1 < self.recognize_interval:
+            propagated = self._propagate(detections)
+            if propagated is not None:
+                self._detections_since_recognition += 1
+                return propagated
+        self._detections_since_recognition = 0
+
+        start = time.perf_counter()
+        results = self.processor.analyze_faces(frame, detections)
+        self._update('recognize_ms', (time.perf_counter() - start) * 1000)
+        self.recognitions += 1
+        return results
+
+    def _propagate(self, detections):
+        """Carry identities from the last recognized faces over to new detections.
+
+        Returns:
+            list: Updated face dicts, or None if any detection does not overlap a
+            known face and the frame needs full recognition
+        """
+        now = time.time()
+        propagated = []
+        available = list(self._last_results)
+        for face_info in detections:
+            confidence = float(face_info[4])
+            if confidence < FR.DETECTION_CONFIDENCE_THRESHOLD:
+                continue
+            box = list(map(int, face_info[:4]))
+
+            best, best_iou = None, RecognitionSchedule.IOU_THRESHOLD
+            for previous in available:
+                iou = box_iou(box, previous['box'])
+                if iou >= best_iou:
+                    best, best_iou = previous, iou
+            if best is None:
+                return None
+
+            available.remove(best)
+            propagated.append(dict(best, box=box, confidence=confidence, last_seen=now))
+
+        # Carried-over faces still count as sightings of their people
+        people = self.processor.memory.record_sightings(
+            [(face['id'], face['box'], face['confidence']) for face in propagated])
+        for face in propagated:
+            person = people.get(face['id'])
+            if person is not None:
+                face['appearance_count'] = person.appearance_count
+                face['last_seen_formatted'] = person.last_seen.isoformat()
+        return propagated
+
+    @staticmethod
+    def _copy_results(results):
+        """Copy result dicts so callers can add keys without touching shared results."""
+        return [dict(face) for face in results]
+
+    def _update(self, key, value):
+        """Fold a measurement into its exponentially weighted average."""
+        previous = self._ewma[key]
+        alpha = RecognitionSchedule.EWMA_ALPHA
+        self._ewma[key] = value if previous is None else previous + alpha * (value - previous)
+
+    def _utilization(self):
+        """Estimate the fraction of wall time spent processing frames."""
+        frame_ms = self._ewma['frame_ms']
+        arrival_ms = self._ewma['arrival_ms']
+        if frame_ms is None or arrival_ms is None:
+            return None
+        return min(1.0, frame_ms / max(arrival_ms, frame_ms, 1e-6))
+
+    def _adjust(self):
+        """Move one level towards less work if over target, or more if well under it."""
+        now = time.monotonic()
+        if now - self._last_adjust_time < RecognitionSchedule.ADJUST_INTERVAL:
+            return
+        utilization = self._utilization()
+        latency = self._ewma['frame_ms']
+        if utilization is None:
+            return
+
+        level = self.level
+        if utilization > self.target_utilization or latency > self.latency_slo_ms:
+            level = min(level + 1, len(self.levels) - 1)
+        elif (utilization < self.target_utilization * RecognitionSchedule.HEADROOM
+                and latency < self.latency_slo_ms * RecognitionSchedule.HEADROOM):
+            level = max(level - 1, 0)
+
+        self._last_adjust_time = now
+        if level != self.level:
+            logger.info(f"Recognition schedule level {self.level} -> {level} {self.levels[level]} "
+                        f"(utilization {utilization:.2f}, latency {latency:.1f}ms)")
+            self.level = level
+
+    def get_status(self):
+        """Get the current scheduling decisions and measurements.
+
+        Returns:
+            dict: Level, detection scale, intervals, targets, stage latency
+            averages and frame counters
+        """
+        with self._condition:
+            utilization = self._utilization()
+            return {
+                'level': self.level,
+                'detection_scale': self.detection_scale,
+                'detect_interval': self.detect_interval,
+                'recognize_interval': self.recognize_interval,
+                'target_utilization': self.target_utilization,
+                'latency_slo_ms': self.latency_slo_ms,
+                'utilization': round(utilization, 4) if utilization is not None else None,
+                **{key: round(value, 2) if value is not None else None for key, value in self._ewma.items()},
+                'frames': self.frames,
+                'detections': self.detections,
+                'recognitions': self.recognitions,
+                'reused': self.reused,
+                'coalesced': self.coalesced
+            }
@@ -0,0 +1,180 @@
+import os
+import json
+import logging
+import threading
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class RegionOfInterest:
+    """Areas of a camera frame where faces are looked for.
+
+    Regions are rectangles or polygons with coordinates given as fractions of
+    the frame width and height (0.0-1.0), so they survive resolution changes.
+    The detector only sees the bounding box of all regions, and detections
+    whose center falls outside every region are dropped.
+    """
+
+    def __init__(self, regions):
+        """Initialize a region of interest.
+
+        Args:
+            regions (list): Dicts that are either {'type': 'rect', 'x', 'y', 'w', 'h'}
+                or {'type': 'polygon', 'points': [[x, y], ...]}, in frame fractions
+
+        Raises:
+            ValueError: If a region is malformed
+        """
+        self.regions = [self._validate(region) for region in regions]
+        self._polygons = [self._points(region) for region in self.regions]
+        self._pixel_cache = {}  # Maps (width, height) to (bounds, polygons in pixels)
+
+    @staticmethod
+    def _validate(region):
+        """Check a region dict and return a normalized copy of it."""
+        if not isinstance(region, dict):
+            raise ValueError("Regions must be objects")
+        kind = region.get('type', 'rect')
+        if kind == 'rect':
+            try:
+                x, y, w, h = (float(region[key]) for key in ('x', 'y', 'w', 'h'))
+            except (KeyError, TypeError, ValueError):
+                raise ValueError("Rectangle regions need numeric 'x', 'y', 'w' and 'h'")
+            if w <= 0 or h <= 0:
+                raise ValueError("Rectangle regions need a positive width and height")
+            region = {'type': kind, 'x': x, 'y': y, 'w': w, 'h': h}
+        elif kind == 'polygon':
+            try:
+                points = [[float(px), float(py)] for px, py in region['points']]
+            except (KeyError, TypeError, ValueError):
+                raise ValueError("Polygon regions need 'points' as a list of [x, y] pairs")
+            if len(points) < 3:
+                raise ValueError("Polygon regions need at least three points")
+            region = {'type': kind, 'points': points}
+        else:
+            raise ValueError(f"Unknown region type: {kind}")
+
+        if any(not (0.0 <= value <= 1.0) for point in RegionOfInterest._points(region) for value in point):
+            raise ValueError("Region coordinates must be fractions of the frame between 0 and 1")
+        return region
+
+    @staticmethod
+    def _points(region):
+        """Get the corners of a normalized region as a polygon in frame fractions."""
+        if region['type'] == 'rect':
+            x, y, w, h = region['x'], region['y'], region['w'], region['h']
+            return [[x, y], [x + w, y], [x + w, y + h], [x, y + h]]
+        return region['points']
+
+    def to_dict(self):
+        """Convert to a JSON-serializable dict."""
+        return {'regions': self.regions}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create a region of interest from a dict made by to_dict."""
+        return cls(data.get('regions', []))
+
+    def _pixels(self, width, height):
+        """Get the pixel bounding box and polygons for a frame size, computing them once."""
+        cached = self._pixel_cache.get((width, height))
+        if cached is None:
+            scale = np.array([width, height], dtype=np.float32)
+            polygons = [np.round(np.array(points, dtype=np.float32) * scale).astype(np.int32)
+                        for points in self._polygons]
+            points = np.vstack(polygons)
+            x1, y1 = np.maximum(points.min(axis=0), 0)
+            x2, y2 = np.minimum(points.max(axis=0), [width, height])
+            cached = ((int(x1), int(y1), int(x2), int(y2)), polygons)
+            self._pixel_cache[(width, height)] = cached
+        return cached
+
+    def bounds(self, width, height):
+        """Get the bounding box of all regions in pixels.
+
+        Returns:
+            tuple: (x1, y1, x2, y2), clipped to the frame
+        """
+        return self._pixels(width, height)[0]
+
+    def contains(self, x, y, width, height):
+        """Check whether a pixel position lies inside any region."""
+        point = (float(x), float(y))
+        return any(cv2.pointPolygonTest(polygon, point, False) >= 0
+                   for polygon in self._pixels(width, height)[1])
+
+    def filter_detections(self, faces, width, height):
+        """Drop detections whose box center lies outside every region.
+
+        Args:
+            faces (numpy.ndarray): YuNet detections in full-frame coordinates
+
+        Returns:
+            numpy.ndarray: The detections inside the regions, or None if there are none
+        """
+        keep = [self.contains(face[0] + face[2] / 2, face[1] + face[3] / 2, width, height) for face in faces]
+        if not any(keep):
+            return None
+        return faces[np.array(keep)]
+
+class RoiStore:
+    """Regions of interest per camera, persisted to a JSON file."""
+
+    def __init__(self, storage_dir, filename="camera_rois.json"):
+        """Initialize the store and load saved regions.
+
+        Args:
+            storage_dir (str): Directory holding the file
+            filename (str): Name of the file
+        """
+        self.path = os.path.join(storage_dir, filename)
+        self._lock = threading.Lock()
+        self._rois = {}  # Maps camera ID to RegionOfInterest
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            for camera_id, roi_data in data.items():
+                try:
+                    self._rois[camera_id] = RegionOfInterest.from_dict(roi_data)
+                except ValueError as e:
+                    logger.error(f"Ignoring invalid region of interest for camera {camera_id}: {e}")
+            logger.info(f"Loaded regions of interest for {len(self._rois)} cameras")
+        except Exception as e:
+            logger.error(f"Error loading regions of interest from {self.path}: {e}")
+
+    def _save(self):
+        """Write all regions to disk; called with the lock held."""
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({camera_id: roi.to_dict() for camera_id, roi in self._rois.items()}, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def get(self, camera_id):
+        """Get the region of interest of a camera, or None if it sees the whole frame."""
+        with self._lock:
+            return self._rois.get(camera_id)
+
+    def set(self, camera_id, regions):
+        """Set the regions of a camera; an empty list clears them.
+
+        Returns:
+            RegionOfInterest: The new region of interest, or None if cleared
+
+        Raises:
+            ValueError: If a region is malformed
+        """
+        roi = RegionOfInterest(regions) if regions else None
+        with self._lock:
+            if roi is None:
+                self._rois.pop(camera_id, None)
+            else:
+                self._rois[camera_id] = roi
+            self._save()
+        logger.info(f"Set {len(regions)} regions of interest for camera {camera_id}")
+        return roi
@@ -5,143 +5,271 @@ from zeroconf.asyncio import AsyncZeroconf
 import socket
 import logging
 from camera_provider import create_camera_provider
+from camera_manager import CameraManager
 from face_processor import FaceProcessor
 from face_comparison_service import FaceComparisonService
+from roi import RoiStore
+from loop_monitor import LoopLagMonitor
+from logging_setup import AccessLog
+from profiler import StackSampler, StallDetector
+from metrics import REGISTRY, STAGE_SECONDS, REQUEST_SECONDS, GALLERY_PEOPLE, GALLERY_ROWS, QUEUE_DEPTH, EVENT_LOOP_LAG_SECONDS
+from constants import DetectionBatching, FaceImport, FrameRing, Profiler
 from zeroconf import ServiceInfo
 import datetime
+import time
 import argparse
 import os
 import cv2
 import numpy as np
-import tempfile
+import concurrent.futures
+import functools
 from aiohttp import MultipartReader, BodyPartReader
 
-# Configure logging with more detail
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
 logger = logging.getLogger(__name__)
 
+# Routes served while the camera, models and face memory are still starting;
+# everything else answers 503 until the server is ready
+STARTUP_ROUTES = {'/test', '/health', '/metrics', '/admin/profile', '/admin/stalls', '/', '/{path}'}
+
 class CameraProviderServer:
-    def __init__(self, camera_type='auto', camera_index=0, host='0.0.0.0', port=12345):
+    def __init__(self, camera_type='auto', camera_index=0, host='0.0.0.0', port=12345,
+                 cameras=None, workers=None, camera_options=None, storage_dir=None, inference_options=None,
+                 batch_detection=DetectionBatching.ENABLED, worker_processes=FrameRing.PROCESSES):
+        """Initialize the server.
+        
+        Args:
+            camera_type (str): Camera provider type for single-camera mode
+            camera_index (int): Camera index for single-camera mode
+            host (str): Host IP to bind to
+            port (int): Port to listen on
+            cameras (list, optional): Camera configurations ({'id', 'type', 'index', ...})
+                for multi-camera mode; the first camera also serves the legacy endpoints
+            workers (int, optional): Recognition worker threads in multi-camera mode
+            camera_options (dict, optional): File provider options ('source', 'pacing',
+                'fps', 'loop') for single-camera mode
+            storage_dir (str, optional): Directory for face memory and settings
+                (default: the data directory next to this file)
+            inference_options (dict, optional): Model loading options ('backend',
+                'target', 'num_threads', 'warmup'), see FaceProcessor.load_models
+            batch_detection (bool): Whether cameras detecting at the same time share
+                one detector call in multi-camera mode
+            worker_processes (int): Processes that detect faces and compute embeddings
+                in multi-camera mode, reading frames from shared memory; 0 uses threads
+        """
         self._server = None
         self._zeroconf = None
         self._service_info = None
         self._camera_type = camera_type
         self._camera_index = camera_index
+        self._camera_options = camera_options or {}
+        self._inference_options = inference_options or {}
         self._host = host
         self._port = port
         self.camera_provider = None  # Will be initialized in start()
+        self._camera_configs = cameras
+        self._workers = workers
+        self._batch_detection = batch_detection
+        self._worker_processes = worker_processes
+        self.camera_manager = None  # Only used in multi-camera mode
         self._request_count = 0
-        storage_dir = os.path.join(os.path.dirname(__file__), 'data')
+        self._runner = None
+        self._ready = False  # Set once the camera, models and face memory have started
+        self._started_at = time.time()
+        self._components = {}  # Maps 'camera', 'models' and 'memory' to their startup state
+        storage_dir = storage_dir or os.path.join(os.path.dirname(__file__), 'data')
         os.makedirs(storage_dir, exist_ok=True)
-        self.face_processor = FaceProcessor(storage_dir=storage_dir)
+        # Stored faces are loaded in start(), alongside the camera and models
+        self.face_processor = FaceProcessor(storage_dir=storage_dir, load_memory=False)
+        
+        # Regions of interest per camera; this server has a single camera
+        self.roi_store = RoiStore(storage_dir)
+        self._camera_id = 'default'
+        self.loop_monitor = LoopLagMonitor()
+        self.access_log = AccessLog()
+        self.stack_sampler = StackSampler()
+        self.stall_detector = StallDetector()
         self.current_frame = None  # Store the latest frame
         
-    async def _handle_test(self, request):
+        # Worker pool for decoding and embedding imported images in parallel
+        self._import_workers = min(4, os.cpu_count() or 1)
+        self._import_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self._import_workers, thread_name_prefix='import')
+        
+        # Detection and recognition of single-camera mode run off the event loop.
+        # While one thread processes a frame, requests on the other share its
+        # results through the scheduler, and later ones queue
+        self._recognition_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix='recognition')
+        
+    async def _capture_frame(self, provider):
+        """Get the latest JPEG frame of a camera, timing it as the capture stage."""
+        with STAGE_SECONDS.labels(stage='capture').time():
+            return await provider.get_frame()
+    
+    @staticmethod
+    def _decode_frame(jpeg_data):
+        """Decode a JPEG frame for OpenCV, timing it as the decode stage."""
+        with STAGE_SECONDS.labels(stage='decode').time():
+            return cv2.imdecode(np.frombuffer(jpeg_data, np.uint8), cv2.IMREAD_COLOR)
+    
+    @staticmethod
+    def _encode_frame(img):
+        """Encode an annotated frame as JPEG, timing it as the encode stage.
+        
+        Returns:
+            tuple: (success, buffer) as returned by cv2.imencode
+        """
+        with STAGE_SECONDS.labels(stage='encode').time():
+            return cv2.imencode(".jpg", img)
+    
+    async def _run_recognition(self, function, img):
+        """Run a detection or recognition function of the face processor on a recognition thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._recognition_executor, function, img, self.roi_store.get(self._camera_id))
+    
+    @web.middleware
+    async def _request_middleware(self, request, handler):
+        """Number every request and record how long it takes in metrics and the access log."""
         self._request_count += 1
-        start_time = datetime.datetime.now()
-        logger.info(f"[Request #{self._request_count}] Received TEST request from {request.remote}")
+        start = time.perf_counter()
+        status = 500
+        resource = request.match_info.route.resource
+        route = resource.canonical if resource is not None else 'unmatched'
+        try:
+            if not self._ready and route not in STARTUP_ROUTES:
+                response = web.json_response({'status': 'starting', 'error': "Server is starting"},
+                                             status=503, headers={'Retry-After': '1'})
+            else:
+                response = await handler(request)
+            status = response.status
+            return response
+        except web.HTTPException as e:
+            status = e.status
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            REQUEST_SECONDS.labels(route=route, status=status).observe(duration)
+            self.access_log.record(request, route, status, duration * 1000)
+    
+    def _register_metric_functions(self):
+        """Have gauges read the current state of the server whenever metrics are collected."""
+        memory = self.face_processor.memory
+        GALLERY_PEOPLE.labels(kind='named').set_function(lambda: len(memory.get_snapshot().named.ids))
+        GALLERY_PEOPLE.labels(kind='unnamed').set_function(lambda: len(memory.get_snapshot().unnamed.ids))
+        GALLERY_ROWS.labels(kind='named').set_function(lambda: memory.get_snapshot().named.matrix.shape[0])
+        GALLERY_ROWS.labels(kind='unnamed').set_function(lambda: memory.get_snapshot().unnamed.matrix.shape[0])
+        QUEUE_DEPTH.labels(queue='import').set_function(lambda: self._import_executor._work_queue.qsize())
+        if self.camera_manager:
+            QUEUE_DEPTH.labels(queue='recognition').set_function(self.camera_manager.get_in_flight_count)
+        else:
+            QUEUE_DEPTH.labels(queue='recognition').set_function(
+                lambda: self._recognition_executor._work_queue.qsize())
+        # Percentiles are missing until the monitor has taken its first sample
+        EVENT_LOOP_LAG_SECONDS.labels(quantile='0.5').set_function(
+            lambda: self.loop_monitor.get_status().get('p50_ms', 0.0) / 1000)
+        EVENT_LOOP_LAG_SECONDS.labels(quantile='0.99').set_function(
+            lambda: self.loop_monitor.get_status().get('p99_ms', 0.0) / 1000)
+    
+    async def _handle_test(self, request):
         response = web.Response(status=200)
-        elapsed = (datetime.datetime.now() - start_time).total_seconds() * 1000
-        logger.info(f"[Request #{self._request_count}] Handled TEST request in {elapsed:.2f}ms")
         return response
+    
+    async def _handle_health(self, request):
+        """Handle readiness checks.
         
-    async def _handle_get_image(self, request):
-        self._request_count += 1
-        start_time = datetime.datetime.now()
-        logger.info(f"[Request #{self._request_count}] Received GET_IMAGE request from {request.remote}")
+        Answers 503 while the camera, models or face memory are still
+        starting, and 200 once the server is ready. A server whose models
+        failed to load is reported as degraded: it streams video, but
+        detection and recognition are unavailable.
+        """
+        if not self._ready:
+            status = 'starting'
+        elif any(component['state'] != 'ready' for component in self._components.values()):
+            status = 'degraded'
+        else:
+            status = 'ready'
+        response = web.json_response({
+            'status': status,
+            'uptime_seconds': round(time.time() - self._started_at, 1),
+            'components': self._components
+        }, status=503 if status == 'starting' else 200)
+        return response
         
+    async def _handle_get_image(self, request):
         if not self.camera_provider.is_open:
             logger.error(f"[Request #{self._request_count}] Camera is not open")
             return web.Response(status=500)
             
-        frame = await self.camera_provider.get_frame()
+        frame = await self._capture_frame(self.camera_provider)
         self.current_frame = frame  # Store the latest frame
         if frame is None:
             logger.error(f"[Request #{self._request_count}] Failed to capture frame")
             return web.Response(status=500)
         
         response = web.Response(body=frame, content_type='image/jpeg')
-        elapsed = (datetime.datetime.now() - start_time).total_seconds() * 1000
-        logger.info(f"[Request #{self._request_count}] Successfully handled GET_IMAGE request in {elapsed:.2f}ms")
         return response
     
     async def _handle_get_image_with_detection(self, request):
-        self._request_count += 1
-        start_time = datetime.datetime.now()
-        logger.info(f"[Request #{self._request_count}] Received FACE_DETECTION request from {request.remote}")
-        
         if not self.camera_provider.is_open:
             logger.error(f"[Request #{self._request_count}] Camera is not open")
             return web.Response(status=500)
             
         # Get the raw JPEG frame
-        jpeg_data = await self.camera_provider.get_frame()
+        jpeg_data = await self._capture_frame(self.camera_provider)
         if jpeg_data is None:
             logger.error(f"[Request #{self._request_count}] Failed to capture frame")
             return web.Response(status=500)
         
         # Convert JPEG to numpy array for OpenCV
-        nparr = np.frombuffer(jpeg_data, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        img = self._decode_frame(jpeg_data)
         
-        # Detect faces
-        img_with_faces, _ = self.face_processor.detect_faces(img)
+        # Detect faces, then draw them on the decoded frame we already own
+        detected_faces = await self._run_recognition(self.face_processor.find_faces, img)
+        self.face_processor.render_detections(img, detected_faces)
         
         # Convert back to JPEG
-        is_success, buffer = cv2.imencode(".jpg", img_with_faces)
+        is_success, buffer = self._encode_frame(img)
         if not is_success:
             logger.error(f"[Request #{self._request_count}] Failed to encode processed image")
             return web.Response(status=500)
         
         # Return the processed image
         response = web.Response(body=buffer.tobytes(), content_type='image/jpeg')
-        elapsed = (datetime.datetime.now() - start_time).total_seconds() * 1000
-        logger.info(f"[Request #{self._request_count}] Successfully handled FACE_DETECTION request in {elapsed:.2f}ms")
         return response
     
     async def _handle_get_image_with_recognition(self, request):
-        self._request_count += 1
-        start_time = datetime.datetime.now()
-        logger.info(f"[Request #{self._request_count}] Received FACE_RECOGNITION request from {request.remote}")
+        if self.camera_manager:
+            return await self._handle_camera_image_with_recognition(request, self._camera_id)
         
         if not self.camera_provider.is_open:
             logger.error(f"[Request #{self._request_count}] Camera is not open")
             return web.Response(status=500)
             
         # Get the raw JPEG frame
-        jpeg_data = await self.camera_provider.get_frame()
+        jpeg_data = await self._capture_frame(self.camera_provider)
         if jpeg_data is None:
             logger.error(f"[Request #{self._request_count}] Failed to capture frame")
             return web.Response(status=500)
         
         # Convert JPEG to numpy array for OpenCV
-        nparr = np.frombuffer(jpeg_data, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        img = self._decode_frame(jpeg_data)
         
-        # Recognize faces
-        img_with_faces, _ = self.face_processor.recognize_faces(img)
+        # Recognize faces, then draw them on the decoded frame we already own
+        recognized_faces = await self._run_recognition(self.face_processor.process_frame, img)
+        self.face_processor.render_recognitions(img, recognized_faces)
         
         # Convert back to JPEG
-        is_success, buffer = cv2.imencode(".jpg", img_with_faces)
+        is_success, buffer = self._encode_frame(img)
         if not is_success:
             logger.error(f"[Request #{self._request_count}] Failed to encode processed image")
             return web.Response(status=500)
         
         # Return the processed image
         response = web.Response(body=buffer.tobytes(), content_type='image/jpeg')
-        elapsed = (datetime.datetime.now() - start_time).total_seconds() * 1000
-        logger.info(f"[Request #{self._request_count}] Successfully handled FACE_RECOGNITION request in {elapsed:.2f}ms")
         return response
     
     async def _handle_add_face(self, request):
-        self._request_count += 1
-        start_time = datetime.datetime.now()
-        logger.info(f"[Request #{self._request_count}] Received ADD_FACE request from {request.remote}")
-        
         # Get face ID from query parameters
         face_id = request.query.get('id', None)
         if face_id is None:
@@ -149,30 +277,24 @@ class CameraProviderServer:
             return web.Response(status=400, text="Face ID is required")
         
         # Get latest frame or capture new one
-        jpeg_data = await self.camera_provider.get_frame()
+        jpeg_data = await self._capture_frame(self.camera_provider)
         if jpeg_data is None:
             logger.error(f"[Request #{self._request_count}] Failed to capture frame")
             return web.Response(status=500)
         
         # Convert JPEG to numpy array for OpenCV
-        nparr = np.frombuffer(jpeg_data, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        img = self._decode_frame(jpeg_data)
         
         # Add the face
         success = self.face_processor.add_face(img, face_id)
         if not success:
             return web.Response(status=500, text="Failed to add face")
         
-        elapsed = (datetime.datetime.now() - start_time).total_seconds() * 1000
-        logger.info(f"[Request #{self._request_count}] Successfully added face '{face_id}' in {elapsed:.2f}ms")
+        logger.info(f"[Request #{self._request_count}] Successfully added face '{face_id}'")
         return web.Response(text=f"Face '{face_id}' added successfully")
     
     async def _handle_get_face_counts(self, request):
         """Handle requests for face appearance counts."""
-        self._request_count += 1
-        start_time = datetime.datetime.now()
-        logger.info(f"[Request #{self._request_count}] Received GET_FACE_COUNTS request from {request.remote}")
-        
         # Use memory-based approach to get counts
         people = self.face_processor.memory.get_all_people()
         
@@ -187,46 +309,78 @@ class CameraProviderServer:
         # Convert to a format suitable for JSON with timestamp information
         counts_data = {}
         for person_id, person in people.items():
-            # Get thumbnail URLs using the person object methods
-            thumbnail_url = None
-            all_thumbnail_urls = []
+            counts_data[person_id] = self._person_summary(person, base_url, current_time)
+        
+        response = web.json_response(counts_data)
+        return response
+    
+    def _person_summary(self, person, base_url, current_time):
+        """Build the JSON-safe summary of a person shared by the face listing endpoints."""
+        # Get thumbnail URLs using the person object methods
+        thumbnail_url = None
+        all_thumbnail_urls = []
 
-            # Get the latest thumbnail URL
-            latest_thumbnail_path = person.get_thumbnail_url()
-            if latest_thumbnail_path:
-                 # Construct full URL if it's a relative path
-                 thumbnail_url = f"{base_url}{latest_thumbnail_path}" if latest_thumbnail_path.startswith('/') else latest_thumbnail_path
+        # Get the latest thumbnail URL
+        latest_thumbnail_path = person.get_thumbnail_url()
+        if latest_thumbnail_path:
+             # Construct full URL if it's a relative path
+             thumbnail_url = f"{base_url}{latest_thumbnail_path}" if latest_thumbnail_path.startswith('/') else latest_thumbnail_path
 
-            # Get all thumbnail URLs
-            for path in person.get_all_thumbnail_urls():
-                 # Construct full URL if it's a relative path
-                 full_url = f"{base_url}{path}" if path.startswith('/') else path
-                 all_thumbnail_urls.append(full_url)
-                            
-            counts_data[person_id] = {
-                'count': person.appearance_count,
-                'is_named': person.is_named,
-                'first_seen': self.face_processor.get_first_seen_time(person_id),
-                'last_seen': self.face_processor.get_last_seen_time(person_id),
-                'timestamp': current_time,
-                'thumbnail_url': thumbnail_url, # Use the potentially full URL
-                'thumbnail_count': person.thumbnail_count,
-                'has_thumbnails': len(person.thumbnails) > 0,
-                'all_thumbnail_urls': all_thumbnail_urls # Use the list of potentially full URLs
-            }
+        # Get all thumbnail URLs
+        for path in person.get_all_thumbnail_urls():
+             # Construct full URL if it's a relative path
+             full_url = f"{base_url}{path}" if path.startswith('/') else path
+             all_thumbnail_urls.append(full_url)
+
+        return {
+            'count': person.appearance_count,
+            'is_named': person.is_named,
+            'first_seen': person.first_seen.isoformat() if person.first_seen else None,
+            'last_seen': person.last_seen.isoformat() if person.last_seen else None,
+            'timestamp': current_time,
+            'thumbnail_url': thumbnail_url, # Use the potentially full URL
+            'thumbnail_count': person.thumbnail_count,
+            'has_thumbnails': len(person.thumbnails) > 0,
+            'all_thumbnail_urls': all_thumbnail_urls, # Use the list of potentially full URLs
+            'last_modified_rev': person.last_modified_rev
+        }
+    
+    async def _handle_get_changes(self, request):
+        """Handle delta sync requests for people changed since a revision."""
+        try:
+            since_rev = int(request.query.get('since', 0))
+        except ValueError:
+            logger.error(f"[Request #{self._request_count}] Invalid 'since' revision")
+            return web.Response(status=400, text="'since' must be an integer revision")
         
-        response = web.json_response(counts_data)
+        # Clients echo the epoch of their last sync; revisions from another epoch force a full resync
+        changes = self.face_processor.memory.get_changes(since_rev, request.query.get('epoch'))
         
-        elapsed = (datetime.datetime.now() - start_time).total_seconds() * 1000
-        logger.info(f"[Request #{self._request_count}] Successfully handled GET_FACE_COUNTS request in {elapsed:.2f}ms")
+        # Get server base URL for thumbnail URLs
+        scheme = request.url.scheme
+        host = request.host
+        base_url = f"{scheme}://{host}"
+        current_time = datetime.datetime.now().isoformat()
+        
+        changed_data = {}
+        for person in changes['changed']:
+            changed_data[person.id] = self._person_summary(person, base_url, current_time)
+        
+        response = web.json_response({
+            'revision': changes['revision'],
+            'epoch': changes['epoch'],
+            'since': since_rev,
+            'full_resync': changes['full_resync'],
+            'changed': changed_data,
+            'removed': changes['removed']
+        })
+        
+        logger.debug("[Request #%d] GET_CHANGES: %d changed, %d removed",
+                     self._request_count, len(changed_data), len(changes['removed']))
         return response
     
     async def _handle_get_known_faces(self, request):
         """Handle requests for known face data including features."""
-        self._request_count += 1
-        start_time = datetime.datetime.now()
-        logger.info(f"[Request #{self._request_count}] Received GET_KNOWN_FACES request from {request.remote}")
-        
         # Use the existing method that already uses memory
         known_faces = self.face_processor.get_known_faces()
         
@@ -257,17 +411,10 @@ class CameraProviderServer:
             'count': len(known_face_ids),
             'known_faces_list': known_face_ids
         })
-        
-        elapsed = (datetime.datetime.now() - start_time).total_seconds() * 1000
-        logger.info(f"[Request #{self._request_count}] Successfully handled GET_KNOWN_FACES request in {elapsed:.2f}ms")
         return response
     
     async def _handle_merge_faces(self, request):
         """Handle requests to merge two face entries."""
-        self._request_count += 1
-        start_time = datetime.datetime.now()
-        logger.info(f"[Request #{self._request_count}] Received MERGE_FACES request from {request.remote}")
-        
         # Get source and target face IDs from query parameters
         source_face_id = request.query.get('source', None)
         target_face_id = request.query.get('target', None)
@@ -282,61 +429,206 @@ class CameraProviderServer:
         if not success:
             return web.Response(status=400, text="Failed to merge faces - one or both IDs may not exist")
         
-        elapsed = (datetime.datetime.now() - start_time).total_seconds() * 1000
-        logger.info(f"[Request #{self._request_count}] Successfully merged faces in {elapsed:.2f}ms")
+        logger.info(f"[Request #{self._request_count}] Successfully merged faces")
         return web.Response(text=f"Successfully merged '{source_face_id}' into '{target_face_id}'")
     
+    async def _handle_consolidate_faces(self, request):
+        """Handle requests to merge duplicate unnamed faces.
+        
+        Runs as a dry run unless `dry_run=0` is given, so the report can be
+        reviewed before anything is merged.
+        """
+        dry_run = request.query.get('dry_run', '1').lower() not in ('0', 'false', 'no')
+        
+        # Clustering scores every pair of unnamed faces, so keep it off the event loop
+        loop = asyncio.get_running_loop()
+        report = await loop.run_in_executor(
+            None, functools.partial(self.face_processor.memory.consolidate_unnamed_faces, dry_run=dry_run))
+        
+        if report is None:
+            return web.Response(status=409, text="A consolidation is already in progress")
+        
+        logger.info(f"[Request #{self._request_count}] Consolidated faces - "
+                    f"{report['duplicates']} duplicates, {report['merged']} merged")
+        return web.json_response(report)
+    
+    async def _handle_apply_retention(self, request):
+        """Handle requests to evict stale unnamed faces to the archive.
+        
+        Runs as a dry run unless `dry_run=0` is given.
+        """
+        dry_run = request.query.get('dry_run', '1').lower() not in ('0', 'false', 'no')
+        
+        loop = asyncio.get_running_loop()
+        report = await loop.run_in_executor(
+            None, functools.partial(self.face_processor.memory.apply_retention, dry_run=dry_run))
+        
+        logger.info(f"[Request #{self._request_count}] Applied retention - "
+                    f"{report['evicted']} evicted")
+        return web.json_response(report)
+    
+    async def _handle_get_archive(self, request):
+        """Handle requests to list or search archived faces.
+        
+        With `face_id`, returns archived people similar to that person in
+        memory; otherwise lists the archive using `offset` and `limit`.
+        """
+        memory = self.face_processor.memory
+        if memory.archive is None:
+            return web.Response(status=404, text="Face archive is not available without a storage directory")
+        
+        try:
+            offset = int(request.query.get('offset', 0))
+            limit = int(request.query.get('limit', 100))
+        except ValueError:
+            return web.Response(status=400, text="'offset' and 'limit' must be integers")
+        
+        face_id = request.query.get('face_id', None)
+        loop = asyncio.get_running_loop()
+        if face_id is not None:
+            person = memory.get_person(face_id)
+            if person is None or person.feature_vector is None:
+                return web.Response(status=404, text=f"Face '{face_id}' not found or has no features")
+            results = await loop.run_in_executor(
+                None, functools.partial(memory.search_archive, person.feature_vector, limit=limit))
+            total = len(results)
+        else:
+            total, results = await loop.run_in_executor(
+                None, functools.partial(memory.archive.list_people, offset, limit))
+        
+        logger.info(f"[Request #{self._request_count}] Searched archive - "
+                    f"{len(results)} of {total} archived faces")
+        return web.json_response({'total': total, 'faces': results})
+    
+    async def _handle_restore_face(self, request):
+        """Handle requests to move an archived face back into memory."""
+        face_id = request.query.get('face_id', None)
+        if face_id is None:
+            return web.Response(status=400, text="face_id is required")
+        
+        loop = asyncio.get_running_loop()
+        person = await loop.run_in_executor(None, self.face_processor.memory.restore_from_archive, face_id)
+        if person is None:
+            return web.Response(status=400, text=f"Failed to restore '{face_id}' - not archived or already in memory")
+        
+        logger.info(f"[Request #{self._request_count}] Successfully restored {face_id}")
+        return web.Response(text=f"Successfully restored '{face_id}'")
+    
+    def _add_thumbnail_urls(self, request, faces):
+        """Replace the thumbnail paths of face dicts with full URLs on this server."""
+        base_url = f"{request.url.scheme}://{request.host}"
+        for face in faces:
+            person = self.face_processor.memory.get_person(face.get('id'))
+            if person:
+                latest_thumbnail_path = person.get_thumbnail_url()
+                face['thumbnail_url'] = f"{base_url}{latest_thumbnail_path}" if latest_thumbnail_path and latest_thumbnail_path.startswith('/') else latest_thumbnail_path
+    
     async def _handle_get_face_data(self, request):
         """Handle requests for comprehensive face data including detection and recognition results."""
-        self._request_count += 1
-        start_time = datetime.datetime.now()
-        logger.info(f"[Request #{self._request_count}] Received GET_FACE_DATA request from {request.remote}")
+        if self.camera_manager:
+            return await self._handle_camera_face_data(request, self._camera_id)
         
         if not self.camera_provider.is_open:
             logger.error(f"[Request #{self._request_count}] Camera is not open")
             return web.Response(status=500)
             
         # Get the raw JPEG frame
-        jpeg_data = await self.camera_provider.get_frame()
+        jpeg_data = await self._capture_frame(self.camera_provider)
         if jpeg_data is None:
             logger.error(f"[Request #{self._request_count}] Failed to capture frame")
             return web.Response(status=500)
         
         # Convert JPEG to numpy array for OpenCV
-        nparr = np.frombuffer(jpeg_data, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        img = self._decode_frame(jpeg_data)
         
-        # Get server base URL for thumbnail URLs
-        scheme = request.url.scheme
-        host = request.host
-        base_url = f"{scheme}://{host}"
-
-        # Process with face recognition
-        _, recognized_faces = self.face_processor.recognize_faces(img)
+        # Process with face recognition; the image is not returned, so nothing is drawn
+        recognized_faces = await self._run_recognition(self.face_processor.process_frame, img)
 
         # Add full thumbnail URLs to the response
-        for face in recognized_faces:
-            person = self.face_processor.memory.get_person(face.get('id'))
-            if person:
-                latest_thumbnail_path = person.get_thumbnail_url()
-                face['thumbnail_url'] = f"{base_url}{latest_thumbnail_path}" if latest_thumbnail_path and latest_thumbnail_path.startswith('/') else latest_thumbnail_path
+        self._add_thumbnail_urls(request, recognized_faces)
         
         # Return just the face data (not the image)
         response = web.json_response({
             'faces': recognized_faces,
             'timestamp': datetime.datetime.now().isoformat()
         })
+        return response
+    
+    def _get_camera_stream(self, request, camera_id=None):
+        """Get the stream of the camera named in the request path, or None if unknown."""
+        camera_id = camera_id or request.match_info.get('camera_id')
+        if not self.camera_manager:
+            return None
+        return self.camera_manager.streams.get(camera_id)
+    
+    async def _handle_list_cameras(self, request):
+        """Handle requests for the configured cameras and their status."""
+        if self.camera_manager:
+            cameras = self.camera_manager.get_status()['cameras']
+        else:
+            cameras = {self._camera_id: {'is_open': bool(self.camera_provider and self.camera_provider.is_open)}}
+        response = web.json_response({'default': self._camera_id, 'cameras': cameras})
+        return response
+    
+    async def _handle_camera_image(self, request):
+        """Handle requests for the latest frame of one camera."""
+        stream = self._get_camera_stream(request)
+        if stream is None:
+            return web.Response(status=404, text="Unknown camera")
+        
+        jpeg_data = await self._capture_frame(stream)
+        if jpeg_data is None:
+            logger.error(f"[Request #{self._request_count}] No frame captured yet for camera {stream.camera_id}")
+            return web.Response(status=500)
+        
+        response = web.Response(body=jpeg_data, content_type='image/jpeg')
+        return response
+    
+    async def _handle_camera_image_with_recognition(self, request, camera_id=None):
+        """Handle requests for the latest frame of one camera with its latest recognition results drawn."""
+        stream = self._get_camera_stream(request, camera_id)
+        if stream is None:
+            return web.Response(status=404, text="Unknown camera")
+        
+        jpeg_data = await self._capture_frame(stream)
+        if jpeg_data is None:
+            logger.error(f"[Request #{self._request_count}] No frame captured yet for camera {stream.camera_id}")
+            return web.Response(status=500)
+        
+        # Draw the most recent results; recognition itself runs in the background
+        img = self._decode_frame(jpeg_data)
+        results = self.camera_manager.get_results(stream.camera_id)
+        if results:
+            self.face_processor.render_recognitions(img, results['faces'])
+        
+        is_success, buffer = self._encode_frame(img)
+        if not is_success:
+            logger.error(f"[Request #{self._request_count}] Failed to encode processed image")
+            return web.Response(status=500)
+        
+        response = web.Response(body=buffer.tobytes(), content_type='image/jpeg')
+        return response
+    
+    async def _handle_camera_face_data(self, request, camera_id=None):
+        """Handle requests for the latest recognition results of one camera."""
+        stream = self._get_camera_stream(request, camera_id)
+        if stream is None:
+            return web.Response(status=404, text="Unknown camera")
+        
+        results = self.camera_manager.get_results(stream.camera_id)
+        faces = results['faces'] if results else []
+        self._add_thumbnail_urls(request, faces)
         
-        elapsed = (datetime.datetime.now() - start_time).total_seconds() * 1000
-        logger.info(f"[Request #{self._request_count}] Successfully handled GET_FACE_DATA request in {elapsed:.2f}ms")
+        response = web.json_response({
+            'camera_id': stream.camera_id,
+            'faces': faces,
+            'frame_seq': results['frame_seq'] if results else None,
+            'timestamp': datetime.datetime.now().isoformat()
+        })
         return response
     
     async def _handle_rename_face(self, request):
         """Handle requests to rename a face."""
-        self._request_count += 1
-        start_time = datetime.datetime.now()
-        logger.info(f"[Request #{self._request_count}] Received RENAME_FACE request from {request.remote}")
-        
         # Get old and new face IDs from query parameters
         old_face_id = request.query.get('old_id', None)
         new_face_id = request.query.get('new_id', None)
@@ -356,8 +648,7 @@ class CameraProviderServer:
             if not success:
                 return web.Response(status=400, text="Failed to merge faces - one or both IDs may not exist")
                 
-            elapsed = (datetime.datetime.now() - start_time).total_seconds() * 1000
-            logger.info(f"[Request #{self._request_count}] Successfully merged faces in {elapsed:.2f}ms")
+            logger.info(f"[Request #{self._request_count}] Successfully merged faces")
             return web.Response(text=f"Successfully merged '{old_face_id}' into '{new_face_id}'")
         
         # Check if old face exists
@@ -373,8 +664,7 @@ class CameraProviderServer:
             # Request a save to persist the change
             self.face_processor.memory.request_save()
             
-            elapsed = (datetime.datetime.now() - start_time).total_seconds() * 1000
-            logger.info(f"[Request #{self._request_count}] Successfully renamed face from '{old_face_id}' to '{new_face_id}' in {elapsed:.2f}ms")
+            logger.info(f"[Request #{self._request_count}] Successfully renamed face from '{old_face_id}' to '{new_face_id}'")
             return web.Response(text=f"Successfully renamed '{old_face_id}' to '{new_face_id}'")
         else:
             return web.Response(status=400, text=f"Failed to rename face - please check logs for details")
@@ -402,154 +692,175 @@ class CameraProviderServer:
             return web.Response(status=404)
         
     async def _handle_import_faces_batch(self, request):
-        """Handle batch import of faces from uploaded images."""
-        self._request_count += 1
-        start_time = datetime.datetime.now()
-        logger.info(f"[Request #{self._request_count}] Received IMPORT_FACES_BATCH request from {request.remote}")
+        """Handle batch import of faces from uploaded images.
+        
+        Image parts are decoded and run through detection and embedding on a
+        worker pool while the rest of the upload is still being read. Once all
+        images are done, the person is enrolled with one memory update, one
+        merge scan and one save.
+        
+        Clients that send 'Accept: application/x-ndjson' (or '?stream=1') get
+        one JSON line per image as it finishes, followed by a final line with
+        'event': 'result'. Other clients get only the final result as JSON.
+        """
+        request_number = self._request_count
+        
+        # Check content type
+        content_type = request.content_type
+        if not content_type.startswith('multipart/'):
+            logger.warning(f"Invalid content type: {content_type}")
+            return web.Response(status=400, text="Invalid content type, expected multipart/form-data")
+        
+        stream = (request.query.get('stream') == '1' or
+                  'application/x-ndjson' in request.headers.get('Accept', ''))
+        response = None
+        if stream:
+            response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+            await response.prepare(request)
+        
+        async def emit(event):
+            if response is not None:
+                await response.write((json.dumps(event) + "\n").encode('utf-8'))
+        
+        # Prepare result object
+        result = {
+            "success": True,
+            "person_name": "",
+            "images_processed": 0,
+            "faces_detected": 0,
+            "failed_images": [],
+            "errors": []
+        }
+        person_name = None
+        faces = []
+        pending = {}  # Maps worker task to the filename it is processing
+        
+        loop = asyncio.get_event_loop()
+        # Bound the number of uploaded images held in memory awaiting a worker
+        in_flight = asyncio.Semaphore(self._import_workers * 2)
+        
+        async def report(task):
+            """Record the outcome of one image and stream it to the client."""
+            filename = pending.pop(task)
+            try:
+                face, error = task.result()
+            except Exception as img_err:
+                logger.error(f"Error processing image {filename}: {img_err}", exc_info=True)
+                face, error = None, f"Error processing {filename}: {str(img_err)}"
+            
+            result["images_processed"] += 1
+            if face is not None:
+                faces.append(face)
+                result["faces_detected"] += 1
+            else:
+                result["failed_images"].append(filename)
+                result["errors"].append(f"{filename}: {error}")
+            
+            await emit({
+                "event": "image",
+                "filename": filename,
+                "success": face is not None,
+                "confidence": face["confidence"] if face is not None else None,
+                "error": error,
+                "images_processed": result["images_processed"],
+                "faces_detected": result["faces_detected"]
+            })
+        
+        async def report_finished():
+            for task in [task for task in pending if task.done()]:
+                await report(task)
+        
         try:
-            # Check content type
-            content_type = request.content_type
-            if not content_type.startswith('multipart/'):
-                logger.warning(f"Invalid content type: {content_type}")
-                return web.Response(status=400, text="Invalid content type, expected multipart/form-data")
-
+            if not self.face_processor.ensure_models_loaded():
+                raise RuntimeError("Face models are not available")
+            
             reader = await request.multipart()
-
-            # Prepare result object
-            result = {
-                "success": True,
-                "person_name": "",
-                "images_processed": 0,
-                "faces_detected": 0,
-                "failed_images": [],
-                "errors": []
-            }
-
-            # Create temporary directory for processing
-            temp_dir = tempfile.mkdtemp()
-            logger.info(f"Created temp directory: {temp_dir}")
-
-            # Initialize tracking variables
-            person_name = None
-            image_files = [] # Store tuples of (filename, filepath)
-
-            try:
-                # Process multipart data
-                while True:
-                    part = await reader.next()
-                    if part is None:
-                        break
-
-                    if part.name == 'person_name':
-                        person_name = (await part.text()).strip()
-                        result["person_name"] = person_name
-                        logger.info(f"Processing import for person: {person_name}")
-                    elif part.name == 'images':
-                        filename = part.filename
-                        if filename and self._is_valid_image_filename(filename):
-                            # Save file temporarily
-                            file_path = os.path.join(temp_dir, filename)
-                            with open(file_path, 'wb') as f:
-                                while True:
-                                    chunk = await part.read_chunk()
-                                    if not chunk:
-                                        break
-                                    f.write(chunk)
-                            image_files.append((filename, file_path))
-                            logger.debug(f"Saved temporary image: {file_path}")
-                        else:
-                            logger.warning(f"Skipping invalid file: {filename}")
-                            result["failed_images"].append(filename)
-                            result["errors"].append(f"Invalid file type: {filename}")
-
-                if not person_name:
-                    raise ValueError("Missing 'person_name' in form data")
-                if not image_files:
-                    raise ValueError("No valid image files provided")
-
-                # Process saved images using FaceProcessor
-                detected_faces = 0
-                processed_count = 0
-                for filename, file_path in image_files:
-                    try:
-                        # Read image using OpenCV
-                        img = cv2.imread(file_path)
-                        if img is None:
-                            raise ValueError(f"Could not read image file: {filename}")
-
-                        # Process using FaceProcessor
-                        success, face_id = await asyncio.get_event_loop().run_in_executor(
-                            None, self.face_processor.process_imported_face_image, img, person_name
-                        )
-                        processed_count += 1
-                        if success:
-                            detected_faces += 1
-                            # face_id should be the person_name if successful
-                            result["face_id"] = face_id # Store the confirmed face_id
-                        else:
-                            result["failed_images"].append(filename)
-                            # Add more specific error if possible, otherwise generic
-                            if f"No face detected in image for {person_name}" not in str(result["errors"]): # Avoid duplicate no-face errors
-                                result["errors"].append(f"Processing failed for {filename} (e.g., no face or low confidence)")
-                    except Exception as img_err:
-                        logger.error(f"Error processing image {filename}: {img_err}", exc_info=True)
+            
+            # Process multipart data as it arrives
+            while True:
+                part = await reader.next()
+                if part is None:
+                    break
+                
+                if part.name == 'person_name':
+                    person_name = (await part.text()).strip()
+                    result["person_name"] = person_name
+                    logger.info(f"Processing import for person: {person_name}")
+                elif part.name == 'images':
+                    filename = part.filename
+                    if filename and self._is_valid_image_filename(filename):
+                        await in_flight.acquire()
+                        data = await part.read()
+                        task = asyncio.ensure_future(loop.run_in_executor(
+                            self._import_executor, self._extract_import_image, data))
+                        task.add_done_callback(lambda _: in_flight.release())
+                        pending[task] = filename
+                    else:
+                        logger.warning(f"Skipping invalid file: {filename}")
                         result["failed_images"].append(filename)
-                        result["errors"].append(f"Error processing {filename}: {str(img_err)}")
-
-                # Update result
-                result["images_processed"] = processed_count
-                result["faces_detected"] = detected_faces
-
-                # Check if overall success based on detected faces
-                if detected_faces == 0 and processed_count > 0:
-                    result["success"] = False
-                    if not result["errors"]: # Add a generic error if none specific were added
-                         result["errors"].append(f"No faces successfully processed for {person_name}")
-            finally:
-                # Cleanup temp files and directory
-                logger.info(f"Cleaning up temp directory: {temp_dir}")
-                for _, file_path in image_files:
-                    try:
-                        if os.path.exists(file_path):
-                            os.remove(file_path)
-                    except Exception as e:
-                        logger.error(f"Error removing temp file {file_path}: {e}")
-                try:
-                    if os.path.exists(temp_dir):
-                        os.rmdir(temp_dir)
-                except Exception as e:
-                    logger.error(f"Error removing temp directory {temp_dir}: {e}")
-
-            # Return results
-            elapsed = (datetime.datetime.now() - start_time).total_seconds() * 1000
-            logger.info(f"[Request #{self._request_count}] Processed batch import for '{person_name}' in {elapsed:.2f}ms - {result['faces_detected']}/{result['images_processed']} faces detected/processed.")
-            return web.json_response(result)
-
+                        result["errors"].append(f"Invalid file type: {filename}")
+                
+                await report_finished()
+            
+            if not person_name:
+                raise ValueError("Missing 'person_name' in form data")
+            if not pending and result["images_processed"] == 0:
+                raise ValueError("No valid image files provided")
+            
+            # Wait for the remaining images
+            while pending:
+                await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                await report_finished()
+            
+            # Enroll all embeddings at once
+            if faces:
+                merged = await loop.run_in_executor(
+                    None, self.face_processor.enroll_person, person_name, faces)
+                result["face_id"] = person_name
+                result["merged_faces"] = merged
+            elif result["images_processed"] > 0:
+                result["success"] = False
+                if not result["errors"]: # Add a generic error if none specific were added
+                    result["errors"].append(f"No faces successfully processed for {person_name}")
+            
+            logger.info(f"[Request #{request_number}] Processed batch import for '{person_name}' - {result['faces_detected']}/{result['images_processed']} faces detected/processed.")
+            status = 200
+        
         except Exception as e:
-            logger.error(f"[Request #{self._request_count}] Error handling batch import: {e}", exc_info=True)
-            # Ensure result reflects the error
-            error_result = {
+            logger.error(f"[Request #{request_number}] Error handling batch import: {e}", exc_info=True)
+            for task in pending:
+                task.cancel()
+            result = {
                 "success": False,
-                "person_name": person_name if 'person_name' in locals() else "Unknown",
-                "images_processed": 0,
+                "person_name": person_name or "Unknown",
+                "images_processed": result["images_processed"],
                 "faces_detected": 0,
-                "failed_images": [f[0] for f in image_files] if 'image_files' in locals() else [],
-                "errors": [f"Server error during import: {str(e)}"]
+                "failed_images": result["failed_images"],
+                "errors": result["errors"] + [f"Server error during import: {str(e)}"]
             }
-            return web.json_response(error_result, status=500)
+            status = 500
+        
+        if response is None:
+            return web.json_response(result, status=status)
+        
+        await emit(dict(result, event="result"))
+        await response.write_eof()
+        return response
+    
+    def _extract_import_image(self, data):
+        """Decode an uploaded image and extract its face (runs on an import worker)."""
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            return None, "Could not read image file"
+        return self.face_processor.extract_import_face(img)
     
     def _is_valid_image_filename(self, filename):
         """Check if filename has a valid image extension."""
-        valid_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.webp']
         ext = os.path.splitext(filename.lower())[1]
-        return ext in valid_extensions
+        return ext in FaceImport.IMAGE_EXTENSIONS
     
     async def _handle_thumbnail(self, request):
         """Handle requests for thumbnail images."""
-        self._request_count += 1
-        start_time = datetime.datetime.now()
-        logger.info(f"[Request #{self._request_count}] Received THUMBNAIL request from {request.remote}")
-        
         # Get person_id and filename from URL path
         person_id = request.match_info.get('person_id', None)
         filename = request.match_info.get('filename', None)
@@ -575,95 +886,267 @@ class CameraProviderServer:
         # Return the thumbnail file
         with open(thumbnail_path, 'rb') as f:
             content = f.read()
-        
-        elapsed = (datetime.datetime.now() - start_time).total_seconds() * 1000
-        logger.info(f"[Request #{self._request_count}] Successfully handled THUMBNAIL request in {elapsed:.2f}ms")
         return web.Response(body=content, content_type='image/jpeg')
 
     async def _handle_get_save_status(self, request):
         """Handle requests for face memory save status."""
-        self._request_count += 1
-        start_time = datetime.datetime.now()
-        logger.info(f"[Request #{self._request_count}] Received GET_SAVE_STATUS request from {request.remote}")
-        
         # Get save status from face memory
         save_status = self.face_processor.memory.get_save_status()
         
         response = web.json_response(save_status)
+        return response
+
+    async def _handle_get_processor_status(self, request):
+        """Handle requests for face processing pipeline statistics."""
+        status = self.face_processor.get_status()
+        if self.camera_manager:
+            status['cameras'] = self.camera_manager.get_status()
+        status['event_loop'] = self.loop_monitor.get_status()
+        response = web.json_response(status)
+        return response
+
+    async def _handle_metrics(self, request):
+        """Handle requests for metrics in the Prometheus text format."""
+        response = web.Response(text=REGISTRY.render(), content_type='text/plain')
+        response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+        return response
+
+    async def _handle_profile(self, request):
+        """Handle requests to profile all threads for a number of seconds.
+        
+        Query parameters: seconds (default 10), interval_ms (default from
+        Profiler.SAMPLE_INTERVAL) and idle=1 to include waiting threads. The
+        response is in the collapsed stack format, e.g. for flamegraph.pl.
+        """
+        try:
+            seconds = float(request.query.get('seconds', 10))
+            interval = float(request.query.get('interval_ms', Profiler.SAMPLE_INTERVAL * 1000)) / 1000
+        except ValueError:
+            return web.Response(status=400, text="seconds and interval_ms must be numbers")
+        if not (0 < seconds <= Profiler.MAX_DURATION) or not (0.001 <= interval <= 1.0):
+            return web.Response(status=400, text=f"seconds must be between 0 and {Profiler.MAX_DURATION:.0f}, "
+                                                 f"interval_ms between 1 and 1000")
+        include_idle = request.query.get('idle', '0').lower() in ('1', 'true', 'yes')
         
-        elapsed = (datetime.datetime.now() - start_time).total_seconds() * 1000
-        logger.info(f"[Request #{self._request_count}] Successfully handled GET_SAVE_STATUS request in {elapsed:.2f}ms")
+        # Sample from another thread, so the event loop itself shows up in the profile
+        loop = asyncio.get_running_loop()
+        try:
+            stacks, samples = await loop.run_in_executor(
+                None, functools.partial(self.stack_sampler.sample, seconds, interval, include_idle))
+        except RuntimeError as e:
+            return web.Response(status=409, text=str(e))
+        
+        response = web.Response(text=self.stack_sampler.collapse(stacks), content_type='text/plain')
+        
+        logger.info(f"[Request #{self._request_count}] Profiled {samples} samples of {len(stacks)} distinct stacks")
+        return response
+
+    async def _handle_stalls(self, request):
+        """Handle requests for event loop stalls and the stacks that caused them."""
+        response = web.json_response(self.stall_detector.get_status())
         return response
 
+    async def _handle_get_roi(self, request):
+        """Handle requests for the regions of interest of a camera."""
+        camera_id = request.query.get('camera_id', self._camera_id)
+        roi = self.roi_store.get(camera_id)
+        response = web.json_response({
+            'camera_id': camera_id,
+            'regions': roi.regions if roi else []
+        })
+        return response
+    
+    async def _handle_set_roi(self, request):
+        """Handle requests to set the regions of interest of a camera.
+        
+        Expects a JSON body {"camera_id": ..., "regions": [...]} with regions in
+        frame fractions; an empty list makes the camera use the whole frame.
+        """
+        try:
+            data = await request.json()
+        except json.JSONDecodeError:
+            logger.error(f"[Request #{self._request_count}] Invalid JSON body")
+            return web.Response(status=400, text="Request body must be JSON")
+        
+        camera_id = data.get('camera_id', self._camera_id)
+        regions = data.get('regions', [])
+        if not isinstance(regions, list):
+            return web.Response(status=400, text="'regions' must be a list")
+        
+        try:
+            roi = self.roi_store.set(camera_id, regions)
+        except ValueError as e:
+            logger.error(f"[Request #{self._request_count}] Invalid regions: {e}")
+            return web.Response(status=400, text=str(e))
+        
+        response = web.json_response({
+            'camera_id': camera_id,
+            'regions': roi.regions if roi else []
+        })
+        return response
+    
     async def _handle_request_save(self, request):
         """Handle manual save requests."""
-        self._request_count += 1
-        start_time = datetime.datetime.now()
-        logger.info(f"[Request #{self._request_count}] Received REQUEST_SAVE request from {request.remote}")
-        
         # Request a save from face memory
         self.face_processor.memory.request_save()
         
         response = web.Response(status=200, text="Save requested")
-        
-        elapsed = (datetime.datetime.now() - start_time).total_seconds() * 1000
-        logger.info(f"[Request #{self._request_count}] Successfully handled REQUEST_SAVE request in {elapsed:.2f}ms")
         return response
 
+    async def _start_component(self, name, coroutine):
+        """Await one part of startup, recording its state and duration for /health."""
+        self._components[name] = {'state': 'starting'}
+        start = time.perf_counter()
+        try:
+            result = await coroutine
+        except Exception as e:
+            self._components[name] = {'state': 'failed', 'error': str(e)}
+            raise
+        seconds = round(time.perf_counter() - start, 2)
+        self._components[name] = {'state': 'ready' if result is not False else 'failed', 'seconds': seconds}
+        logger.info(f"Startup: {name} finished in {seconds:.2f}s")
+        return result
+    
+    def _open_camera(self):
+        """Create and open the camera of single-camera mode on a worker thread.
+        
+        Providers open with blocking calls behind their async interface
+        (device probing, reading a test frame), so the camera gets a private
+        event loop here, as capture threads of CameraStream do.
+        """
+        logger.info(f"Initializing camera (type: {self._camera_type}, index: {self._camera_index})...")
+        provider = create_camera_provider(
+            camera_type=self._camera_type,
+            camera_index=self._camera_index,
+            **self._camera_options
+        )
+        loop = asyncio.new_event_loop()
+        try:
+            success = loop.run_until_complete(provider.open_camera())
+        finally:
+            loop.close()
+        if not success:
+            raise Exception("Failed to open camera")
+        self.camera_provider = provider
+        logger.info("Camera initialized successfully")
+        return True
+    
+    def _create_camera_manager(self):
+        """Create the cameras of multi-camera mode; their providers probe devices on creation."""
+        camera_manager = CameraManager(self.face_processor, self.roi_store, workers=self._workers,
+                                       batch_detection=self._batch_detection,
+                                       worker_processes=self._worker_processes)
+        for config in self._camera_configs:
+            camera_id = str(config['id'])
+            logger.info(f"Initializing camera {camera_id} (type: {config.get('type', 'auto')}, index: {config.get('index', 0)})...")
+            provider = create_camera_provider(
+                camera_type=config.get('type', 'auto'),
+                camera_index=config.get('index', 0),
+                **{key: config[key] for key in ('source', 'pacing', 'fps', 'loop') if key in config}
+            )
+            camera_manager.add_camera(camera_id, provider)
+        return camera_manager
+    
+    async def _open_cameras(self):
+        """Create and open all cameras of multi-camera mode; processing starts once models are loaded."""
+        loop = asyncio.get_running_loop()
+        self.camera_manager = await loop.run_in_executor(None, self._create_camera_manager)
+        opened = await self.camera_manager.open_cameras()
+        if not opened:
+            raise Exception("Failed to open any camera")
+        # The first camera that opened serves the single-camera endpoints
+        self._camera_id = opened[0]
+        self.camera_provider = self.camera_manager.streams[self._camera_id]
+        return True
+    
+    async def _start_components(self):
+        """Open the cameras, load the models and load face memory concurrently.
+        
+        Each of them blocks for a while - probing camera devices, parsing
+        ONNX models, reading the face data JSON - so they run on worker
+        threads at the same time instead of one after another.
+        """
+        loop = asyncio.get_running_loop()
+        assets_dir = os.path.join(os.path.dirname(__file__),'..', 'assets')
+        detection_model = os.path.join(assets_dir, 'face_detection_yunet_2023mar.onnx')
+        recognition_model = os.path.join(assets_dir, 'face_recognition_sface_2021dec.onnx')
+        
+        camera = self._open_cameras() if self._camera_configs else loop.run_in_executor(None, self._open_camera)
+        results = await asyncio.gather(
+            self._start_component('camera', camera),
+            self._start_component('models', loop.run_in_executor(None, functools.partial(
+                self.face_processor.load_models, detection_model, recognition_model, **self._inference_options))),
+            self._start_component('memory', loop.run_in_executor(None, self.face_processor.memory.load)),
+            return_exceptions=True
+        )
+        # Only a camera or face memory failure stops the server; it can stream without models
+        for result in (results[0], results[2]):
+            if isinstance(result, BaseException):
+                raise result
+        if results[1] is not True:
+            logger.warning("Failed to load face processing models. Face detection/recognition will not be available.")
+        else:
+            logger.info("Face processing models loaded successfully")
+        
+        if self.camera_manager:
+            self.camera_manager.start_processing()
+    
     async def start(self):
         try:
             logger.info("Starting Camera Provider Server...")
-            
-            # Initialize camera using factory function
-            logger.info(f"Initializing camera (type: {self._camera_type}, index: {self._camera_index})...")
-            self.camera_provider = create_camera_provider(
-                camera_type=self._camera_type,
-                camera_index=self._camera_index
-            )
-            
-            success = await self.camera_provider.open_camera()
-            if not success:
-                raise Exception("Failed to open camera")
-            logger.info("Camera initialized successfully")
-            
-            # Load face processing models
-            assets_dir = os.path.join(os.path.dirname(__file__),'..', 'assets')
-            detection_model = os.path.join(assets_dir, 'face_detection_yunet_2023mar.onnx')
-            recognition_model = os.path.join(assets_dir, 'face_recognition_sface_2021dec.onnx')
-            
-            success = self.face_processor.load_models(detection_model, recognition_model)
-            if not success:
-                logger.warning("Failed to load face processing models. Face detection/recognition will not be available.")
-            else:
-                logger.info("Face processing models loaded successfully")
+            self._started_at = time.time()
+            self.loop_monitor.start()
+            self.stall_detector.start()
             
             # Create web application
             logger.info("Setting up web application...")
-            app = web.Application()
+            app = web.Application(middlewares=[self._request_middleware])
             app.router.add_get('/test', self._handle_test)
+            app.router.add_get('/health', self._handle_health)
             app.router.add_get('/get_image', self._handle_get_image)
             app.router.add_get('/get_image_with_detection', self._handle_get_image_with_detection)
             app.router.add_get('/get_image_with_recognition', self._handle_get_image_with_recognition)
             app.router.add_get('/add_face', self._handle_add_face)
             app.router.add_get('/get_face_counts', self._handle_get_face_counts)
+            app.router.add_get('/get_changes', self._handle_get_changes)
             app.router.add_get('/get_known_faces', self._handle_get_known_faces)
             app.router.add_get('/merge_faces', self._handle_merge_faces)
+            app.router.add_get('/consolidate_faces', self._handle_consolidate_faces)
+            app.router.add_get('/apply_retention', self._handle_apply_retention)
+            app.router.add_get('/get_archive', self._handle_get_archive)
+            app.router.add_get('/restore_face', self._handle_restore_face)
             app.router.add_get('/get_face_data', self._handle_get_face_data)
             app.router.add_get('/rename_face', self._handle_rename_face)
             app.router.add_post('/import_faces_batch', self._handle_import_faces_batch)
             app.router.add_get('/thumbnails/{person_id}/{filename}', self._handle_thumbnail)
             app.router.add_get('/get_save_status', self._handle_get_save_status)
+            app.router.add_get('/get_processor_status', self._handle_get_processor_status)
+            app.router.add_get('/metrics', self._handle_metrics)
+            app.router.add_get('/admin/profile', self._handle_profile)
+            app.router.add_get('/admin/stalls', self._handle_stalls)
             app.router.add_post('/request_save', self._handle_request_save)
+            app.router.add_get('/get_roi', self._handle_get_roi)
+            app.router.add_post('/set_roi', self._handle_set_roi)
+            app.router.add_get('/cameras', self._handle_list_cameras)
+            app.router.add_get('/cameras/{camera_id}/get_image', self._handle_camera_image)
+            app.router.add_get('/cameras/{camera_id}/get_image_with_recognition', self._handle_camera_image_with_recognition)
+            app.router.add_get('/cameras/{camera_id}/get_face_data', self._handle_camera_face_data)
             app.router.add_get('/', self._handle_static_files)
             app.router.add_get('/{path:.*}', self._handle_static_files)
             
-            # Start server
-            runner = web.AppRunner(app)
-            await runner.setup()
-            site = web.TCPSite(runner, self._host, self._port)
+            # Start server right away; /health reports when the rest is ready
+            # Requests are logged by the sampled access log instead of aiohttp's per-request one
+            self._runner = web.AppRunner(app, access_log=None)
+            await self._runner.setup()
+            site = web.TCPSite(self._runner, self._host, self._port)
             await site.start()
             logger.info(f"HTTP server started at http://{self._host}:{self._port}")
             
+            await self._start_components()
+            self._register_metric_functions()
+            self._ready = True
+            logger.info(f"Server ready after {time.time() - self._started_at:.2f}s")
+            
             # Register zeroconf service
             logger.info("Registering Zeroconf service...")
             self._zeroconf = AsyncZeroconf()
@@ -722,10 +1205,22 @@ class CameraProviderServer:
             await self._zeroconf.async_unregister_service(self._service_info)
             await self._zeroconf.async_close()
             logger.info("Zeroconf service unregistered")
+        
+        self._import_executor.shutdown(wait=False)
+        self._recognition_executor.shutdown(wait=False)
             
-        if self.camera_provider:
+        if self.camera_manager:
+            logger.info("Closing cameras...")
+            await self.camera_manager.stop()
+            logger.info("Cameras closed")
+        elif self.camera_provider:
             logger.info("Closing camera...")
             await self.camera_provider.close_camera()
             logger.info("Camera closed")
-            
+        
+        if self._runner:
+            await self._runner.cleanup()
+        
+        await self.loop_monitor.stop()
+        await self.stall_detector.stop()
         logger.info("Server stopped successfully")
@@ -451,9 +451,10 @@ document.addEventListener('DOMContentLoaded', () => {
             // Log before sending
             console.log(`Sending batch to server: ${batchNum}/${totalBatches} for ${personName}`);
             
-            // Send the batch to the server
+            // Send the batch to the server, asking for per-image progress lines
             const response = await fetch('/import_faces_batch', {
                 method: 'POST',
+                headers: { 'Accept': 'application/x-ndjson' },
                 body: formData
             });
             
@@ -466,7 +467,7 @@ document.addEventListener('DOMContentLoaded', () => {
             }
             
             // Parse response
-            const result = await response.json();
+            const result = await readImportStream(response, files.length);
             console.log("Server response data:", result);
             return result;
             
@@ -485,6 +486,56 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    /**
+     * Read a streamed import response, updating batch progress per image
+     * @param {Response} response - Fetch response from /import_faces_batch
+     * @param {number} totalFiles - Number of files sent in the batch
+     * @returns {Promise<Object>} - The final import result
+     */
+    async function readImportStream(response, totalFiles) {
+        // Older servers answer with a single JSON document
+        const contentType = response.headers.get('Content-Type') || '';
+        if (!contentType.includes('application/x-ndjson') || !response.body) {
+            return await response.json();
+        }
+        
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let result = null;
+        
+        const handleLine = (line) => {
+            if (!line.trim()) {
+                return;
+            }
+            const event = JSON.parse(line);
+            if (event.event === 'image') {
+                const imageProgress = Math.min(100, Math.round(event.images_processed / totalFiles * 100));
+                currentBatchProgress.style.width = `${imageProgress}%`;
+                currentBatchProgressText.textContent = `${imageProgress}%`;
+            } else if (event.event === 'result') {
+                result = event;
+            }
+        };
+        
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) {
+                break;
+            }
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            lines.forEach(handleLine);
+        }
+        handleLine(buffer);
+        
+        if (!result) {
+            throw new Error('Import stream ended without a result');
+        }
+        return result;
+    }
+
     /**
      * Merge batch results into the overall results
      * @param {Object} batchResult - Results from a single batch
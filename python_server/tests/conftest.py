@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+# Server modules import each other by name, as when run from python_server
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def memory():
+    """Face memory without storage or background threads."""
+    from face_memory import FaceMemory
+    face_memory = FaceMemory(load=False)
+    yield face_memory
+    face_memory.shutdown()
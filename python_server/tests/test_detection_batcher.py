@@ -0,0 +1,125 @@
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from detection_batcher import DetectionBatcher
+from face_processor import FaceProcessor
+
+class SquareDetector:
+    """Stands in for cv2.FaceDetectorYN by reporting every white square as a face."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def setInputSize(self, size):
+        self.size = size
+
+    def detect(self, image):
+        self.calls += 1
+        assert (image.shape[1], image.shape[0]) == self.size
+        count, _, stats, _ = cv2.connectedComponentsWithStats((image[:, :, 0] > 0).astype(np.uint8))
+        faces = [[x, y, w, h, x + 2, y + 3, 0, 0, 0, 0, 0, 0, 0, 0, 0.9]
+                 for x, y, w, h, _ in stats[1:count]]
+        return 1, np.array(faces, dtype=np.float32) if faces else None
+
+def frame(width, height, *squares):
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    for x, y, size in squares:
+        image[y:y + size, x:x + size] = 255
+    return image
+
+@pytest.fixture
+def processor():
+    processor = FaceProcessor(with_memory=False)
+    processor._detection_model_path = processor._recognition_model_path = 'fake.onnx'
+    return processor
+
+@pytest.fixture
+def batcher(processor):
+    batcher = DetectionBatcher(processor, window=5.0, max_batch=3, gap=8)
+    batcher._detection_model = SquareDetector()
+    return batcher
+
+def _detect_together(batcher, images):
+    results = [None] * len(images)
+
+    def worker(index):
+        results[index] = batcher.detect(images[index])
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(len(images))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return results
+
+def test_mosaic_detections_are_split_back_to_their_images(batcher):
+    images = [
+        frame(320, 240, (10, 20, 30), (200, 150, 40)),
+        frame(160, 120, (0, 0, 25)),
+        frame(200, 240),
+    ]
+
+    results = _detect_together(batcher, images)
+
+    assert batcher._detection_model.calls == 1
+    assert batcher.get_status()['largest_batch'] == 3
+    np.testing.assert_array_equal(results[0][:, :6], [[10, 20, 30, 30, 12, 23], [200, 150, 40, 40, 202, 153]])
+    np.testing.assert_array_equal(results[1][:, :6], [[0, 0, 25, 25, 2, 3]])
+    assert results[2] is None
+
+def test_split_assigns_detections_by_center():
+    # Tiles are 100 pixels wide with an 8 pixel gap; the middle face is centered in the gap
+    faces = np.array([[80, 0, 20, 20] + [81, 1] + [0] * 9,
+                      [94, 0, 20, 20] + [95, 1] + [0] * 9,
+                      [120, 10, 10, 10] + [121, 11] + [0] * 9], dtype=np.float32)
+
+    first = DetectionBatcher._split(faces, 0, 100, 50)
+    second = DetectionBatcher._split(faces, 108, 100, 50)
+
+    np.testing.assert_array_equal(first[:, :6], [[80, 0, 20, 20, 81, 1]])
+    np.testing.assert_array_equal(second[:, :6], [[12, 10, 10, 10, 13, 11]])
+    assert DetectionBatcher._split(faces, 0, 100, 5) is None
+
+def test_detection_errors_reach_every_image_of_the_batch(batcher):
+    batcher._detection_model.detect = lambda image: (_ for _ in ()).throw(RuntimeError('detector failed'))
+    errors = []
+
+    def worker():
+        try:
+            batcher.detect(frame(50, 50))
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert len(errors) == 3
+
+def test_batched_run_detection_creates_no_worker_detector(processor, batcher):
+    batcher.window = 0.01
+    image = frame(100, 80, (10, 10, 20))
+    created = []
+
+    def worker():
+        created.append(processor.run_detection(image, batcher=batcher) is not None)
+        created.append(getattr(processor._worker_models, 'detection', None) is not None)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join(10)
+    assert created == [True, False]
+
+def test_batcher_takes_over_the_loaded_detector(processor):
+    detector = SquareDetector()
+    processor._unclaimed_models = {'detection': detector, 'recognition': object()}
+    batcher = DetectionBatcher(processor, window=0.01)
+
+    assert batcher.detect(frame(100, 80, (10, 10, 20))) is not None
+
+    assert batcher._detection_model is detector and detector.calls == 1
+    assert list(processor._unclaimed_models) == ['recognition']
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from face_processor import FaceProcessor
+from roi import RegionOfInterest
+
+class FakeDetector:
+    """Stands in for cv2.FaceDetectorYN, returning fixed detections in input coordinates."""
+
+    def __init__(self, faces):
+        self.faces = np.array(faces, dtype=np.float32)
+        self.input_sizes = []
+        self.images = []
+
+    def setInputSize(self, size):
+        self.input_sizes.append(tuple(size))
+
+    def detect(self, image):
+        self.images.append(image)
+        return 1, self.faces.copy()
+
+def face(x, y, w, h, confidence=0.9):
+    """A YuNet detection row whose landmarks sit at fixed offsets inside the box."""
+    landmarks = [x + 1, y + 2, x + 3, y + 4, x + 5, y + 6, x + 7, y + 8, x + 9, y + 10]
+    return [x, y, w, h] + landmarks + [confidence]
+
+@pytest.fixture
+def processor():
+    """Processor without memory whose detector on this thread is replaced by the test."""
+    processor = FaceProcessor(with_memory=False)
+    processor._detection_model_path = processor._recognition_model_path = 'fake.onnx'
+    return processor
+
+def _use_detector(processor, detector):
+    processor._worker_models.detection = detector
+    return detector
+
+def test_roi_offset_moves_positions_but_not_box_size(processor):
+    detector = _use_detector(processor, FakeDetector([face(10, 20, 50, 60)]))
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    roi = RegionOfInterest([{'type': 'rect', 'x': 0.25, 'y': 0.5, 'w': 0.5, 'h': 0.5}])
+
+    faces = processor.run_detection(frame, roi=roi)
+
+    assert detector.input_sizes == [(320, 240)]
+    np.testing.assert_allclose(faces[0], face(170, 260, 50, 60))
+
+def test_scaled_roi_detections_are_mapped_back_to_the_frame(processor):
+    detector = _use_detector(processor, FakeDetector([face(10, 20, 25, 30)]))
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    roi = RegionOfInterest([{'type': 'rect', 'x': 0.25, 'y': 0.5, 'w': 0.5, 'h': 0.5}])
+
+    faces = processor.run_detection(frame, scale=0.5, roi=roi)
+
+    assert detector.input_sizes == [(160, 120)]
+    x, y, w, h = faces[0][:4]
+    assert (x, y, w, h) == (180, 280, 50, 60)
+    np.testing.assert_allclose(faces[0][4:6], [160 + 11 * 2, 240 + 22 * 2])
+
+def test_faces_centered_outside_the_regions_are_dropped(processor):
+    _use_detector(processor, FakeDetector([face(0, 0, 20, 20), face(100, 100, 20, 20)]))
+    frame = np.zeros((200, 200, 3), dtype=np.uint8)
+    # Triangle over the lower right half of the frame
+    roi = RegionOfInterest([{'type': 'polygon', 'points': [[1, 0], [1, 1], [0, 1]]}])
+
+    faces = processor.run_detection(frame, roi=roi)
+
+    assert len(faces) == 1
+    assert tuple(faces[0][:2]) == (100, 100)
+
+def test_empty_roi_bounds_skip_detection(processor):
+    detector = _use_detector(processor, FakeDetector([face(0, 0, 20, 20)]))
+    frame = np.zeros((100, 100, 3), dtype=np.uint8)
+    roi = RegionOfInterest([{'type': 'rect', 'x': 0.5, 'y': 0.5, 'w': 0.001, 'h': 0.001}])
+
+    assert processor.run_detection(frame, roi=roi) is None
+    assert detector.images == []
@@ -0,0 +1,101 @@
+import json
+import os
+
+import numpy as np
+
+from face_memory import FaceMemory
+
+def _feature(seed):
+    return np.random.default_rng(seed).standard_normal((1, 128)).astype(np.float32)
+
+def test_changes_since_a_revision_only_list_newer_people(memory):
+    memory.add_person('a', _feature(1))
+    since = memory.get_revision()
+    memory.add_person('b', _feature(2))
+    memory.update_person('a', box=[0, 0, 10, 10], confidence=0.9)
+
+    changes = memory.get_changes(since, memory.get_epoch())
+
+    assert not changes['full_resync']
+    assert [person.id for person in changes['changed']] == ['b', 'a']
+    assert changes['removed'] == []
+    assert changes['revision'] == memory.get_revision()
+
+def test_removed_people_leave_tombstones(memory):
+    memory.add_person('a', _feature(1))
+    memory.add_person('b', _feature(2))
+    memory.add_person('c', _feature(3))
+    since = memory.get_revision()
+
+    memory.merge_people('b', 'a')
+    memory.rename_person('c', 'Carol')
+
+    changes = memory.get_changes(since, memory.get_epoch())
+    removed = {tombstone['id']: tombstone for tombstone in changes['removed']}
+    assert removed['b']['reason'] == 'merged' and removed['b']['replaced_by'] == 'a'
+    assert removed['c']['reason'] == 'renamed' and removed['c']['replaced_by'] == 'Carol'
+    assert {person.id for person in changes['changed']} == {'a', 'Carol'}
+
+def test_reusing_a_removed_id_clears_its_tombstone(memory):
+    memory.add_person('a', _feature(1))
+    memory.add_person('b', _feature(2))
+    since = memory.get_revision()
+    memory.merge_people('b', 'a')
+    memory.add_person('b', _feature(3))
+
+    changes = memory.get_changes(since, memory.get_epoch())
+
+    assert changes['removed'] == []
+    assert {person.id for person in changes['changed']} == {'a', 'b'}
+
+def test_full_resync_once_tombstones_were_dropped(memory):
+    memory._max_tombstones = 1
+    for person_id in ('a', 'b', 'c'):
+        memory.add_person(person_id, _feature(ord(person_id)))
+    since = memory.get_revision()
+    memory.merge_people('b', 'a')
+    memory.merge_people('c', 'a')
+
+    changes = memory.get_changes(since, memory.get_epoch())
+
+    assert changes['full_resync']
+    assert [person.id for person in changes['changed']] == ['a']
+
+def test_full_resync_for_a_revision_from_the_future(memory):
+    memory.add_person('a', _feature(1))
+
+    assert memory.get_changes(memory.get_revision() + 5, memory.get_epoch())['full_resync']
+
+def test_full_resync_for_a_revision_from_another_epoch(memory):
+    memory.add_person('a', _feature(1))
+    since = memory.get_revision()
+    memory.add_person('b', _feature(2))
+
+    assert memory.get_changes(since, 'other')['full_resync']
+    assert memory.get_changes(since)['full_resync']
+    assert not memory.get_changes(0)['full_resync']
+
+def test_full_resync_after_a_restart_lost_unsaved_changes(tmp_path):
+    before = FaceMemory(str(tmp_path), load=False)
+    before.add_person('a', _feature(1))
+    with open(os.path.join(str(tmp_path), 'face_memory.json'), 'w') as f:
+        json.dump({'people': [person.to_dict() for person in before.get_all_people().values()],
+                   'revision': before.get_revision()}, f)
+    # Changes after the last save are lost when the server stops
+    before.add_person('b', _feature(2))
+    before.add_person('c', _feature(3))
+    synced = before.get_changes(0)
+    before.shutdown()
+
+    after = FaceMemory(str(tmp_path), load=False)
+    after._load_from_storage()
+    after.add_person('d', _feature(4))
+    after.add_person('e', _feature(5))
+    try:
+        # The restored history reaches the client's revision again, with other changes
+        assert after.get_revision() >= synced['revision']
+        changes = after.get_changes(synced['revision'], synced['epoch'])
+        assert changes['full_resync']
+        assert {person.id for person in changes['changed']} == {'a', 'd', 'e'}
+    finally:
+        after.shutdown()
@@ -0,0 +1,97 @@
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from constants import Inference
+from face_comparison_service import FaceComparisonService
+from face_processor import FaceProcessor
+
+class FakeModel:
+    """Stands in for cv2.FaceDetectorYN and cv2.FaceRecognizerSF, recording its inferences."""
+
+    def __init__(self, kind, created):
+        self.kind = kind
+        self.sizes = []
+        self.features = 0
+        created.append(self)
+
+    def setInputSize(self, size):
+        self.size = size
+
+    def detect(self, image):
+        self.sizes.append(self.size)
+        return 1, None
+
+    def feature(self, image):
+        self.features += 1
+        return np.zeros((1, 128), dtype=np.float32)
+
+@pytest.fixture
+def created(monkeypatch):
+    """Models created through OpenCV, in creation order."""
+    created = []
+    monkeypatch.setattr(cv2.FaceDetectorYN, 'create', lambda *args: FakeModel('detection', created))
+    monkeypatch.setattr(cv2.FaceRecognizerSF, 'create', lambda *args: FakeModel('recognition', created))
+    service = FaceComparisonService.get_instance()
+    shared = service._recognizer, service.is_initialized
+    threads = cv2.getNumThreads()
+    yield created
+    service._recognizer, service.is_initialized = shared
+    cv2.setNumThreads(threads)
+
+@pytest.fixture
+def processor(tmp_path, created):
+    """Processor with fake models loaded on a startup thread, as the server loads them."""
+    paths = []
+    for name in ('detection.onnx', 'recognition.onnx'):
+        path = tmp_path / name
+        path.write_bytes(b'')
+        paths.append(str(path))
+    processor = FaceProcessor(with_memory=False)
+    _on_thread(lambda: processor.load_models(*paths, num_threads=2), 'startup')
+    return processor
+
+def _on_thread(function, name):
+    results = []
+    thread = threading.Thread(target=lambda: results.append(function()), name=name)
+    thread.start()
+    thread.join(10)
+    return results[0]
+
+def _serve_frame(processor):
+    processor.run_detection(np.zeros((48, 64, 3), dtype=np.uint8))
+    return processor._get_worker_models()
+
+def _kinds(created):
+    return sorted(model.kind for model in created)
+
+def test_first_serving_thread_uses_the_loaded_models(processor, created):
+    assert _kinds(created) == ['detection', 'recognition']
+
+    models = _on_thread(lambda: _serve_frame(processor), 'recognition_0')
+
+    assert _kinds(created) == ['detection', 'recognition']
+    assert models == (processor.detection_model, processor.recognition_model)
+
+def test_other_serving_threads_get_their_own_models(processor, created):
+    first = _on_thread(lambda: _serve_frame(processor), 'recognition_0')
+    second = _on_thread(lambda: _serve_frame(processor), 'recognition_1')
+
+    assert _kinds(created) == ['detection', 'detection', 'recognition', 'recognition']
+    assert first[0] is not second[0] and first[1] is not second[1]
+
+def test_models_created_for_threads_are_set_up_and_warmed_up(processor, created, monkeypatch):
+    _on_thread(lambda: _serve_frame(processor), 'recognition_0')
+    thread_settings = []
+    monkeypatch.setattr(cv2, 'setNumThreads',
+                        lambda threads: thread_settings.append((threading.current_thread().name, threads)))
+
+    _on_thread(lambda: _serve_frame(processor), 'recognition_1')
+
+    detector, recognizer = created[2:]
+    # Warm-up ran before the frame, which is detected at its own size
+    assert detector.sizes == list(Inference.WARMUP_SIZES) + [(64, 48)]
+    assert recognizer.features == 1
+    assert set(thread_settings) == {('recognition_1', 2)}
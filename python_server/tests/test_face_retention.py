@@ -0,0 +1,77 @@
+import datetime
+import os
+
+import numpy as np
+import pytest
+
+from face_archive import FaceArchive
+from face_memory import FaceMemory
+
+@pytest.fixture
+def stored_memory(tmp_path):
+    """Face memory with storage in a temporary directory, without background threads."""
+    face_memory = FaceMemory(str(tmp_path), load=False)
+    yield face_memory
+    face_memory.shutdown()
+
+def _add(memory, person_id, seed, days_ago=0, count=5, is_named=False):
+    vector = np.random.default_rng(seed).standard_normal((1, 128)).astype(np.float32)
+    person = memory.add_person(person_id, vector, is_named=is_named)
+    person.appearance_count = count
+    person.last_seen -= datetime.timedelta(days=days_ago)
+    os.makedirs(person.person_thumbnails_dir, exist_ok=True)
+    open(os.path.join(person.person_thumbnails_dir, 'face.jpg'), 'wb').close()
+    return vector
+
+def test_retention_archives_idle_and_rare_unnamed_people(stored_memory):
+    _add(stored_memory, 'idle', 1, days_ago=40)
+    _add(stored_memory, 'rare', 2, days_ago=2, count=1)
+    _add(stored_memory, 'recent', 3)
+    _add(stored_memory, 'Named', 4, days_ago=400, is_named=True)
+
+    dry_run = stored_memory.apply_retention(dry_run=True)
+    assert dry_run['idle'] == ['idle'] and dry_run['rare'] == ['rare']
+    assert len(stored_memory.get_all_people()) == 4
+
+    report = stored_memory.apply_retention(dry_run=False)
+
+    assert report['evicted'] == 2 and report['archived_people'] == 2
+    assert set(stored_memory.get_all_people()) == {'recent', 'Named'}
+    removed = stored_memory.get_changes(1, stored_memory.get_epoch())['removed']
+    assert {(tombstone['id'], tombstone['reason']) for tombstone in removed} == {('idle', 'archived'), ('rare', 'archived')}
+    assert os.path.isdir(os.path.join(stored_memory.archive.thumbnails_dir, 'idle'))
+
+def test_archived_people_are_searchable_and_restorable(stored_memory):
+    vector = _add(stored_memory, 'idle', 1, days_ago=40)
+    _add(stored_memory, 'other', 2, days_ago=40)
+    stored_memory.apply_retention(dry_run=False)
+
+    assert stored_memory.search_archive(vector)[0]['id'] == 'idle'
+
+    person = stored_memory.restore_from_archive('idle')
+
+    assert person is stored_memory.get_person('idle')
+    assert person.appearance_count == 5
+    assert os.path.exists(os.path.join(person.person_thumbnails_dir, 'face.jpg'))
+    assert stored_memory.archive.count() == 1
+    assert [record['id'] for record in stored_memory.archive.list_people()[1]] == ['other']
+
+def test_restoring_an_id_in_memory_keeps_the_archived_record(stored_memory):
+    _add(stored_memory, 'idle', 1, days_ago=40)
+    stored_memory.apply_retention(dry_run=False)
+    _add(stored_memory, 'idle', 2)
+
+    assert stored_memory.restore_from_archive('idle') is None
+    assert stored_memory.restore_from_archive('missing') is None
+    assert stored_memory.archive.count() == 1
+
+def test_archive_count_is_read_from_the_file(stored_memory):
+    _add(stored_memory, 'a', 1, days_ago=40)
+    _add(stored_memory, 'b', 2, days_ago=40)
+    stored_memory.apply_retention(dry_run=False)
+
+    reopened = FaceArchive(stored_memory.storage_dir, os.path.basename(stored_memory.archive.path))
+
+    assert reopened.count() == 2
+    total, records = reopened.list_people(limit=1)
+    assert total == 2 and len(records) == 1 and 'feature' not in records[0]
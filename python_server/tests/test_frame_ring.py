@@ -0,0 +1,167 @@
+import concurrent.futures
+import multiprocessing
+import time
+import types
+
+import cv2
+import numpy as np
+import pytest
+
+import camera_manager
+from camera_manager import CameraManager, CameraStream
+from frame_ring import FrameOverwrittenError, SharedFrameRing
+
+def _frame(value):
+    return np.full((48, 64, 3), value, dtype=np.uint8)
+
+def _jpeg(value):
+    return cv2.imencode('.jpg', _frame(value))[1].tobytes()
+
+@pytest.fixture
+def ring():
+    ring = SharedFrameRing.create(2, max_width=64, max_height=48)
+    yield ring
+    ring.close()
+
+def test_frames_are_read_in_place_and_read_only(ring):
+    ref = ring.write(_frame(7))
+
+    view = ring.read(ref)
+
+    np.testing.assert_array_equal(view, _frame(7))
+    assert np.shares_memory(view, ring._data)
+    with pytest.raises(ValueError):
+        view[0, 0, 0] = 0
+
+def test_slot_of_a_slow_reader_is_not_reused(ring):
+    held = ring.write(_frame(1))
+
+    for value in range(2, 6):
+        ref = ring.write(_frame(value))
+        assert ref.slot != held.slot
+        ring.release(ref)
+
+    np.testing.assert_array_equal(ring.read(held), _frame(1))
+
+def test_frames_are_dropped_while_every_slot_is_referenced(ring):
+    first, second = ring.write(_frame(1)), ring.write(_frame(2))
+
+    assert ring.write(_frame(3)) is None
+    assert ring.get_status()['dropped'] == 1
+
+    ring.release(first)
+    third = ring.write(_frame(3))
+    assert third.slot == first.slot
+    # The released frame was overwritten, which its old ref detects
+    assert not ring.acquire(first)
+    with pytest.raises(FrameOverwrittenError):
+        ring.read(first)
+    np.testing.assert_array_equal(ring.read(second), _frame(2))
+
+def test_frames_that_do_not_fit_are_refused(ring):
+    with pytest.raises(ValueError):
+        ring.write(np.zeros((49, 64, 3), dtype=np.uint8))
+
+_reader_ring = None
+
+def _attach(descriptor):
+    global _reader_ring
+    _reader_ring = SharedFrameRing.attach(descriptor)
+
+def _read_slowly(ref, delay):
+    frame = _reader_ring.read(ref)
+    time.sleep(delay)
+    return int(frame.min()), int(frame.max())
+
+def test_worker_process_reads_in_place_while_capture_writes_on():
+    context = multiprocessing.get_context('spawn')
+    ring = SharedFrameRing.create(2, max_width=64, max_height=48, context=context)
+    try:
+        with concurrent.futures.ProcessPoolExecutor(1, mp_context=context, initializer=_attach,
+                                                    initargs=(ring.descriptor(),)) as pool:
+            held = ring.write(_frame(1))
+            reading = pool.submit(_read_slowly, held, 0.5)
+            while not reading.running():
+                time.sleep(0.01)
+            for value in range(2, 20):
+                ref = ring.write(_frame(value))
+                ring.release(ref)
+
+            assert reading.result(30) == (1, 1)
+            ring.release(held)
+    finally:
+        ring.close()
+
+class RingProcessor:
+    """Stands in for FaceProcessor on both sides of the process boundary."""
+
+    def __init__(self):
+        self.extracted = []
+        self.analyzed = []
+
+    def extract_frame_faces(self, frame, roi=None):
+        self.extracted.append(frame)
+        return np.zeros((1, 15), dtype=np.float32), [np.ones((1, 128), dtype=np.float32)]
+
+    def analyze_faces(self, frame, detections=None, roi=None, features=None):
+        self.analyzed.append((frame, features))
+        return [{'id': 'Alice'}]
+
+@pytest.fixture
+def manager(ring, monkeypatch):
+    """Camera manager whose worker processes run on a thread, sharing the ring."""
+    processor = RingProcessor()
+    monkeypatch.setattr(camera_manager, '_worker_ring', ring)
+    monkeypatch.setattr(camera_manager, '_worker_processor', processor)
+    manager = CameraManager(processor, types.SimpleNamespace(get=lambda camera_id: None), worker_processes=1)
+    stream = manager.add_camera('door', provider=None)
+    manager.ring = stream.ring = ring
+    manager._process_pool = concurrent.futures.ThreadPoolExecutor(1)
+    yield manager
+    manager._process_pool.shutdown()
+
+def _in_use(ring):
+    return ring.get_status()['in_use']
+
+def test_stream_keeps_a_reference_on_its_latest_frame_only(ring):
+    stream = CameraStream('door', provider=None)
+    stream.ring = ring
+
+    for seq in range(1, 4):
+        stream._write_ring(_jpeg(50 * seq), seq, float(seq))
+
+    assert _in_use(ring) == 1
+    frame_seq, frame_time, ref = stream.acquire_ring_frame(2)
+    assert (frame_seq, frame_time) == (3, 3.0)
+    assert stream.acquire_ring_frame(3) is None
+    ring.release(ref)
+    stream._release_ring_frame()
+    assert _in_use(ring) == 0
+
+def test_workers_recognize_frames_of_the_ring_in_place(manager, ring):
+    stream = manager.streams['door']
+    stream._write_ring(_jpeg(200), 1, 1.0)
+    # The latest JPEG is not decodable, so decoding it would fail
+    stream._jpeg, stream.frame_seq = b'not a jpeg', 1
+
+    manager._in_flight.add('door')
+    manager._process('door')
+
+    extracted = manager.face_processor.extracted[0]
+    frame, features = manager.face_processor.analyzed[0]
+    assert np.shares_memory(extracted, ring._data) and np.shares_memory(frame, ring._data)
+    assert len(features) == 1
+    assert manager.get_results('door')['frame_seq'] == 1
+    # Only the stream's reference on its latest frame is left
+    assert _in_use(ring) == 1
+
+def test_workers_write_frames_the_capture_thread_has_not(manager, ring):
+    stream = manager.streams['door']
+    stream._jpeg, stream.frame_seq, stream._frame_time = _jpeg(50), 1, 1.0
+
+    manager._in_flight.add('door')
+    manager._process('door')
+
+    assert abs(int(manager.face_processor.extracted[0].mean()) - 50) <= 2
+    assert manager.get_results('door')['frame_seq'] == 1
+    assert _in_use(ring) == 0
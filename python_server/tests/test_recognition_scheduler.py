@@ -0,0 +1,46 @@
+import types
+
+import numpy as np
+import pytest
+
+from recognition_scheduler import AdaptiveScheduler, box_iou
+
+def _detections(*boxes, confidence=0.95):
+    return np.array([list(box) + [confidence] + [0.0] * 10 for box in boxes], dtype=np.float32)
+
+@pytest.fixture
+def scheduler(memory):
+    memory.add_person('Alice', np.ones((1, 128), dtype=np.float32), is_named=True)
+    memory.add_person('Bob', np.full((1, 128), -1.0, dtype=np.float32), is_named=True)
+    scheduler = AdaptiveScheduler(types.SimpleNamespace(memory=memory))
+    scheduler._last_results = [
+        {'id': 'Alice', 'box': [0, 0, 100, 100], 'confidence': 0.9, 'appearance_count': 0},
+        {'id': 'Bob', 'box': [300, 0, 100, 100], 'confidence': 0.9, 'appearance_count': 0},
+    ]
+    return scheduler
+
+def test_box_iou():
+    assert box_iou([0, 0, 10, 10], [0, 0, 10, 10]) == 1.0
+    assert box_iou([0, 0, 10, 10], [10, 0, 10, 10]) == 0.0
+    assert box_iou([0, 0, 10, 10], [5, 0, 10, 10]) == pytest.approx(50 / 150)
+
+def test_propagation_carries_identities_over_by_overlap(scheduler):
+    propagated = scheduler._propagate(_detections([305, 5, 100, 100], [4, 2, 100, 100]))
+
+    assert [face['id'] for face in propagated] == ['Bob', 'Alice']
+    assert propagated[1]['box'] == [4, 2, 100, 100]
+
+def test_propagated_faces_count_as_sightings(scheduler, memory):
+    revision = memory.get_revision()
+
+    propagated = scheduler._propagate(_detections([4, 2, 100, 100]))
+
+    alice = memory.get_person('Alice')
+    assert alice.appearance_count == 1 and alice.last_box == [4, 2, 100, 100]
+    assert propagated[0]['appearance_count'] == 1
+    assert memory.get_person('Bob').appearance_count == 0
+    assert [person.id for person in memory.get_changes(revision, memory.get_epoch())['changed']] == ['Alice']
+
+def test_unmatched_detection_needs_full_recognition(scheduler, memory):
+    assert scheduler._propagate(_detections([4, 2, 100, 100], [150, 300, 80, 80])) is None
+    assert memory.get_person('Alice').appearance_count == 0
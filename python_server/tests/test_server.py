@@ -0,0 +1,71 @@
+import asyncio
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+from aiohttp.test_utils import make_mocked_request
+
+from metrics import EVENT_LOOP_LAG_SECONDS
+from server import CameraProviderServer
+
+class StillCamera:
+    """Camera provider returning the same JPEG frame."""
+
+    is_open = True
+
+    def __init__(self):
+        self.jpeg = cv2.imencode('.jpg', np.zeros((48, 64, 3), dtype=np.uint8))[1].tobytes()
+
+    async def get_frame(self):
+        return self.jpeg
+
+@pytest.fixture
+def camera_server(tmp_path):
+    """Single-camera server with a fake camera, without starting components or listening."""
+    camera_server = CameraProviderServer(storage_dir=str(tmp_path))
+    camera_server.camera_provider = StillCamera()
+    yield camera_server
+    camera_server.face_processor.memory.shutdown()
+    camera_server._import_executor.shutdown(wait=True)
+    camera_server._recognition_executor.shutdown(wait=True)
+
+def test_single_camera_recognition_runs_off_the_loop(camera_server):
+    scheduler = camera_server.face_processor.scheduler
+    threads = []
+
+    def process_frame(frame, roi):
+        threads.append(threading.current_thread().name)
+        time.sleep(0.2)
+        return [{'id': 'Alice', 'box': [0, 0, 10, 10]}]
+    scheduler._process_frame = process_frame
+
+    async def run():
+        ticks = 0
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+        ticker = asyncio.ensure_future(tick())
+        responses = await asyncio.gather(*(camera_server._handle_get_face_data(
+            make_mocked_request('GET', '/get_face_data')) for _ in range(2)))
+        ticker.cancel()
+        return ticks, responses
+
+    ticks, responses = asyncio.run(run())
+
+    # The loop kept running while the frame was processed
+    assert ticks >= 10
+    assert all(response.status == 200 for response in responses)
+    # The second request shared the results of the first
+    assert len(threads) == 1 and threads[0].startswith('recognition')
+    assert scheduler.frames == 1 and scheduler.coalesced == 1
+
+def test_loop_lag_gauges_before_the_first_sample(camera_server):
+    camera_server._register_metric_functions()
+
+    assert EVENT_LOOP_LAG_SECONDS.labels(quantile='0.5').get() == 0.0
+    assert EVENT_LOOP_LAG_SECONDS.labels(quantile='0.99').get() == 0.0
+    assert 'camera_server_event_loop_lag_seconds{quantile="0.99"} 0' in EVENT_LOOP_LAG_SECONDS.render()